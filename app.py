@@ -1,161 +1,607 @@
-import os, secrets, time
+# app.py
+"""Serveur du jeu : routes Flask, handlers Socket.IO et fabrique `create_app()`.
+
+`import app` reste léger : la base (sqlmodel/SQLAlchemy), les énigmes et
+MQTT ne sont chargés qu'à l'appel de `create_app()`, et la connexion à la
+base, le schéma, la reprise des parties et la connexion MQTT sont faits
+en tâche de fond par `warm_up()` (ou au premier accès à la base).
+
+    python app.py                         # create_app() puis socketio.run
+    flask --app app:create_app run
+"""
+from __future__ import annotations
+import os, time, secrets, atexit, hashlib
+from collections import OrderedDict
 from datetime import datetime, timezone
-from flask import Flask, render_template, request, redirect, url_for
-from flask_socketio import SocketIO, join_room, emit
-from sqlmodel import SQLModel, Session, create_engine, select
-from models import Room, Player
-from services import game_state
+from typing import TYPE_CHECKING
+# Pas de monkey patching eventlet : son résolveur DNS vert (dnspython) est inutile et coûte ~100 ms
+os.environ.setdefault("EVENTLET_NO_GREENDNS", "yes")
+from flask import Flask, Response, make_response, render_template, request, redirect, url_for, abort, jsonify
+from flask_socketio import SocketIO, ConnectionRefusedError, join_room, emit
+from services import payload_json, metrics, mqtt_bridge
 from services.mqtt_bridge import led, buzzer, chrono_color
-
-# ------------------ DB / APP / SOCKET ------------------
-DB_URI = os.getenv("DB_URI", "sqlite:///mission_gaia.db")
-engine = create_engine(DB_URI, echo=False)
-SQLModel.metadata.create_all(engine)
-
+from services.lazy import Deferred, lazy_import
+from services.backend import HEARTBEAT, StagedTracker, make_backend
+from services.scheduler import StageScheduler
+from services.state_sync import StateStream
+from services.room_actor import RoomActors
+from services.chat import ChatHub
+from services.clock import StageClock
+from services.presence import Presence, ResumeTokens
+from services.assets import Assets, MAX_AGE as ASSET_MAX_AGE
+from services.profiler import profiler
+from services.overview import Overview
+
+# Modules lourds (sqlmodel/SQLAlchemy, définitions d'énigmes) : chargés au premier accès
+db = lazy_import("services.db")
+game_state = lazy_import("services.game_state")
+provisioning = lazy_import("services.provisioning")
+analytics_mod = lazy_import("services.analytics")
+if TYPE_CHECKING:
+    from models import Room, Player
+
+# ------------------ APP / SOCKET ------------------
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev")
-socketio = SocketIO(app, async_mode="eventlet", cors_allowed_origins="*")
-
-# ------------------ MEMOIRES EN RAM ------------------
-_HINTS: dict[str, dict[str, int]] = {}
-_SUMMARY: dict[str, list] = {}
-_WATCHERS: set[str] = set()
-
-# --- NEW : Codes par salle & stockage par room
-_STAGE_CODES = {     # index d'étape -> code
-    0: 2390,         # Salle 1 (Tri)
-    1: 2400,         # Salle 2 (Abeille)
-    2: 2431,         # Salle 3 (Energie 180 MW)
-}
-_CODES: dict[str, dict[int, int]] = {}  # room_code -> {stage_index: code}
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")      # routes /admin/* désactivées si absent
+# payload_json : les prompts pré-encodés sont recopiés tels quels dans les paquets
+# (serveur lié à l'app par create_app : les handlers s'enregistrent dès l'import)
+socketio = SocketIO(json=payload_json)
+
+# Services créés par create_app() (cache, event_log, analytics, archiver : au premier usage)
+backend = cache = chat = event_log = analytics = scheduler = actors = archiver = None
+clock = StageClock()     # échéances monotones des étapes (mémoire du process)
+presence = Presence()    # sockets authentifiés de ce worker -> (salle, joueur)
+tokens = None            # ResumeTokens (clé SECRET_KEY, créé par create_app)
+assets = Assets(app.static_folder)      # static/ empreinté et précompressé (construit par create_app)
+overview = Overview()    # vue d'ensemble des salles pour le namespace /organizer
+ORGANIZER_NS = "/organizer"
+app.jinja_env.globals["asset_url"] = assets.url
+
+# ------------------ MEMOIRES PARTAGEES ------------------
+# Trackers du backend (créés par create_app) :
+_HINTS = None       # room_code -> {"stage", "used"}
+_SUMMARY = None     # room_code -> [débriefs]
+_CODES = None       # room_code -> {str(stage_index): code} (codes d'étape définis par les énigmes)
+_SCENARIO = None    # room_code -> [nom, version] épinglés
+_STREAM = None      # StateStream : numéros de séquence de l'état diffusé
 
 # ------------------ HELPERS ------------------
+@metrics.timed("get_room", "db")
 def get_room(code: str) -> Room | None:
-    with Session(engine) as s:
-        return s.exec(select(Room).where(Room.code == code)).first()
+    return cache.get_room(code)
 
-def save(obj):
-    with Session(engine) as s:
-        s.add(obj); s.commit(); s.refresh(obj); return obj
+@metrics.timed("save", "db")
+def save(obj, flush: bool = False):
+    """Enregistre dans le cache ; `flush=True` aux transitions d'étape / fin de partie."""
+    return cache.add(obj, flush=flush)
 
+@metrics.timed("list_players", "db")
 def list_players(code: str):
-    with Session(engine) as s:
-        return s.exec(select(Player).where(Player.room_code == code)).all()
+    return cache.list_players(code)
 
+@metrics.timed("get_player", "db")
 def get_player(code_room: str, code_player: str) -> Player | None:
-    with Session(engine) as s:
-        return s.exec(select(Player).where(
-            Player.room_code == code_room,
-            Player.code == code_player
-        )).first()
+    return cache.get_player(code_room, code_player)
 
 def remaining_stage_time(r: Room) -> int:
-    """Temps restant en secondes pour l'étape courante."""
-    if not r.stage_started_at:
-        return r.stage_duration_sec
-    # On normalise en timezone-aware UTC si besoin
-    started = r.stage_started_at
-    if started.tzinfo is None:
-        started = started.replace(tzinfo=timezone.utc)
-    elapsed = int((datetime.now(timezone.utc) - started).total_seconds())
-    return max(0, r.stage_duration_sec - elapsed)
-
-def hints_info(code: str, stage: int) -> dict:
+    """Temps restant en secondes pour l'étape courante (échéance monotone)."""
+    return clock.remaining(r)
+
+# ------------------ SCENARIOS ------------------
+_RELOADS = {"seen": 0}
+
+def room_scenario(code: str):
+    """Scénario épinglé par la salle (version figée pendant la partie)."""
+    if backend.shared:
+        # Un autre worker a rechargé les énigmes : on suit
+        gen = backend.get("registry", "reloads", 0)
+        if gen > _RELOADS["seen"]:
+            game_state.reload(); _RELOADS["seen"] = gen
+    pin = _SCENARIO.get(code) or [None, None]
+    return game_state.scenario(pin[0], pin[1])
+
+def pin_scenario(code: str, name: str | None = None):
+    """Epingle la dernière version du scénario (nouvelle partie)."""
+    sc = game_state.scenario(name or (_SCENARIO.get(code) or [None])[0])
+    _SCENARIO[code] = [sc.name, sc.version]
+    return sc
+
+def enter_stage(r: Room, sc):
+    """Démarre le chrono de l'étape courante avec la durée définie par l'énigme."""
+    r.stage_duration_sec = game_state.stage_duration_for(r.current_stage, sc)
+    r.stage_started_at = clock.start(r.code, r.stage_duration_sec)
+
+def hints_info(code: str, stage: int, sc=None) -> dict:
     hs = _HINTS.get(code) or {"stage": stage, "used": 0}
     if hs["stage"] != stage:
         hs = {"stage": stage, "used": 0}; _HINTS[code] = hs
-    p = game_state.PUZZLES[stage] if stage < game_state.total_stages() else None
-    total = len(getattr(p, "hints", [])) if p else 0
-    return {"used": hs["used"], "total": total}
+    return {"used": hs["used"], "total": game_state.hints_total(stage, sc or room_scenario(code))}
 
 def state_payload(r: Room):
-    prompt = None
-    if not r.is_finished:
-        prompt = game_state.get_stage_prompt(r.current_stage)
+    """Champs d'état légers (sans le prompt, envoyé seulement dans les instantanés)."""
+    sc = room_scenario(r.code)
     return {
         "stage": r.current_stage,
-        "total": game_state.total_stages(),
-        "prompt": prompt,
-        "remaining": remaining_stage_time(r),
+        "total": game_state.total_stages(sc),
+        # Echéance murale (fixe pendant l'étape) : le client décompte lui-même
+        "deadline": clock.deadline_ms(r),
+        "duration": r.stage_duration_sec,
         "finished": r.is_finished,
         "success": r.success,
-        "hints": hints_info(r.code, r.current_stage)
+        "hints": hints_info(r.code, r.current_stage, sc)
     }
 
+def stage_prompt(r: Room):
+    return None if r.is_finished else game_state.get_stage_prompt_raw(r.current_stage, room_scenario(r.code))
+
+def broadcast_state(r: Room, full: bool = False):
+    """Diffuse l'état à la salle : instantané au changement d'étape, patch sinon."""
+    payload = state_payload(r)
+    overview.update(r.code, payload)
+    event, data = _STREAM.frame(r.code, payload, lambda: stage_prompt(r), full=full)
+    socketio.emit(event, data, room=r.code)
+
+def state_snapshot(r: Room) -> dict:
+    payload = state_payload(r)
+    overview.update(r.code, payload)
+    return _STREAM.snapshot(r.code, payload, lambda: stage_prompt(r))
+
 def reset_trackers(code: str, stage: int):
     _HINTS[code] = {"stage": stage, "used": 0}
     _SUMMARY[code] = []
     _CODES[code] = {}               # --- NEW : reset des codes pour cette room
 
-def generate_player_codes(n=4):
-    return [secrets.token_hex(3).upper() for _ in range(n)]  # 6 chars
-
-def start_watcher(code: str):
-    if code in _WATCHERS: return
-    _WATCHERS.add(code)
-    def _run():
-        last_color = None
-        while True:
-            r = get_room(code)
-            if not r: break
-            rem = remaining_stage_time(r)
-            dur = r.stage_duration_sec
-            ratio = rem / max(1, dur)
-            color = "green" if ratio >= 0.6 else ("yellow" if ratio >= 0.3 else "red")
-            if r.is_finished: color = "off"
-            if color != last_color:
-                chrono_color(code, color); last_color = color
-
-            if not r.is_finished and rem <= 0:
-                r.missed_count += 1
-                r.current_stage += 1
-                if r.current_stage >= game_state.total_stages():
-                    r.is_finished = True
-                    r.success = (r.missed_count == 0)
-                else:
-                    r.stage_started_at = datetime.now(timezone.utc)
-                    _HINTS[code] = {"stage": r.current_stage, "used": 0}
-                save(r)
-                socketio.emit("chat", {"system":True, "msg":"⏰ Temps écoulé pour cette énigme. Passage à la suivante."}, room=code)
-                socketio.emit("state", state_payload(r), room=code)
-                if r.is_finished:
-                    socketio.emit("summary", {"items": _SUMMARY.get(code, [])}, room=code)
-                    break
-            if r.is_finished: break
-            time.sleep(1.2)
-        chrono_color(code, "off")
-        _WATCHERS.discard(code)
-    socketio.start_background_task(_run)
+@metrics.timed("timeout", "scheduler")
+def _on_stage_timeout(code: str):
+    # Traité par l'acteur de la salle, après les submits déjà en file
+    actors.post(code, "timeout")
+
+@metrics.timed("color", "scheduler")
+def _on_stage_color(code: str, color: str):
+    if color == "off" or backend.owns(code):
+        chrono_color(code, color)
+
+def schedule_room(r: Room):
+    """Programme (ou retire) les échéances chrono de l'étape courante."""
+    if r.is_finished:
+        scheduler.cancel(r.code)
+        backend.release(r.code)
+    else:
+        backend.claim(r.code)
+        deadline = clock.deadline(r) or clock.now() + r.stage_duration_sec
+        scheduler.schedule(r.code, deadline - r.stage_duration_sec, r.stage_duration_sec)
+
+# ------------------ COMMANDES DE SALLE (ACTEUR) ------------------
+# Les mutations d'une salle passent par sa file : jamais deux en parallèle.
+# Chaque commande renvoie ce qu'elle a changé : None, "state" (état à
+# rediffuser), "stage" (salle modifiée : enregistrer + reprogrammer) ou
+# "full" (idem, avec instantané complet).
+_LEVEL = {None: 0, "state": 1, "stage": 2, "full": 3}
+
+def _stage_hints(code: str, stage: int) -> int:
+    hs = _HINTS.get(code) or {}
+    return hs.get("used", 0) if hs.get("stage") == stage else 0
+
+def _reset_results(r: Room, sc):
+    r.score = 0
+    r.wrong_attempts = 0
+    r.hints_used = 0
+    _effect(r.code, analytics.started, sc.name)
+
+def _finish_room(r: Room, sc):
+    r.is_finished = True
+    r.finished_at = datetime.now(timezone.utc)
+    r.success = (r.missed_count == 0)
+    _effect(r.code, event_log.append, r.code, "finish", success=r.success)
+    _effect(r.code, analytics.finished, sc.name, r.success, r.score)
+
+def _cmd_timeout(r: Room):
+    code = r.code
+    if not backend.owns(code):
+        scheduler.drop(code); return None   # un autre worker a repris la salle
+    if r.is_finished:
+        scheduler.cancel(code); return None
+    if clock.left(r) > 1:
+        # L'étape a changé entre-temps : on reprogramme sur la bonne échéance
+        schedule_room(r); return None
+    sc = room_scenario(code)
+    _effect(code, event_log.append, code, "timeout", stage=r.current_stage)
+    _effect(code, analytics.timed_out, sc.name, r.current_stage, _stage_hints(code, r.current_stage))
+    r.missed_count += 1
+    r.current_stage += 1
+    if r.current_stage >= game_state.total_stages(sc):
+        _finish_room(r, sc)
+    else:
+        enter_stage(r, sc)
+        _HINTS[code] = {"stage": r.current_stage, "used": 0}
+    chat.say(code, "⏰ Temps écoulé pour cette énigme. Passage à la suivante.")
+    return "stage"
+
+def _cmd_start(r: Room):
+    code = r.code
+    # Autoriser démarrage même si partie finie (pour Rejouer), ou vérifier min 2 joueurs si partie neuve
+    if r.started_at and not r.is_finished:
+        chat.say(code, "La mission est déjà en cours.")
+        return None
+    # Démarrage/Redémarrage
+    r.started_at = datetime.now(timezone.utc)
+    r.is_finished = False
+    r.finished_at = None
+    r.success = False
+    r.current_stage = 0 if r.missed_count > 0 or r.started_at else r.current_stage
+    sc = pin_scenario(code)
+    enter_stage(r, sc)
+    _reset_results(r, sc)
+    _effect(code, event_log.append, code, "start", scenario=[sc.name, sc.version])
+    chat.say(code, "La mission démarre !")
+    return "full"
+
+def _cmd_replay(r: Room):
+    code = r.code
+    # Remise à zéro contrôlée (sans toucher à la DB structurelle)
+    r.is_finished = False
+    r.finished_at = None
+    r.success = False
+    r.missed_count = 0
+    r.current_stage = 0
+    sc = pin_scenario(code)
+    enter_stage(r, sc)
+    _reset_results(r, sc)
+    reset_trackers(code, 0)
+    _effect(code, event_log.append, code, "replay", scenario=[sc.name, sc.version])
+    chat.say(code, "🔁 Rejouer : la salle a été réinitialisée.")
+    return "full"
+
+def _cmd_hint(r: Room):
+    code = r.code
+    if r.is_finished: return None
+    hs = dict(_HINTS.get(code) or {"stage": r.current_stage, "used": 0})    # copie : le lot peut être jeté
+    if hs["stage"] != r.current_stage:
+        hs = {"stage": r.current_stage, "used": 0}
+    nxt = game_state.get_hint(r.current_stage, hs["used"], room_scenario(code))
+    if nxt:
+        hs["used"] += 1
+        _HINTS[code] = hs
+        r.hints_used += 1
+        _effect(code, event_log.append, code, "hint", stage=r.current_stage, used=hs["used"])
+        chat.say(code, f"🧩 Indice {hs['used']}: {nxt}")
+    else:
+        chat.say(code, "Aucun indice supplémentaire disponible.")
+    return "state"
+
+def _cmd_submit(r: Room, stage: int, payload: dict):
+    code = r.code
+    # Réponse à une étape déjà passée (autre joueur, fin du chrono) : ignorée
+    if r.is_finished or stage != r.current_stage:
+        return None
+    if remaining_stage_time(r) <= 0:
+        return None
+    cur = r.current_stage
+    sc = room_scenario(code)
+    if not game_state.validate_stage(cur, payload, sc):
+        _effect(code, event_log.append, code, "submit_ko", stage=cur)
+        r.wrong_attempts += 1
+        r.score = max(0, r.score - analytics_mod.WRONG_PENALTY)
+        _effect(code, analytics.wrong, sc.name, cur)
+        _effect(code, buzzer, code, 300)
+        chat.say(code, "❌ Mauvaise réponse.")
+        return "state"
+
+    # --- Feedback matériel
+    _effect(code, led, code, True); _effect(code, buzzer, code, 120)
+
+    # --- Score et agrégats
+    remaining, hints = remaining_stage_time(r), _stage_hints(code, cur)
+    r.score += analytics_mod.stage_points(remaining, hints)
+    _effect(code, analytics.solved, sc.name, cur, r.stage_duration_sec - remaining, hints)
+
+    # --- Débrief éventuel
+    debrief = game_state.get_debrief(cur, sc)
+    prompt = game_state.get_stage_prompt(cur, sc)
+    if debrief:
+        item = {"stage": cur, "title": prompt.get("title", ""), "debrief": debrief}
+        _SUMMARY.update(code, lambda items: (items or []) + [item])
+        chat.say(code, "🎓 Débrief: " + debrief)
+
+    # --- NEW : code de l'étape
+    val = game_state.stage_code(cur, sc)
+    if val is not None:
+        _CODES.update(code, lambda codes: {**(codes or {}), str(cur): val})
+        chat.say(code, f"🔐 Code {cur+1} = {val}")
+
+    _effect(code, event_log.append, code, "submit_ok", stage=cur, title=prompt.get("title", ""),
+                     debrief=debrief, stage_code=val)
+
+    # Passage à l'étape suivante
+    r.current_stage += 1
+    if r.current_stage >= game_state.total_stages(sc):
+        _finish_room(r, sc)
+    else:
+        enter_stage(r, sc)
+        # --- NEW : message d'entrée de l'étape suivante (ex. indice final en salle 4)
+        cs = {int(k): v for k, v in _CODES.get(code, {}).items()}
+        msg = game_state.on_enter_stage(r.current_stage, cs, sc)
+        if msg:
+            chat.say(code, msg)
+
+    _HINTS[code] = {"stage": r.current_stage, "used": 0}
+    chat.say(code, "✅ Énigme réussie !")
+    return "stage"
+
+_COMMANDS = {"timeout": _cmd_timeout, "start": _cmd_start, "replay": _cmd_replay,
+             "hint": _cmd_hint, "submit": _cmd_submit}
+
+# Effets d'un lot (journal, analytics, MQTT) retenus jusqu'à l'écriture de la salle
+_STAGED: dict[str, list] = {}
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "3"))   # relectures après un conflit de version
+
+def _effect(code: str, fn, *args, **kw):
+    """Appelle `fn` tout de suite, ou à la fin du lot en cours pour cette salle."""
+    staged = _STAGED.get(code)
+    if staged is None:
+        fn(*args, **kw)
+    else:
+        staged.append((fn, args, kw))
+
+def _begin(code: str):
+    _STAGED[code] = []
+    for t in (_HINTS, _SUMMARY, _CODES, _SCENARIO):
+        t.stage(code)
+    chat.hold(code)
+
+def _end(code: str, ok: bool):
+    """Valide (ok) ou jette tout ce que le lot a retenu."""
+    effects = _STAGED.pop(code, [])
+    for t in (_HINTS, _SUMMARY, _CODES, _SCENARIO):
+        (t.commit if ok else t.discard)(code)
+    chat.release(code, send=ok)
+    if not ok:
+        clock.forget(code)          # échéance recalculée depuis la salle relue
+        return
+    for fn, args, kw in effects:
+        try:
+            fn(*args, **kw)
+        except Exception:
+            app.logger.exception("salle %s : effet %s en échec", code, getattr(fn, "__name__", fn))
+
+def _run_batch(r: Room, batch) -> int:
+    level = 0
+    for cmd in batch:
+        # Une commande en erreur n'emporte pas le reste du lot
+        try:
+            level = max(level, _LEVEL[_COMMANDS[cmd.kind](r, **cmd.data)])
+        except Exception:
+            actors.stats["errors"] += 1
+            app.logger.exception("salle %s : commande %r en échec", r.code, cmd)
+    if level >= _LEVEL["state"]:
+        save(r, flush=level >= _LEVEL["stage"])
+    return level
+
+@metrics.timed("room_batch")
+def _apply_commands(code: str, batch):
+    """Applique un lot de commandes (une lecture, un enregistrement, une diffusion).
+
+    En multi-workers, la salle est écrite avec un verrou optimiste : trackers, chat,
+    journal, analytics et MQTT du lot sont retenus et ne partent qu'une fois l'écriture
+    passée ; sur conflit, tout est jeté et le lot rejoué sur la salle relue."""
+    cache.take_conflict(code)       # un conflit plus ancien ne concerne pas ce lot
+    for attempt in range(BATCH_RETRIES + 1):
+        r = get_room(code)
+        if not r: return
+        _begin(code)
+        try:
+            level = _run_batch(r, batch)
+        except Exception:
+            _end(code, False)
+            raise
+        if not cache.take_conflict(code):
+            _end(code, True)
+            break
+        # Un autre worker a écrit la salle entre-temps : rien n'est annoncé, on rejoue
+        _end(code, False)
+        app.logger.warning("salle %s : version périmée, lot rejoué (%d)", code, attempt + 1)
+    else:
+        app.logger.error("salle %s : lot abandonné après %d conflits", code, BATCH_RETRIES + 1)
+        return
+    if level >= _LEVEL["stage"]:
+        schedule_room(r)
+    if level:
+        broadcast_state(r, full=level == _LEVEL["full"])
+    if level >= _LEVEL["stage"] and r.is_finished:
+        socketio.emit("summary", {"items": _SUMMARY.get(code, [])}, room=code)
+
+# ------------------ METRIQUES ------------------
+def _register_gauges():
+    metrics.gauge("active_rooms", "Salles avec un chrono en cours", scheduler.active)
+    metrics.gauge("connected_sockets", "Sockets connectés à ce worker", lambda: len(socketio.server.eio.sockets))
+    metrics.gauge("room_pages_cached", "Pages de salle rendues gardées en mémoire", lambda: len(_PAGES))
+    metrics.gauge("online_players", "Joueurs authentifiés connectés à ce worker", presence.total_online)
+    metrics.gauge("room_actors", "Salles avec une file de commandes active", actors.active)
+    metrics.gauge("stage_clocks", "Echéances d'étape gardées en mémoire", clock.size)
+    metrics.gauge("overview_rooms", "Salles suivies par la vue organisateurs", overview.size)
+    metrics.gauge("organizers", "Organisateurs connectés à ce worker", lambda: overview.watchers)
+    metrics.counter("scheduler_errors_total", "Echéances d'étape terminées par une exception", lambda: scheduler.stats["errors"])
+    metrics.gauge("scheduler_timers", "Echéances en attente dans l'ordonnanceur", scheduler.pending)
+    metrics.gauge("cached_rooms", "Salles gardées en cache", lambda: cache.size())
+    metrics.counter("cache_flush_errors_total", "Passages de l'écrivain de fond en échec", lambda: cache.stats["flush_errors"])
+    metrics.counter("cache_conflicts_total", "Ecritures de salle abandonnées (version périmée)", lambda: cache.stats["conflicts"])
+    metrics.gauge("cache_pending_writes", "Objets en attente d'écriture en base", lambda: cache.pending())
+    metrics.counter("chat_errors_total", "Envois de trames de chat en échec", lambda: chat.stats["errors"])
+    metrics.counter("chat_throttled_total", "Messages de chat refusés (débit)", lambda: chat.stats["throttled"])
+    metrics.counter("archive_errors_total", "Passages d'archivage en échec", lambda: archiver.stats["errors"])
+    metrics.counter("archived_rooms_total", "Salles archivées puis supprimées de la base", lambda: archiver.stats["archived"])
+    metrics.gauge("mqtt_queue_depth", "Messages MQTT en attente", lambda: mqtt_bridge.stats()["depth"])
+    metrics.counter("mqtt_dropped_total", "Messages MQTT perdus (file pleine)", lambda: mqtt_bridge.stats()["dropped"])
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not metrics.ENABLED: abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ------------------ ROUTES ------------------
 @app.route("/", methods=["GET","POST"])
 def index():
     if request.method == "POST":
-        code_form = (request.form.get("room_code") or "").strip()
-        team_name = (request.form.get("team_name") or "").strip()
-        code = code_form or secrets.token_hex(2).upper()
-
-        r = get_room(code)
+        code = (request.form.get("room_code") or "").strip()
+        r = get_room(code) if code else None
         if not r:
-            r = save(Room(code=code, team_name=team_name or f"Équipe {code}"))
-            with Session(engine) as s:
-                for c in generate_player_codes(4):
-                    s.add(Player(room_code=code, code=c))
-                s.commit()
+            # Sans code saisi : code neuf de l'allocateur (jamais la salle d'un autre)
+            try:
+                r, players = provisioning.create_room(code) if code else provisioning.create_new_room()
+            except provisioning.CodeTaken:
+                r, players = get_room(code), None       # même code saisi au même instant : on rejoint
+            except provisioning.KeyMissing:
+                abort(503, "Codes de salle automatiques indisponibles : saisir un code.")
+            if players is not None:
+                code = r.code
+                cache.put(r, players)
+                invalidate_room_page(code)
+                pin_scenario(code, request.form.get("scenario"))
         reset_trackers(code, r.current_stage)
+        overview.update(code, state_payload(r))
         return redirect(url_for("room", code=code))
-    return render_template("index.html")
+    return render_template("index.html", scenarios=game_state.registry.names(),
+                           default_scenario=game_state.registry.default)
+
+# Pages de salle rendues (elles ne dépendent que des codes joueurs, fixés à la création)
+ROOM_PAGE_CACHE = int(os.getenv("ROOM_PAGE_CACHE", "5000"))
+_PAGES: "OrderedDict[str, tuple]" = OrderedDict()     # room_code -> (etag, html), LRU
+
+def invalidate_room_page(code: str):
+    _PAGES.pop(code, None)
+
+def room_page(code: str) -> tuple:
+    page = _PAGES.get(code)
+    if page is not None:
+        _PAGES.move_to_end(code)
+        return page
+    html = render_template("room.html", room_code=code, players=list_players(code))
+    page = _PAGES[code] = (hashlib.sha1(html.encode()).hexdigest()[:20], html)
+    if len(_PAGES) > ROOM_PAGE_CACHE:
+        _PAGES.popitem(last=False)
+    return page
 
 @app.route("/room/<code>")
 def room(code):
     r = get_room(code)
     if not r: return redirect(url_for("index"))
     if code not in _HINTS: reset_trackers(code, r.current_stage)
-    players = list_players(code)
-    return render_template("room.html", room_code=code, players=players)
+    etag, html = room_page(code)
+    resp = make_response(html)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"      # revalidation à chaque chargement (304 sans corps)
+    return resp.make_conditional(request)
+
+@app.route("/assets/<path:name>")
+def asset(name):
+    a = assets.get(name)
+    if a is None: abort(404)
+    enc = assets.pick(a, request.headers.get("Accept-Encoding", ""))
+    resp = Response(a.variants[enc], content_type=a.mimetype)
+    if enc: resp.headers["Content-Encoding"] = enc
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    resp.set_etag(f"{a.etag}-{enc}" if enc else a.etag)
+    return resp.make_conditional(request)
+
+@app.route("/leaderboard")
+def leaderboard():
+    """Classement des équipes (index is_finished, score) et agrégats par étape."""
+    limit = max(1, min(request.args.get("limit", 20, type=int), 200))
+    return jsonify({"rooms": analytics_mod.leaderboard(limit, finished_only=request.args.get("all") != "1"),
+                    "stats": analytics_mod.summary()})
+
+# ------------------ ADMIN ------------------
+def _require_admin():
+    # En-tête seulement : un jeton dans l'URL finirait dans les journaux d'accès et des proxys
+    token = request.headers.get("X-Admin-Token")
+    if not ADMIN_TOKEN or not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        abort(403)
+
+@app.route("/admin/scenarios/reload", methods=["POST"])
+def admin_reload_scenarios():
+    """Recharge les énigmes à chaud ; les parties en cours gardent leur version."""
+    _require_admin()
+    names = game_state.reload()
+    if backend.shared:
+        _RELOADS["seen"] = backend.get("registry", "reloads", 0) + 1
+        backend.set("registry", "reloads", _RELOADS["seen"])
+    return jsonify({n: game_state.scenario(n).version for n in names})
+
+@app.route("/admin/rooms/bulk", methods=["POST"])
+def admin_bulk_rooms():
+    """Pré-crée N salles pour un événement : ?format=json (défaut) | csv | html (fiches à imprimer)."""
+    _require_admin()
+    body = request.get_json(silent=True) or request.form
+    try:
+        count = max(1, min(int(body.get("count", 10)), provisioning.BULK_MAX_ROOMS))
+        players = max(1, min(int(body.get("players", provisioning.PLAYERS_PER_ROOM)), provisioning.MAX_PLAYERS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "count et players doivent être des entiers."}), 400
+    try:
+        created = provisioning.bulk_create_rooms(count, n_players=players)
+    except provisioning.KeyMissing as e:
+        return jsonify({"error": str(e)}), 503
+    for r, ps in created:
+        cache.put(r, ps)
+        invalidate_room_page(r.code)
+        pin_scenario(r.code, body.get("scenario"))
+        reset_trackers(r.code, 0)
+        overview.update(r.code, state_payload(r))
+    fmt = request.args.get("format", "json")
+    if fmt == "csv":
+        return Response(provisioning.export_csv(created, players), mimetype="text/csv",
+                        headers={"Content-Disposition": "attachment; filename=rooms.csv"})
+    if fmt == "html":
+        return render_template("sheets.html", rooms=created)
+    return jsonify([{"room": r.code, "players": [p.code for p in ps]} for r, ps in created])
+
+@app.route("/admin/rooms.csv")
+def admin_rooms_csv():
+    """Export des salles (toutes, ou ?active=1) et de leurs codes joueurs."""
+    _require_admin()
+    rooms = provisioning.rooms_with_players(active_only=request.args.get("active") == "1")
+    width = max([len(ps) for _, ps in rooms] or [provisioning.PLAYERS_PER_ROOM])
+    return Response(provisioning.iter_csv(rooms, width), mimetype="text/csv",
+                    headers={"Content-Disposition": "attachment; filename=rooms.csv"})
+
+@app.route("/admin/results.<fmt>")
+def admin_results(fmt):
+    """Export de toutes les salles (score, erreurs, indices…), streamé : .csv ou .json."""
+    _require_admin()
+    if fmt not in ("csv", "json"): abort(404)
+    cache.flush(); analytics.flush()        # export à jour des parties en cours
+    return Response(analytics_mod.iter_export(fmt, finished_only=request.args.get("finished") == "1"),
+                    mimetype="text/csv" if fmt == "csv" else "application/json",
+                    headers={"Content-Disposition": f"attachment; filename=results.{fmt}"})
+
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """Profil échantillonné des prochaines secondes :
+    ?seconds=10&interval=0.005&threads=all|main&format=collapsed (flamegraph) | json."""
+    _require_admin()
+    prof = profiler.run(request.args.get("seconds", 10.0, type=float),
+                        request.args.get("interval", 0.005, type=float),
+                        wait=socketio.sleep, main_only=request.args.get("threads") == "main")
+    if prof is None:
+        return jsonify({"error": "Un profil est déjà en cours."}), 409
+    if request.args.get("format") == "json":
+        return jsonify(prof.summary())
+    return Response(prof.collapsed(), mimetype="text/plain",
+                    headers={"Content-Disposition": "attachment; filename=profile.collapsed"})
+
+@app.route("/admin/retention/run", methods=["POST"])
+def admin_run_retention():
+    """Lance tout de suite un passage d'archivage (sinon toutes les RETENTION_INTERVAL s)."""
+    _require_admin()
+    if not archiver.enabled:
+        return jsonify({"archived": 0, "enabled": False})
+    return jsonify({"archived": archiver.run_once(), "enabled": True})
 
 # ------------------ SOCKETS ------------------
 @socketio.on("auth")
+@metrics.timed("auth")
 def on_auth(data):
     room_code = data.get("room")
     pcode = (data.get("player_code") or "").strip().upper()
@@ -164,137 +610,339 @@ def on_auth(data):
     if not p:
         emit("auth_result", {"ok": False, "msg": "Code joueur invalide."})
         return
-    p.name = name; p.authenticated = True; save(p)
-    join_room(room_code)
-    emit("auth_result", {"ok": True, "msg": f"Bienvenue {name} !"})
-    emit("chat", {"system":True, "msg": f"{name} est connecté."}, room=room_code)
+    if p.name != name or not p.authenticated:
+        p.name = name; p.authenticated = True; save(p)
+    _take_seat(room_code, pcode, name)
+    emit("auth_result", {"ok": True, "msg": f"Bienvenue {name} !", "name": name,
+                         "token": tokens.issue(room_code, pcode, name)})
+    hist = chat.history(room_code)
+    if hist: emit("chat", hist)      # contexte récent pour qui arrive en cours de partie
+    chat.say(room_code, f"{name} est connecté.")
     r = get_room(room_code)
-    if r: emit("state", state_payload(r))
+    if r: emit("state", state_snapshot(r))
+
+@socketio.on("resume")
+@metrics.timed("resume")
+def on_resume(data):
+    # Reconnexion (Wi-Fi instable, rechargement) : le jeton signé remplace le code joueur,
+    # sans lecture ni écriture du joueur en base
+    seat = tokens.verify(data.get("token"))
+    r = get_room(seat.room) if seat and seat.room == data.get("room") else None
+    if not r:
+        emit("auth_result", {"ok": False, "resumed": True, "msg": "Session expirée : reconnecte-toi."})
+        return
+    _take_seat(seat.room, seat.player, seat.name)
+    emit("auth_result", {"ok": True, "resumed": True, "name": seat.name, "msg": f"Reconnecté : {seat.name}."})
+    if data.get("history"):
+        hist = chat.history(seat.room)
+        if hist: emit("chat", hist)
+    emit("state", state_snapshot(r))
+
+def _take_seat(code: str, pcode: str, name: str):
+    join_room(code)
+    if presence.join(request.sid, code, pcode, name):
+        socketio.emit("presence", {"online": presence.online(code)}, room=code)
+
+@socketio.on("resync")
+@metrics.timed("resync")
+def on_resync(data):
+    # Le client a raté un patch : on lui renvoie un instantané complet
+    r = get_room(data.get("room"))
+    if r: emit("state", state_snapshot(r))
+
+@socketio.on("time_sync", namespace=ORGANIZER_NS)
+@socketio.on("time_sync")
+@metrics.timed("time_sync")
+def on_time_sync(data):
+    # Ack : le client en déduit l'écart d'horloge (t0, heure serveur, t1)
+    return clock.sync((data or {}).get("t0"))
+
+def _seated_room(code) -> Room | None:
+    """Salle de la commande, si ce socket y est assis (sinon ni acteur ni lecture en base)."""
+    seat = presence.seat(request.sid)
+    if seat is None or seat.room != code:
+        return None
+    return get_room(code)
 
 @socketio.on("start")
+@metrics.timed("start")
 def on_start(data):
-    code = data.get("room"); r = get_room(code)
-    if not r: return
-    # Autoriser démarrage même si partie finie (pour Rejouer), ou vérifier min 2 joueurs si partie neuve
-    if r.started_at and not r.is_finished:
-        emit("chat", {"system":True, "msg":"La mission est déjà en cours."}, room=code)
-        return
-    # Démarrage/Redémarrage
-    r.started_at = datetime.now(timezone.utc)
-    r.stage_started_at = datetime.now(timezone.utc)
-    r.is_finished = False
-    r.success = False
-    r.current_stage = 0 if r.missed_count > 0 or r.started_at else r.current_stage
-    save(r)
-    start_watcher(code)
-    emit("chat", {"system":True,"msg":"La mission démarre !"}, room=code)
-    emit("state", state_payload(r), room=code)
+    code = data.get("room")
+    if _seated_room(code): actors.post(code, "start")
 
 @socketio.on("replay")
+@metrics.timed("replay")
 def on_replay(data):
-    code = data.get("room"); r = get_room(code)
-    if not r: return
-    # Remise à zéro contrôlée (sans toucher à la DB structurelle)
-    r.is_finished = False
-    r.success = False
-    r.missed_count = 0
-    r.current_stage = 0
-    r.stage_started_at = datetime.now(timezone.utc)
-    save(r)
-    reset_trackers(code, 0)
-    start_watcher(code)
-    emit("chat", {"system":True,"msg":"🔁 Rejouer : la salle a été réinitialisée."}, room=code)
-    emit("state", state_payload(r), room=code)
+    code = data.get("room")
+    if _seated_room(code): actors.post(code, "replay")
 
 @socketio.on("hint")
+@metrics.timed("hint")
 def on_hint(data):
-    code = data.get("room"); r = get_room(code)
-    if not r or r.is_finished: return
-    hs = _HINTS.get(code) or {"stage": r.current_stage, "used": 0}
-    if hs["stage"] != r.current_stage:
-        hs = {"stage": r.current_stage, "used": 0}; _HINTS[code]=hs
-    nxt = game_state.get_hint(r.current_stage, hs["used"])
-    if nxt:
-        hs["used"] += 1
-        emit("chat", {"system":True, "msg": f"🧩 Indice {hs['used']}: {nxt}"}, room=code)
-    else:
-        emit("chat", {"system":True, "msg": "Aucun indice supplémentaire disponible."}, room=code)
-    emit("state", state_payload(r), room=code)
+    code = data.get("room")
+    if _seated_room(code): actors.post(code, "hint")
 
 @socketio.on("chat_message")
+@metrics.timed("chat_message")
 def on_chat_message(data):
     code = data.get("room"); text = (data.get("text") or "").strip()
     name = (data.get("name") or "Agent").strip()
     if not code or not text: return
-    emit("chat", {"system":False, "msg": f"{name}: {text}"}, room=code)
+    seat = presence.seat(request.sid)
+    if seat is None or seat.room != code: return    # pas d'historique pour une salle où l'on n'est pas
+    if not chat.allow(request.sid):
+        emit("chat", {"system":True, "msg":"⏳ Trop de messages, patientez un instant."})
+        return
+    chat.say(code, f"{name}: {text}", system=False)
+
+@socketio.on("disconnect")
+@metrics.timed("disconnect")
+def on_disconnect(*_args):
+    chat.drop(request.sid)
+    seat = presence.leave(request.sid)
+    if seat is not None:
+        socketio.emit("presence", {"online": presence.online(seat.room)}, room=seat.room)
 
 @socketio.on("submit")
+@metrics.timed("submit")
 def on_submit(data):
-    code = data.get("room"); payload = data.get("payload",{})
-    r = get_room(code)
-    if not r or r.is_finished: return
-    if remaining_stage_time(r) <= 0:
+    code = data.get("room")
+    stage = data.get("stage")
+    r = _seated_room(code)
+    if not r: return
+    if not isinstance(stage, int):
+        # Ancien client : la réponse vaut pour l'étape courante à la réception
+        stage = r.current_stage
+    actors.post(code, "submit", stage=stage, payload=data.get("payload") or {})
+
+# ------------------ ORGANISATEURS ------------------
+# Namespace à part : pas membre des salles, donc ni chat ni état par salle,
+# seulement la vue d'ensemble (services/overview.py).
+@socketio.on("connect", namespace=ORGANIZER_NS)
+@metrics.timed("organizer_connect")
+def on_organizer_connect(auth=None):
+    # Jeton dans le paquet `auth` de connexion seulement (jamais dans l'URL)
+    token = auth.get("token") if isinstance(auth, dict) else None
+    if not ADMIN_TOKEN or not isinstance(token, str) or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise ConnectionRefusedError("unauthorized")
+    overview.watchers += 1
+    emit("overview", overview.snapshot())
+
+@socketio.on("disconnect", namespace=ORGANIZER_NS)
+@metrics.timed("organizer_disconnect")
+def on_organizer_disconnect(*_args):
+    overview.watchers = max(0, overview.watchers - 1)
+
+@socketio.on("overview", namespace=ORGANIZER_NS)
+@metrics.timed("organizer_overview")
+def on_organizer_overview(_data=None):
+    # Vue complète à la demande (onglet revenu au premier plan…)
+    emit("overview", overview.snapshot())
+
+@app.route("/organizer")
+def organizer():
+    """Tableau de bord des salles ; le jeton admin est demandé par la page."""
+    return render_template("organizer.html")
+
+# ------------------ ARCHIVAGE ------------------
+def forget_rooms(codes):
+    """Oublie tout l'état mémoire des salles archivées (trackers, cache, chrono, chat)."""
+    for code in codes:
+        for t in (_HINTS, _SUMMARY, _CODES, _SCENARIO):
+            t.pop(code, None)
+        _STREAM.forget(code)
+        presence.forget(code)
+        overview.forget(code)
+        clock.forget(code)
+        invalidate_room_page(code)
+        chat.forget(code)
+        event_log.forget(code)
+        scheduler.drop(code)
+        cache.evict(code)
+
+# ------------------ REPRISE APRES CRASH ------------------
+def recover_rooms() -> int:
+    """Reconstruit les trackers et reprogramme les chronos des parties en cours."""
+    rooms = event_log.recover()
+    for r, st in rooms:
+        _HINTS[r.code] = st["hints"]
+        _SUMMARY[r.code] = st["summary"]
+        _CODES[r.code] = st["codes"]
+        if st.get("scenario"):
+            _SCENARIO[r.code] = st["scenario"]
+        cache.put(r)
+        schedule_room(r)
+        overview.update(r.code, state_payload(r))
+    return len(rooms)
+
+def adopt_rooms() -> int:
+    """Multi-workers : reprogramme les chronos des salles d'un worker mort (redémarré, tué)."""
+    n = 0
+    for code in backend.adopt():
+        r = get_room(code)
+        if r is None or r.is_finished:
+            backend.release(code)
+            continue
+        schedule_room(r)
+        n += 1
+    if n:
+        app.logger.info("%d salle(s) reprise(s) d'un worker arrêté", n)
+    return n
+
+def _keep_alive():
+    while True:
+        socketio.sleep(HEARTBEAT)
+        try:
+            backend.heartbeat()
+            adopt_rooms()
+        except Exception:
+            app.logger.exception("signe de vie / reprise des salles")
+
+# ------------------ FABRIQUE ------------------
+_READY = {"created": False, "warm": False}
+
+def create_app(config: dict | None = None, warm: str = "background") -> Flask:
+    """Branche l'état partagé, Socket.IO, le cache et les tâches de fond (idempotent).
+
+    Aucune E/S ici : `warm` = "background" (défaut) lance `warm_up()` en
+    tâche de fond, "sync" l'exécute tout de suite, "lazy" le laisse au
+    premier accès à la base.
+    """
+    global backend, cache, chat, event_log, analytics, scheduler, actors, archiver, tokens
+    global _HINTS, _SUMMARY, _CODES, _SCENARIO, _STREAM
+    if _READY["created"]:
+        return app
+    app.config.update(config or {})
+    # Moteur réglé (WAL, busy_timeout, pool) créé au premier accès — voir services/db.py
+    db.configure(app.config.get("DB_URI"))
+    db.init_app(app)            # une session par requête / événement Socket.IO
+    # Reprise de session (services/presence.py) : refusée avec la clé d'exemple, sauf en debug
+    tokens = ResumeTokens(app.config["SECRET_KEY"], allow_dev=app.debug)
+    if not tokens.enabled:
+        app.logger.warning("SECRET_KEY non défini : jetons de reprise désactivés")
+    if not (app.debug or os.getenv("ROOM_CODE_KEY") or os.getenv("SECRET_KEY")):
+        app.logger.warning("ni ROOM_CODE_KEY ni SECRET_KEY : codes de salle automatiques désactivés")
+    assets.build()              # empreintes + gzip/brotli de static/, une fois au démarrage
+
+    # Etat partagé : mémoire (1 process) ou SQLite (N workers, STATE_BACKEND=sqlite:///state.db)
+    backend = make_backend()
+    sio_opts = {}
+    if os.getenv("SOCKETIO_MESSAGE_QUEUE"):            # redis://, amqp://, kafka://…
+        sio_opts["message_queue"] = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    elif backend.client_manager() is not None:
+        sio_opts["client_manager"] = backend.client_manager()
+    socketio.init_app(app, async_mode="eventlet", cors_allowed_origins="*", **sio_opts)
+    spawn, eio = socketio.start_background_task, socketio.server.eio
+    empty = eio.get_queue_empty_exception()
+
+    # Ecritures retenues pendant un lot de commandes, validées avec l'écriture de la salle
+    _HINTS = StagedTracker(backend.tracker("hints"))
+    _SUMMARY = StagedTracker(backend.tracker("summary"))
+    _CODES = StagedTracker(backend.tracker("codes"))
+    _SCENARIO = StagedTracker(backend.tracker("scenario"))
+    _STREAM = StateStream(backend.tracker("stream"))
+
+    # Services adossés à sqlmodel : construits au premier usage ou par warm_up()
+    cache = Deferred(lambda: _make_cache(spawn, eio, empty))
+    event_log = Deferred(_make_event_log)
+    analytics = Deferred(_make_analytics)
+    archiver = Deferred(lambda: _make_archiver(spawn))
+
+    # Chat : une trame groupée par salle et par tick, historique borné
+    chat = ChatHub(socketio.emit, store=backend.tracker("chat") if backend.shared else None)
+    chat.start(spawn, socketio.sleep, eio.create_queue(), empty)
+
+    scheduler = StageScheduler(on_color=_on_stage_color, on_timeout=_on_stage_timeout,
+                               spawn=spawn, queue=eio.create_queue(), empty=empty, clock=clock.now)
+    actors = RoomActors(handle=_apply_commands, spawn=spawn, make_queue=eio.create_queue, empty=empty,
+                        batch_window=float(os.getenv("ACTOR_BATCH_WINDOW", "0.01")))
+
+    # Multi-workers : signe de vie, et reprise des chronos des workers disparus
+    if backend.shared:
+        backend.heartbeat()
+        spawn(_keep_alive)
+        # Joueurs en ligne : comptés sur tous les workers vivants
+        presence.share(backend.tracker("presence"), backend.worker, backend.alive_workers)
+        overview.share(backend.tracker("overview"))
+
+    # Vue organisateurs : une trame agrégée par tick (OVERVIEW_TICK), seulement les salles modifiées
+    # (en multi-workers, les organisateurs peuvent être connectés à un autre worker)
+    fanout = backend.shared or bool(sio_opts)
+    overview.start(spawn, socketio.sleep,
+                   lambda frame: socketio.emit("overview_patch", frame, namespace=ORGANIZER_NS),
+                   watched=lambda: fanout or overview.watchers > 0)
+
+    _register_gauges()
+    # Etiquettes du profileur (/admin/profile) : rien n'est installé tant qu'il ne tourne pas
+    profiler.tag_many((f"socket:{ev}", fn) for ev, fn, _ns in socketio.handlers)
+    profiler.tag_many([
+        ("scheduler", StageScheduler._fire_due), ("scheduler:timeout", _on_stage_timeout),
+        ("scheduler:color", _on_stage_color), ("actor", RoomActors._run), ("room_batch", _apply_commands),
+        ("db:get_room", get_room), ("db:save", save), ("db:list_players", list_players),
+        ("db:get_player", get_player),
+        ("mqtt:enqueue", mqtt_bridge._pub), ("mqtt:publish", mqtt_bridge.Publisher._run),
+        ("chat:flush", ChatHub.flush),
+    ])
+    _READY["created"] = True
+    if warm == "sync":
+        warm_up()
+    elif warm == "background":
+        spawn(warm_up)
+    return app
+
+def _make_cache(spawn, eio, empty):
+    from services.room_cache import RoomCache
+    # Room/Player vivants en RAM, écrits en base par lot (write-behind)
+    # (en multi-workers, la base reste la référence : cache en écriture immédiate)
+    c = RoomCache(flush_interval=float(os.getenv("FLUSH_INTERVAL", "2")), shared=backend.shared)
+    c.start(spawn, eio.create_queue(), empty)
+    atexit.register(c.flush)
+    profiler.tag("db:flush", RoomCache.flush)
+    return c
+
+def _make_event_log():
+    from services.event_log import EventLog
+    # Journal d'événements (écrit par lot avec le cache) pour la reprise après crash
+    log = EventLog(snapshot_every=int(os.getenv("SNAPSHOT_EVERY", "20")))
+    cache.also_flush(log.flush)
+    atexit.register(log.flush)
+    profiler.tag("db:event_log", EventLog.flush)
+    return log
+
+def _make_analytics():
+    # Agrégats de résultats (par étape / scénario), écrits avec le cache
+    a = analytics_mod.Analytics()
+    cache.also_flush(a.flush)
+    atexit.register(a.flush)
+    return a
+
+def _make_archiver(spawn):
+    from services.retention import Archiver
+    # Salles finies depuis RETENTION_MAX_AGE_H : archivées en JSONL compressé puis supprimées
+    a = Archiver(on_archived=forget_rooms, busy=lambda: cache.live_codes() + actors.codes())
+    a.start(spawn, socketio.sleep)
+    return a
+
+def warm_up():
+    """Préchauffage : base + schéma, énigmes, reprise des parties, connexion MQTT."""
+    if _READY["warm"]:
         return
-    cur = r.current_stage
-    ok = game_state.validate_stage(cur, payload)
-
-    if ok:
-        # --- Feedback matériel
-        led(code, True); buzzer(code, 120)
-
-        # --- Débrief éventuel
-        debrief = game_state.get_debrief(cur)
-        if debrief:
-            prompt = game_state.get_stage_prompt(cur)
-            _SUMMARY.setdefault(code, []).append({
-                "stage": cur,
-                "title": prompt.get("title",""),
-                "debrief": debrief
-            })
-            emit("chat", {"system":True,"msg":"🎓 Débrief: " + debrief}, room=code)
-
-        # --- NEW : code de l'étape
-        if cur in _STAGE_CODES:
-            val = _STAGE_CODES[cur]
-            _CODES.setdefault(code, {})[cur] = val
-            emit("chat", {"system": True, "msg": f"🔐 Code {cur+1} = {val}"}, room=code)
-
-        # Passage à l'étape suivante
-        r.current_stage += 1
-        if r.current_stage >= game_state.total_stages():
-            r.is_finished=True
-            r.success = (r.missed_count == 0)
-        else:
-            r.stage_started_at = datetime.now(timezone.utc)
-        save(r)
-
-        # --- NEW : à l’entrée en salle 4, donner l’indice final
-        if not r.is_finished and r.current_stage == 3:
-            cs = _CODES.get(code, {})
-            if all(k in cs for k in (0, 1, 2)):
-                total = cs[0] + cs[1] + cs[2]
-                moyenne = round(total / 3)
-                emit(
-                    "chat",
-                    {"system": True,
-                     "msg": f"🧩 Indice final : faites la moyenne des 3 codes. "
-                            f"(Code1 + Code2 + Code3) / 3 = {moyenne}. "
-                            f"Interprétez-le comme JJMM pour trouver la date."},
-                    room=code
-                )
-
-        _HINTS[code] = {"stage": r.current_stage, "used": 0}
-        emit("chat", {"system":True,"msg":"✅ Énigme réussie !"}, room=code)
-
+    _READY["warm"] = True
+    t0 = time.perf_counter()
+    for service in (cache, event_log, analytics, archiver):
+        service.resolve()
+    db.get_engine()
+    game_state.registry.names()
+    # En multi-workers, l'état partagé survit au redémarrage d'un worker,
+    # mais pas les chronos : on reprend ceux des workers arrêtés
+    if not backend.shared:
+        recover_rooms()
     else:
-        buzzer(code, 300)
-        emit("chat", {"system":True,"msg":"❌ Mauvaise réponse."}, room=code)
-
-    emit("state", state_payload(r), room=code)
-    if r.is_finished:
-        socketio.emit("summary", {"items": _SUMMARY.get(code, [])}, room=code)
+        adopt_rooms()
+    mqtt_bridge.warm_up()
+    app.logger.info("warm-up en %.0f ms", (time.perf_counter() - t0) * 1000)
 
 # ------------------ MAIN ------------------
 if __name__ == "__main__":
+    create_app(warm="sync")
     socketio.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 5050)))
-
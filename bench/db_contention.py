@@ -0,0 +1,60 @@
+# bench/db_contention.py
+"""Contention en écriture SQLite : moteur par défaut vs moteur réglé (services/db.py).
+
+N threads simulent autant de salles qui enregistrent leur progression
+(une transaction courte par écriture, comme un flush de salle).
+
+    python bench/db_contention.py --rooms 200 --writes 20 --threads 16
+"""
+from __future__ import annotations
+import argparse, os, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlmodel import SQLModel, Session, create_engine, select
+from models import Room
+from services import db
+
+def run(engine, rooms: int, writes: int, threads: int):
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        s.add_all(Room(code=f"C{i:05d}") for i in range(rooms))
+        s.commit()
+    codes = [f"C{i:05d}" for i in range(rooms)]
+    errors, done = [0], [0]
+    lock = threading.Lock()
+
+    def worker(part):
+        for code in part:
+            for _ in range(writes):
+                try:
+                    with Session(engine) as s:
+                        r = s.exec(select(Room).where(Room.code == code)).one()
+                        r.current_stage += 1
+                        s.add(r); s.commit()
+                    with lock: done[0] += 1
+                except Exception:
+                    with lock: errors[0] += 1
+
+    parts = [codes[i::threads] for i in range(threads)]
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=worker, args=(p,)) for p in parts]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    elapsed = time.perf_counter() - t0
+    engine.dispose()
+    return done[0], errors[0], elapsed
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rooms", type=int, default=200)
+    ap.add_argument("--writes", type=int, default=20)
+    ap.add_argument("--threads", type=int, default=16)
+    args = ap.parse_args()
+    for label, make in (
+        ("défaut", lambda uri: create_engine(uri, connect_args={"check_same_thread": False})),
+        ("réglé ", lambda uri: db.make_engine(uri)),
+    ):
+        uri = f"sqlite:///{tempfile.mkdtemp()}/contention.db"
+        ok, err, el = run(make(uri), args.rooms, args.writes, args.threads)
+        print(f"{label}: {ok} écritures, {err} erreurs (database is locked…), "
+              f"{ok / el:.0f} écritures/s en {el:.2f}s")
@@ -0,0 +1,166 @@
+# bench/load_rooms.py
+"""Banc de charge : N salles × 4 joueurs pilotés par Socket.IO.
+
+Deux modes :
+- en process (défaut) : l'app est importée, les sockets passent par le
+  client de test Flask-SocketIO ; on mesure aussi les requêtes SQL par
+  événement et la mémoire par salle.
+- `--spawn` : lance `app.py` dans un sous-process et pilote de vrais
+  clients websocket (python-socketio[client] requis).
+
+    python bench/load_rooms.py --rooms 200
+    python bench/load_rooms.py --rooms 50 --spawn --port 5099
+
+MQTT est désactivé, la base est un fichier SQLite temporaire.
+"""
+from __future__ import annotations
+import argparse, os, statistics, subprocess, sys, tempfile, time, tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Réponses du scénario par défaut (mission-gaia), dans l'ordre des étapes
+SOLUTIONS = [
+    {"assign": {"verre": "pot-verre", "compost": "epluchure", "plastique": "bouteille-plastique"}},
+    {"answer": "abeille"},
+    {"mix": {"eolien": 50, "solaire": 40, "hydro": 60, "fossile": 30}},
+    {"date": "24/07/2025"},
+]
+
+def script(room: str):
+    """Trafic scripté d'une partie : (joueur, événement, données)."""
+    yield 0, "start", {"room": room}
+    for stage, sol in enumerate(SOLUTIONS):
+        yield stage % 4, "hint", {"room": room}
+        yield (stage + 1) % 4, "chat_message", {"room": room, "name": "Agent", "text": f"étape {stage}"}
+        yield (stage + 2) % 4, "submit", {"room": room, "stage": stage, "payload": {"answer": "faux", "date": "faux"}}
+        yield (stage + 3) % 4, "submit", {"room": room, "stage": stage, "payload": sol}
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def report(title, lat, elapsed, extra):
+    n = len(lat)
+    print(f"== {title}")
+    print(f"events          : {n}")
+    print(f"events/sec      : {n / elapsed:.0f}")
+    print(f"latency p50 (ms): {pct(lat, 50) * 1000:.2f}")
+    print(f"latency p99 (ms): {pct(lat, 99) * 1000:.2f}")
+    print(f"latency avg (ms): {statistics.mean(lat) * 1000 if lat else 0:.2f}")
+    for k, v in extra.items():
+        print(f"{k:<16}: {v}")
+
+# ------------------ EN PROCESS ------------------
+def run_inproc(n_rooms: int):
+    os.environ.setdefault("MQTT_DISABLED", "1")
+    os.environ.setdefault("ACTOR_BATCH_WINDOW", "0")   # le script n'envoie pas de rafales
+    os.environ["DB_URI"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import event
+    import app as A
+    A.create_app(warm="sync")
+
+    queries = {"n": 0}
+    event.listen(A.db.get_engine(), "before_cursor_execute", lambda *a, **k: queries.__setitem__("n", queries["n"] + 1))
+
+    tracemalloc.start()
+    mem0 = tracemalloc.get_traced_memory()[0]
+    http = A.app.test_client()
+    rooms = []
+    for i in range(n_rooms):
+        code = f"B{i:04d}"
+        http.post("/", data={"room_code": code})
+        clients = []
+        for j, p in enumerate(A.list_players(code)):
+            c = A.socketio.test_client(A.app, flask_test_client=http)
+            c.emit("auth", {"room": code, "player_code": p.code, "name": f"J{j}"})
+            clients.append(c)
+        rooms.append((code, clients))
+
+    lat, q0, t0 = [], queries["n"], time.perf_counter()
+    scripts = [(clients, script(code)) for code, clients in rooms]
+    while scripts:
+        alive = []
+        for clients, it in scripts:
+            step = next(it, None)
+            if step is None:
+                continue
+            who, ev, data = step
+            t = time.perf_counter()
+            clients[who].emit(ev, data)
+            lat.append(time.perf_counter() - t)
+            alive.append((clients, it))
+        scripts = alive
+        A.socketio.sleep(0)         # laisse les acteurs des salles traiter leurs files
+        for _, clients in rooms:
+            for c in clients:
+                c.get_received()
+    while any(not A.get_room(code).is_finished for code, _ in rooms):
+        A.socketio.sleep(0.001)
+    elapsed = time.perf_counter() - t0
+    mem = tracemalloc.get_traced_memory()[0] - mem0
+    report(f"in-process, {n_rooms} rooms", lat, elapsed, {
+        "db queries/event": f"{(queries['n'] - q0) / max(1, len(lat)):.2f}",
+        "memory/room (KB)": f"{mem / max(1, n_rooms) / 1024:.1f}",
+    })
+
+# ------------------ SOUS-PROCESS + WEBSOCKETS ------------------
+def run_spawn(n_rooms: int, port: int):
+    import re, threading, socketio, requests
+    env = dict(os.environ, MQTT_DISABLED="1", PORT=str(port),
+               DB_URI=f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "app.py")], cwd=ROOT, env=env)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(base, timeout=0.5); break
+            except Exception:
+                time.sleep(0.1)
+        rooms = []
+        for i in range(n_rooms):
+            code = f"B{i:04d}"
+            page = requests.post(base + "/", data={"room_code": code}).text
+            m = re.search(r"<code>([^<]*)</code>", page)
+            codes = [c.strip() for c in (m.group(1) if m else "").split(",") if c.strip()]
+            clients = []
+            for j, pc in enumerate(codes):
+                c = socketio.Client()
+                c.connect(base, transports=["websocket"])
+                c.emit("auth", {"room": code, "player_code": pc, "name": f"J{j}"})
+                clients.append(c)
+            rooms.append((code, clients))
+
+        # Chaque événement scripté provoque au moins un `chat` diffusé à la salle :
+        # latence = émission -> première réception par un membre de la salle
+        lat, t0 = [], time.perf_counter()
+        for code, clients in rooms:
+            got = threading.Event()
+            for c in clients:
+                c.on("chat", lambda *_a: got.set())
+            for who, ev, data in script(code):
+                got.clear()
+                t = time.perf_counter()
+                clients[who].emit(ev, data)
+                if got.wait(2.0):
+                    lat.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - t0
+        report(f"websocket, {n_rooms} rooms", lat, elapsed, {"db queries/event": "n/a (sous-process)"})
+        for _, clients in rooms:
+            for c in clients:
+                c.disconnect()
+    finally:
+        proc.terminate(); proc.wait(5)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rooms", type=int, default=100)
+    ap.add_argument("--spawn", action="store_true", help="lancer app.py et utiliser de vrais websockets")
+    ap.add_argument("--port", type=int, default=5099)
+    args = ap.parse_args()
+    if args.spawn:
+        run_spawn(args.rooms, args.port)
+    else:
+        run_inproc(args.rooms)
@@ -0,0 +1,146 @@
+# bench/mqtt_devices.py
+"""Simulateur de boîtiers MQTT : débit et resynchronisation, mode "rooms" vs "site".
+
+Le pont (services/mqtt_bridge.py, file + thread éditeur réels) publie vers
+un broker en mémoire. Des boîtiers simulés s'abonnent : un par salle en
+mode "rooms", quelques passerelles de site (--gateways) en mode "site".
+Pendant la partie, une fraction des boîtiers (--drop) se déconnecte une
+seconde puis se reconnecte ; à la fin, on compare l'état vu par chaque
+boîtier (chrono, led) au dernier état envoyé par le serveur.
+
+    python bench/mqtt_devices.py --rooms 200 --rate 2000 --seconds 5
+"""
+from __future__ import annotations
+import argparse, json, os, random, sys, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.mqtt_bridge import MQTT_PREFIX, Bridge, FakeBroker, FakeClient
+
+COLORS = ("green", "yellow", "red", "off")
+_FIELDS = {"c": "chrono", "l": "led"}      # champs compacts du mode site
+
+def _expand(st: dict) -> dict:
+    return {_FIELDS[k]: (bool(v) if k == "l" else v) for k, v in st.items() if k in _FIELDS}
+
+class Device:
+    """Boîtier (ou passerelle de site) qui suit l'état de quelques salles."""
+    def __init__(self, broker: FakeBroker, rooms, mode: str, site: str = "bench"):
+        self.broker = broker
+        self.rooms = set(rooms)
+        self.mode = mode
+        self.frame_topic = f"{MQTT_PREFIX}/site/{site}/frame"
+        self.state = {r: {} for r in rooms}
+        self.buzzes = 0
+        self.seq = None
+        self.resyncs = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        self.seq = None
+        if self.mode == "site":
+            self.broker.subscribe(self.frame_topic, self.on_message)
+            self.broker.subscribe(f"{MQTT_PREFIX}/+/state", self.on_message)
+        else:
+            for r in self.rooms:
+                self.broker.subscribe(f"{MQTT_PREFIX}/{r}/+", self.on_message)
+
+    def disconnect(self):
+        self.broker.unsubscribe(self.on_message)
+
+    def on_message(self, topic: str, data: bytes):
+        msg = json.loads(data)
+        parts = topic.split("/")
+        with self._lock:
+            if topic == self.frame_topic:
+                if self.seq is not None and msg["seq"] != self.seq + 1:
+                    self.resyncs += 1       # trame perdue : on relira les états retenus
+                self.seq = msg["seq"]
+                for room, ch in msg["set"].items():
+                    if room in self.rooms:
+                        self.state[room].update(_expand(ch))
+                self.buzzes += sum(1 for room, _ms in msg.get("bz", ()) if room in self.rooms)
+                return
+            room, kind = parts[1], parts[2]
+            if room not in self.rooms:
+                return
+            if kind == "state":
+                self.state[room] = _expand(msg)
+            elif kind == "chrono":
+                self.state[room]["chrono"] = msg["color"]
+            elif kind == "led":
+                self.state[room]["led"] = msg["on"]
+            elif kind == "buzzer":
+                self.buzzes += 1
+
+def run(mode: str, rooms: int, rate: float, seconds: float, drop: float, gateways: int, tick: float):
+    broker = FakeBroker()
+    bridge = Bridge(mode=mode, client_factory=lambda: FakeClient(broker), site="bench", tick=tick)
+    codes = [f"R{i:04d}" for i in range(rooms)]
+    if mode == "site":
+        devices = [Device(broker, codes[i::gateways], mode) for i in range(gateways)]
+    else:
+        devices = [Device(broker, [c], mode) for c in codes]
+    for d in devices:
+        d.connect()
+    bridge.publisher.start()
+
+    truth = {c: {} for c in codes}
+    rnd = random.Random(42)
+    offline = rnd.sample(devices, max(1, int(len(devices) * drop))) if drop > 0 else []
+    step = 0.01
+    per_step = max(1, int(rate * step))
+    t0 = time.monotonic()
+    updates, cut, back = 0, False, False
+    while (now := time.monotonic() - t0) < seconds:
+        if not cut and now >= seconds / 2:
+            for d in offline: d.disconnect()
+            cut = True
+        if cut and not back and now >= seconds / 2 + 1.0:
+            for d in offline: d.connect()
+            back = True
+        for _ in range(per_step):
+            c = rnd.choice(codes)
+            x = rnd.random()
+            if x < 0.6:
+                color = rnd.choice(COLORS)
+                truth[c]["chrono"] = color; bridge.chrono_color(c, color)
+            elif x < 0.9:
+                on = rnd.random() < 0.5
+                truth[c]["led"] = on; bridge.led(c, on)
+            else:
+                bridge.buzzer(c, 120)
+            updates += 1
+        time.sleep(step)
+    if cut and not back:
+        for d in offline: d.connect()
+    # Laisse partir la dernière trame et vider la file
+    deadline = time.monotonic() + 5
+    while (bridge.outbox.depth() or (bridge.frames and bridge.frames.pending())) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(max(0.2, 2 * tick))
+    elapsed = time.monotonic() - t0
+
+    stale = sum(1 for d in devices for r in d.rooms if d.state[r] != truth[r])
+    st = bridge.stats()
+    return {"updates": updates, "published": broker.stats["published"], "bytes": broker.stats["bytes"],
+            "delivered": broker.stats["delivered"], "elapsed": elapsed, "stale": stale,
+            "offline": len(offline), "resyncs": sum(d.resyncs for d in devices),
+            "latency_ms": st["latency_avg"] * 1000, "dropped": st["dropped"]}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rooms", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=2000, help="mises à jour matériel / s (toutes salles)")
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--drop", type=float, default=0.2, help="part des boîtiers déconnectés 1 s en cours de route")
+    ap.add_argument("--gateways", type=int, default=4, help="passerelles de site (mode site)")
+    ap.add_argument("--tick", type=float, default=0.1, help="MQTT_FRAME_TICK (mode site)")
+    ap.add_argument("--mode", choices=("rooms", "site", "both"), default="both")
+    args = ap.parse_args()
+    for mode in (("rooms", "site") if args.mode == "both" else (args.mode,)):
+        r = run(mode, args.rooms, args.rate, args.seconds, args.drop, args.gateways, args.tick)
+        print(f"{mode:<5}: {r['updates']} mises à jour -> {r['published']} publications "
+              f"({r['published'] / r['elapsed']:.0f}/s, {r['bytes'] / 1024:.0f} Ko, "
+              f"{r['delivered']} livraisons), latence file {r['latency_ms']:.1f} ms, "
+              f"{r['dropped']} perdus ; après reconnexion de {r['offline']} boîtiers : "
+              f"{r['stale']} salles désynchronisées")
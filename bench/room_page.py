@@ -0,0 +1,48 @@
+# bench/room_page.py
+"""Rechargements de la page de salle et des fichiers statiques (tablettes au démarrage).
+
+Compare, pour --requests chargements de /room/<code> :
+- rendu à chaque fois (cache des pages vidé avant chaque requête) ;
+- page en cache (rendu gardé tant que les joueurs ne changent pas) ;
+- revalidation (If-None-Match -> 304 sans corps) ;
+et affiche le poids de client.js / style.css bruts et précompressés.
+
+    python bench/room_page.py --requests 2000
+"""
+from __future__ import annotations
+import argparse, os, re, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main(n: int):
+    os.environ.setdefault("MQTT_DISABLED", "1")
+    os.environ.setdefault("DB_URI", f"sqlite:///{tempfile.mkdtemp()}/room_page.db")
+    import app as A
+    A.create_app(warm="sync")
+    c = A.app.test_client()
+    url = c.post("/", data={}).headers["Location"]
+    first = c.get(url)
+    etag = first.headers["ETag"]
+
+    def run(label, headers=None, cold=False):
+        t0 = time.perf_counter()
+        size = 0
+        for _ in range(n):
+            if cold:
+                A.invalidate_room_page(url.rsplit("/", 1)[1])
+            size += len(c.get(url, headers=headers or {}).data)
+        el = time.perf_counter() - t0
+        print(f"{label:<14}: {n / el:7.0f} req/s, {el / n * 1e6:6.0f} µs/req, {size / n / 1024:5.1f} Ko/réponse")
+
+    run("rendu", cold=True)
+    run("en cache")
+    run("304", headers={"If-None-Match": etag})
+    for u in re.findall(r'/assets/[^"]+', first.get_data(as_text=True)):
+        raw = len(c.get(u).data)
+        gz = len(c.get(u, headers={"Accept-Encoding": "gzip, br"}).data)
+        print(f"{u:<40}: {raw / 1024:5.1f} Ko -> {gz / 1024:5.1f} Ko, immuable 1 an")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=2000)
+    main(ap.parse_args().requests)
@@ -0,0 +1,94 @@
+# bench/room_provisioning.py
+"""Création de salles et connexion des joueurs : ancien chemin vs nouveau.
+
+- ancien : une session pour la salle, une seconde pour ses 4 joueurs ;
+  index séparés sur player.room_code et player.code.
+- nouveau : salle + joueurs en une transaction (services/provisioning.py),
+  index composite unique (room_code, code) ; création par lot.
+
+Mesure le débit de création puis la recherche (salle, code joueur) faite
+à chaque `auth`.
+
+    python bench/room_provisioning.py --rooms 500
+"""
+from __future__ import annotations
+import argparse, os, random, secrets, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ROOM_CODE_KEY", "bench")     # clé de la permutation des codes (services/room_codes.py)
+from sqlalchemy import Index, event, text
+from sqlmodel import SQLModel, Session, select
+from models import Room, Player
+from services import db, provisioning
+
+def _codes(n=4):
+    return [secrets.token_hex(3).upper() for _ in range(n)]
+
+def _engine(legacy: bool):
+    engine = db.make_engine(f"sqlite:///{tempfile.mkdtemp()}/provisioning.db")
+    SQLModel.metadata.create_all(engine)
+    if legacy:
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ux_player_room_code"))
+            Index("ix_player_room_code", Player.__table__.c.room_code).create(conn)
+            Index("ix_player_code", Player.__table__.c.code).create(conn)
+    queries = {"n": 0}
+    event.listen(engine, "before_cursor_execute", lambda *a, **k: queries.__setitem__("n", queries["n"] + 1))
+    return engine, queries
+
+def create_legacy(engine, n_rooms):
+    for i in range(n_rooms):
+        code = f"L{i:05d}"
+        with Session(engine) as s:
+            s.add(Room(code=code)); s.commit()
+        with Session(engine) as s:
+            for c in _codes():
+                s.add(Player(room_code=code, code=c))
+            s.commit()
+    return [f"L{i:05d}" for i in range(n_rooms)]
+
+def create_single(engine, n_rooms):
+    db.bind(engine)
+    for i in range(n_rooms):
+        provisioning.create_room(f"S{i:05d}")
+    return [f"S{i:05d}" for i in range(n_rooms)]
+
+def create_bulk(engine, n_rooms):
+    db.bind(engine)
+    return [r.code for r, _ in provisioning.bulk_create_rooms(n_rooms)]
+
+def lookups(engine, codes, n):
+    with Session(engine) as s:
+        pairs = [(p.room_code, p.code) for p in s.exec(select(Player)).all()]
+    sample = [random.choice(pairs) for _ in range(n)]
+    t0 = time.perf_counter()
+    with Session(engine) as s:
+        for room_code, pcode in sample:
+            s.exec(select(Player).where(Player.room_code == room_code, Player.code == pcode)).first()
+    return time.perf_counter() - t0
+
+def plan(engine):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM player WHERE room_code = 'X' AND code = 'Y'").all()
+    return rows[0][-1] if rows else "?"
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rooms", type=int, default=500)
+    ap.add_argument("--lookups", type=int, default=5000)
+    args = ap.parse_args()
+    for label, legacy, create in (
+        ("ancien (2 sessions)", True, create_legacy),
+        ("nouveau (1 transaction)", False, create_single),
+        ("nouveau (par lot)", False, create_bulk),
+    ):
+        engine, queries = _engine(legacy)
+        t0 = time.perf_counter()
+        codes = create(engine, args.rooms)
+        el = time.perf_counter() - t0
+        q = queries["n"]
+        lk = lookups(engine, codes, args.lookups)
+        print(f"{label:<24}: {args.rooms / el:7.0f} salles/s, {q / args.rooms:5.2f} requêtes/salle, "
+              f"auth {lk / args.lookups * 1e6:6.1f} µs  [{plan(engine)}]")
+        engine.dispose()
@@ -0,0 +1,70 @@
+# bench/startup.py
+"""Temps de démarrage : import de app, create_app(), préchauffage, 1re requête.
+
+Chaque mesure est faite dans un process neuf (base SQLite temporaire,
+MQTT désactivé) ; on affiche la médiane sur --runs exécutions. Le code de
+sortie vaut 1 si la médiane de `import app` + `create_app()` (le temps
+avant que le worker accepte des connexions) dépasse --budget-ms.
+
+    python bench/startup.py --runs 5 --budget-ms 500
+    python bench/startup.py --top 15        # modules les plus lents (-X importtime)
+"""
+from __future__ import annotations
+import argparse, json, os, statistics, subprocess, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app(warm="lazy")
+t2 = time.perf_counter()
+app.warm_up()
+t3 = time.perf_counter()
+app.app.test_client().get("/")
+t4 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "warm_up": t3 - t2, "first_request": t4 - t3}))
+'''
+
+def _env():
+    return dict(os.environ, MQTT_DISABLED="1", DB_URI=f"sqlite:///{tempfile.mkdtemp()}/startup.db")
+
+def run(runs: int) -> dict:
+    samples: dict = {}
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=_env(),
+                             capture_output=True, text=True, check=True).stdout
+        for k, v in json.loads(out.strip().splitlines()[-1]).items():
+            samples.setdefault(k, []).append(v)
+    return {k: statistics.median(v) for k, v in samples.items()}
+
+def top_imports(n: int):
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app; app.create_app(warm='lazy')"],
+                         cwd=ROOT, env=_env(), capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cum_us, name = (x.strip() for x in line[len("import time:"):].split("|"))
+        rows.append((int(cum_us), name))
+    for cum, name in sorted(rows, reverse=True)[:n]:
+        print(f"{cum / 1000:8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=500.0, help="budget pour `import app` + `create_app()` (médiane)")
+    ap.add_argument("--top", type=int, default=0, help="afficher les N imports les plus lents")
+    args = ap.parse_args()
+    if args.top:
+        top_imports(args.top)
+    res = run(args.runs)
+    for k, v in res.items():
+        print(f"{k:<14}: {v * 1000:7.1f} ms")
+    print(f"{'total':<14}: {sum(res.values()) * 1000:7.1f} ms")
+    boot = (res["import"] + res["create_app"]) * 1000
+    if boot > args.budget_ms:
+        print(f"budget dépassé : import app + create_app {boot:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
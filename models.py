@@ -1,4 +1,5 @@
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from datetime import datetime, timezone
 
@@ -6,6 +7,9 @@ def utcnow():
     return datetime.now(timezone.utc)
 
 class Room(SQLModel, table=True):
+    # Classement : salles finies par score décroissant, sans scanner la table
+    __table_args__ = (Index("ix_room_leaderboard", "is_finished", "score"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     code: str = Field(index=True, unique=True)
     created_at: datetime = Field(default_factory=utcnow)
@@ -16,6 +20,7 @@ class Room(SQLModel, table=True):
     current_stage: int = 0
     is_finished: bool = False
     success: bool = False
+    finished_at: Optional[datetime] = Field(default=None, index=True)   # archivage (services/retention.py)
 
     # Chrono par étape (sec)
     stage_duration_sec: int = 120
@@ -24,11 +29,59 @@ class Room(SQLModel, table=True):
     missed_count: int = 0
     score: int = 0
     wrong_attempts: int = 0
+    hints_used: int = 0
+
+    # Verrou optimiste : incrémenté à chaque écriture (voir RoomCache.flush)
+    version: int = 0
 
 class Player(SQLModel, table=True):
+    # Recherche à la connexion par (salle, code joueur) : un seul index composite unique
+    __table_args__ = (Index("ux_player_room_code", "room_code", "code", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    room_code: str = Field(index=True)
-    code: str = Field(index=True)    # code joueur (6 hex)
+    room_code: str
+    code: str                        # code joueur (6 hex)
     name: Optional[str] = None
     authenticated: bool = False
     joined_at: datetime = Field(default_factory=utcnow)
+
+# ------------------ JOURNAL D'EVENEMENTS ------------------
+class RoomEvent(SQLModel, table=True):
+    """Journal append-only des événements de partie (rejoué au redémarrage)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    room_code: str = Field(index=True)
+    kind: str                       # start, replay, hint, submit_ok, submit_ko, timeout, finish
+    data: str = "{}"                # JSON
+    at: datetime = Field(default_factory=utcnow)
+
+class RoomSnapshot(SQLModel, table=True):
+    """Dernier état reconstruit d'une salle, valable jusqu'à l'événement `upto_id`."""
+    room_code: str = Field(primary_key=True)
+    upto_id: int = 0
+    data: str = "{}"                # JSON : hints, summary, codes, scenario
+    at: datetime = Field(default_factory=utcnow)
+
+# ------------------ AGREGATS (services/analytics.py) ------------------
+class StageStat(SQLModel, table=True):
+    """Compteurs cumulés par étape d'un scénario."""
+    scenario: str = Field(primary_key=True)
+    stage: int = Field(primary_key=True)
+    solves: int = 0
+    timeouts: int = 0
+    wrong: int = 0
+    hints: int = 0
+    solve_time_sum: int = 0         # secondes, étapes réussies
+
+class ScenarioStat(SQLModel, table=True):
+    """Compteurs cumulés par scénario (parties lancées, finies, réussies)."""
+    scenario: str = Field(primary_key=True)
+    games: int = 0
+    finished: int = 0
+    succeeded: int = 0
+    score_sum: int = 0
+
+# ------------------ CODES DE SALLE (services/room_codes.py) ------------------
+class CodeSequence(SQLModel, table=True):
+    """Compteur des codes attribués, avancé par blocs (UPSERT … RETURNING)."""
+    name: str = Field(primary_key=True)
+    next: int = 0
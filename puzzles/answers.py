@@ -0,0 +1,130 @@
+# puzzles/answers.py
+"""Comparaison des réponses libres (devinette, date finale).
+
+Les réponses acceptées d'une énigme sont normalisées une fois, à la
+construction de l'énigme, dans un ensemble de clés ; une soumission est
+normalisée de la même façon puis cherchée dans l'ensemble. Les variantes
+d'écriture n'ont donc pas à être listées :
+
+- "text" : accents, casse, ponctuation, espaces et article en tête
+  (le, la, l', un, une, the…) ignorés — « L’Abeille » == « abeille » ;
+- "date" : jour/mois/année dans tous les formats courants (24/07/2025,
+  2025-07-24, 24.07.25, 24 juillet 2025, jul 24 2025, 1er août…) ramenés
+  à la forme ISO AAAA-MM-JJ.
+"""
+from __future__ import annotations
+import re, unicodedata
+from datetime import date
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+MAX_LEN = 200       # au-delà, la soumission est refusée sans être analysée
+
+ARTICLES = frozenset({"le", "la", "les", "l", "un", "une", "des", "du", "de", "d",
+                      "the", "a", "an"})
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "oe", "æ": "ae", "Æ": "ae"})
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+def _fold(raw: str) -> str:
+    """Minuscules sans accents, tout ce qui n'est ni lettre ni chiffre devient espace."""
+    s = unicodedata.normalize("NFKD", raw.translate(_LIGATURES))
+    s = "".join(c for c in s if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub(" ", s).strip()
+
+def normalize_text(raw: str) -> str:
+    words = _fold(raw).split()
+    while len(words) > 1 and words[0] in ARTICLES:
+        words.pop(0)
+    return " ".join(words)
+
+# ------------------ DATES ------------------
+MONTHS: Dict[str, int] = {}
+for _i, _names in enumerate((
+        ("janvier", "janv", "jan", "january"), ("fevrier", "fevr", "fev", "february", "feb"),
+        ("mars", "mar", "march"), ("avril", "avr", "april", "apr"), ("mai", "may"),
+        ("juin", "june", "jun"), ("juillet", "juil", "july", "jul"), ("aout", "august", "aug"),
+        ("septembre", "sept", "sep", "september"), ("octobre", "oct", "october"),
+        ("novembre", "nov", "november"), ("decembre", "dec", "december")), 1):
+    for _n in _names:
+        MONTHS[_n] = _i
+
+# Mots ignorés autour d'une date (« le 1er août », « jeudi 24 juillet », « July 24th »)
+_FILLER = frozenset({"le", "the", "of", "de", "du", "en", "er", "st", "nd", "rd", "th",
+                     "lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche",
+                     "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"})
+_ORDINAL = re.compile(r"^(\d{1,2})(er|st|nd|rd|th)$")
+
+def _year(tok: str) -> int:
+    y = int(tok)
+    return 2000 + y if len(tok) <= 2 else y
+
+def _iso(y: int, m: int, d: int) -> Optional[str]:
+    try:
+        return date(y, m, d).isoformat()
+    except (ValueError, OverflowError):
+        return None
+
+def _fits(*toks: Tuple[str, int]) -> bool:
+    """Chaque nombre tient dans sa largeur (jour/mois : 2 chiffres, année : 4), avant tout int()."""
+    return all(len(tok) <= width for tok, width in toks)
+
+def normalize_date(raw: str) -> Optional[str]:
+    """Date en clair -> "AAAA-MM-JJ" (jour/mois d'abord, mois/jour si impossible), None si illisible."""
+    nums, month = [], None
+    for tok in _fold(raw).split():
+        m = _ORDINAL.match(tok)
+        if m:
+            tok = m.group(1)
+        if tok.isdigit():
+            nums.append(tok)
+        elif tok in MONTHS and month is None:
+            month = MONTHS[tok]
+        elif tok not in _FILLER:
+            return None
+    if month is not None:
+        # 24 juillet 2025 / july 24 2025 : le jour est le nombre court
+        if len(nums) != 2:
+            return None
+        day, year = sorted(nums, key=len)
+        return _iso(_year(year), month, int(day)) if _fits((day, 2), (year, 4)) else None
+    if len(nums) == 1 and len(nums[0]) == 8:
+        t = nums[0]
+        return _iso(int(t[:4]), int(t[4:6]), int(t[6:])) or _iso(int(t[4:]), int(t[2:4]), int(t[:2]))
+    if len(nums) != 3:
+        return None
+    if len(nums[0]) == 4:
+        if not _fits((nums[1], 2), (nums[2], 2)):
+            return None
+        return _iso(int(nums[0]), int(nums[1]), int(nums[2]))
+    if not _fits((nums[0], 2), (nums[1], 2), (nums[2], 4)):
+        return None
+    y, a, b = _year(nums[2]), int(nums[0]), int(nums[1])
+    # JJ/MM, ou MM/JJ (anglais) quand la lecture jour/mois est impossible
+    return _iso(y, b, a) or _iso(y, a, b)
+
+NORMALIZERS: Dict[str, Callable[[str], Optional[str]]] = {
+    "text": normalize_text,
+    "date": normalize_date,
+}
+
+class AnswerMatcher:
+    """Réponses acceptées pré-normalisées : une recherche d'ensemble par soumission."""
+    __slots__ = ("kind", "keys", "_normalize")
+
+    def __init__(self, accepted: Iterable[str], kind: str = "text"):
+        self.kind = kind
+        self._normalize = NORMALIZERS[kind]
+        keys = set()
+        for a in accepted:
+            k = self._normalize(a)
+            if not k:
+                raise ValueError(f"Réponse acceptée illisible ({kind}) : {a!r}")
+            keys.add(k)
+        self.keys = frozenset(keys)
+
+    def __call__(self, raw) -> bool:
+        if not isinstance(raw, str) or len(raw) > MAX_LEN:
+            return False
+        return self._normalize(raw) in self.keys
+
+    def __repr__(self):
+        return f"AnswerMatcher({sorted(self.keys)!r}, kind={self.kind!r})"
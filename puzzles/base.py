@@ -1,7 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 class Puzzle(ABC):
+    # Métadonnées d'étape (surchargées par chaque énigme)
+    id: str = ""
+    hints: List[str] = []
+    debrief: Optional[str] = None
+    duration: int = 180                 # chrono de l'étape (sec)
+    stage_code: Optional[int] = None    # code annoncé quand l'étape est réussie
+
     @abstractmethod
     def get_prompt(self) -> Dict[str, Any]:
         ...
@@ -9,3 +16,6 @@ class Puzzle(ABC):
     def validate(self, submission: Dict[str, Any]) -> bool:
         ...
 
+    def on_enter(self, codes: Dict[int, int]) -> Optional[str]:
+        """Message facultatif à l'entrée dans l'étape (codes obtenus jusque-là)."""
+        return None
@@ -3,38 +3,50 @@ from .base import Puzzle
 class EnergyMWPuzzle(Puzzle):
     """
     Salle 3 — Énergie 180 MW
-    Fixes: Éolien 50, Solaire 40, Hydro 60. Slider: Gaz fossile (0..60).
-    Objectif: total EXACT 180 et fossile minimal — on accepte 30 MW.
+    Curseurs : Éolien (max 50), Solaire (max 40), Hydro (max 60), Fossile (max 60).
+    Objectif : total EXACT 180 avec fossile ≤ 30 (optimum : 50 + 40 + 60 + 30).
     """
+    id = "energy-mw"
+
     def __init__(self):
-        self.fixed = {"eolien": 50, "solaire": 40, "hydro": 60}
+        self.max = {"eolien": 50, "solaire": 40, "hydro": 60, "fossile": 60}
         self.target = 180
-        self.fossile = {"min": 0, "max": 60, "default": 30}
+        self.max_fossile = 30
         self.hints = [
-            "L’hydraulique est indispensable pour la stabilité du réseau.",
-            "Éolien + solaire doivent couvrir au moins la moitié de la demande.",
-            "Chaque MW de gaz fossile émet bien plus de CO₂ que les renouvelables."
+            "L’hydraulique est indispensable à la stabilité.",
+            "Éolien + solaire doivent bien contribuer.",
+            "Le fossile doit rester minimal tout en atteignant 180 MW.",
         ]
-        self.debrief = (
-            "Les réseaux doivent équilibrer production et consommation en continu. "
-            "Plus la part de renouvelable augmente, plus la flexibilité (barrages, stockage, coopération) est essentielle."
-        )
+        self.debrief = "Un mix équilibré limite les émissions et maintient l’équilibre production/consommation."
+        self.duration = 180
+        self.stage_code = 2431
 
     def get_prompt(self):
         return {
-            "type": "energy_mw",
-            "title": "Salle 3 — Énergie 180 MW",
-            "instruction": "Atteins exactement 180 MW avec le moins de fossile possible.",
-            "fixed": self.fixed,
-            "target": self.target,
-            "fossile": self.fossile,
+            "type": "energy_v2",
+            "title": "Salle 3 — L’énergie renouvelable",
+            "instruction": (
+                "Alimentez la ville à <strong>180 MW</strong> en minimisant le fossile.<br>"
+                "Sources disponibles : Éolien (max 50), Solaire (max 40), Hydraulique (max 60) + Fossile.<br>"
+                "Validez lorsque le total vaut 180."
+            ),
+            "min": 0,
+            "maxE": self.max["eolien"],
+            "maxS": self.max["solaire"],
+            "maxH": self.max["hydro"],
+            "maxF": self.max["fossile"],
+            "start": {k: 0 for k in self.max},
         }
 
     def validate(self, submission):
-        g = int(submission.get("fossile", -1))
-        if g < self.fossile["min"] or g > self.fossile["max"]:
+        mix = submission.get("mix", {})
+        try:
+            vals = {k: int(mix.get(k, 0)) for k in self.max}
+        except Exception:
             return False
-        total = self.fixed["eolien"] + self.fixed["solaire"] + self.fixed["hydro"] + g
-        # solution attendue: 50 + 40 + 60 + 30 = 180
-        return total == self.target and g == 30
-
+        if any(v < 0 or v > self.max[k] for k, v in vals.items()):
+            return False
+        if sum(vals.values()) != self.target:
+            return False
+        # On accepte toute solution à 180 avec fossile ≤ 30
+        return vals["fossile"] <= self.max_fossile
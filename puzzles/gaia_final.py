@@ -1,21 +1,42 @@
 from .base import Puzzle
+from .answers import AnswerMatcher
 
 class GaiaFinalPuzzle(Puzzle):
     """
-    Codes A=245, B=380, C=120 => (A+B+C)/10 = 74.5 -> jour 74 de 2025 => 14 mars 2025
-    On accepte plusieurs écritures simples : "14 mars 2025", "14/03/2025", "14-03-2025", "14 march 2025".
+    Salle 4 — Réactiver Gaïa
+    (Code1 + Code2 + Code3) / 3 = (2390 + 2400 + 2431) / 3 = 2407 → JJMM → 24/07/2025
     """
+    id = "gaia-final"
+
     def __init__(self):
-        self.A, self.B, self.C = 245, 380, 120
-        self.debrief = "Jour de dépassement 2025 calculé à partir des codes. Protéger les écosystèmes est vital."
+        # Toute écriture de la date est acceptée (24/07/2025, 2025-07-24, 24 juillet 2025, jul 24 2025…)
+        self.accepted = AnswerMatcher({"24 juillet 2025"}, kind="date")
+        self.hints = [
+            "Additionnez les 3 codes puis divisez par 3.",
+            "Interprétez le résultat comme JJMM (jour/mois).",
+        ]
+        self.debrief = "Le « jour de dépassement » illustre l’empreinte écologique globale."
+        self.duration = 180
 
     def get_prompt(self):
-        return {"type":"gaia","title":"Salle 4 — Réactiver Gaïa",
-                "instruction":"Codes trouvés : A=245, B=380, C=120.\n"
-                              "Calculez (A+B+C)/10 → numéro du jour 2025 → convertissez en date."}
+        return {
+            "type": "gaia",
+            "title": "Salle 4 — Réactiver Gaïa",
+            "instruction": (
+                "Vous avez obtenu 3 codes aux salles précédentes (Code 1, Code 2, Code 3).<br>"
+                "Calculez <strong>(Code1 + Code2 + Code3) / 3</strong> = un nombre à 4 chiffres.<br>"
+                "Interprétez ce nombre comme <strong>JJMM</strong> de l’année 2025 → saisissez la date."
+            ),
+        }
 
     def validate(self, submission):
-        ans = (submission.get("answer","") or "").strip().lower()
-        accept = {"14 mars 2025","14/03/2025","14-03-2025","14 march 2025"}
-        return ans in accept
+        return self.accepted(submission.get("date"))
 
+    def on_enter(self, codes):
+        # Indice final donné seulement si les 3 codes ont été obtenus
+        if not all(k in codes for k in (0, 1, 2)):
+            return None
+        moyenne = round((codes[0] + codes[1] + codes[2]) / 3)
+        return (f"🧩 Indice final : faites la moyenne des 3 codes. "
+                f"(Code1 + Code2 + Code3) / 3 = {moyenne}. "
+                f"Interprétez-le comme JJMM pour trouver la date.")
@@ -0,0 +1,123 @@
+# puzzles/registry.py
+"""Registre des scénarios (suites d'énigmes `Puzzle`).
+
+Un `Scenario` est figé à sa construction : énigmes instanciées, prompts
+construits et pré-encodés en JSON, indices/débriefs/durées/codes indexés
+par étape. `reload()` reconstruit de nouvelles versions à partir des
+modules rechargés ; les salles en cours gardent la version qu'elles ont
+épinglée au démarrage.
+
+La version est une empreinte du contenu (sources des énigmes du
+scénario) : deux workers qui chargent les mêmes fichiers donnent la même
+version, quel que soit le nombre de rechargements de chacun.
+"""
+from __future__ import annotations
+import hashlib, importlib, sys
+from typing import Any, Dict, List, Optional, Tuple
+from .base import Puzzle
+from services.payload_json import RawJSON
+
+class Scenario:
+    __slots__ = ("name", "version", "puzzles", "prompts", "prompts_raw", "index")
+
+    def __init__(self, name: str, version: str, classes: List[type]):
+        puzzles = tuple(cls() for cls in classes)
+        prompts = tuple(p.get_prompt() for p in puzzles)
+        for attr, value in (
+            ("name", name), ("version", version), ("puzzles", puzzles), ("prompts", prompts),
+            ("prompts_raw", tuple(RawJSON.of(p) for p in prompts)),
+            ("index", {p.id or type(p).__name__: i for i, p in enumerate(puzzles)}),
+        ):
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Scenario est immuable")
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.name, self.version)
+
+    def total(self) -> int:
+        return len(self.puzzles)
+
+    def prompt(self, i: int) -> Dict[str, Any]:
+        return self.prompts[i]
+
+    def prompt_raw(self, i: int) -> RawJSON:
+        return self.prompts_raw[i]
+
+    def validate(self, i: int, submission: Dict[str, Any]) -> bool:
+        return self.puzzles[i].validate(submission)
+
+    def hint(self, i: int, used: int) -> Optional[str]:
+        hints = self.puzzles[i].hints or []
+        return hints[used] if used < len(hints) else None
+
+    def hints_total(self, i: int) -> int:
+        return len(self.puzzles[i].hints or []) if i < len(self.puzzles) else 0
+
+    def debrief(self, i: int) -> Optional[str]:
+        return self.puzzles[i].debrief
+
+    def duration(self, i: int) -> int:
+        return self.puzzles[i].duration if i < len(self.puzzles) else 180
+
+    def stage_code(self, i: int) -> Optional[int]:
+        return self.puzzles[i].stage_code
+
+    def on_enter(self, i: int, codes: Dict[int, int]) -> Optional[str]:
+        return self.puzzles[i].on_enter(codes) if i < len(self.puzzles) else None
+
+def content_version(classes: List[type]) -> str:
+    """Empreinte des énigmes (ordre, classes, source de leurs modules)."""
+    h = hashlib.blake2b(digest_size=6)
+    for cls in classes:
+        mod = sys.modules[cls.__module__]
+        h.update(f"{cls.__module__}.{cls.__qualname__}\n".encode())
+        path = getattr(mod, "__file__", None)
+        if path:
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+class Registry:
+    def __init__(self, module: str = "puzzles.scenarios"):
+        self.module = module
+        self.default = ""
+        self._latest: Dict[str, Scenario] = {}
+        self._versions: Dict[Tuple[str, str], Scenario] = {}
+
+    def load(self, reload: bool = False) -> List[str]:
+        """(Re)charge les définitions ; renvoie les scénarios publiés."""
+        if reload:
+            # Les énigmes d'abord, le module de scénarios en dernier (base/registre exclus)
+            names = [n for n in list(sys.modules)
+                     if n.startswith("puzzles.") and n not in (self.module, __name__, Puzzle.__module__)]
+            for n in names:
+                importlib.reload(sys.modules[n])
+        mod = importlib.import_module(self.module)
+        if reload:
+            mod = importlib.reload(mod)
+        for name, classes in mod.SCENARIOS.items():
+            version = content_version(classes)
+            prev = self._versions.get((name, version))
+            # Contenu inchangé : on garde l'objet déjà épinglé par les salles
+            sc = prev or Scenario(name, version, classes)
+            self._latest[name] = sc
+            self._versions[sc.key] = sc
+        self.default = getattr(mod, "DEFAULT", next(iter(mod.SCENARIOS)))
+        return list(mod.SCENARIOS)
+
+    def reload(self) -> List[str]:
+        return self.load(reload=True)
+
+    def names(self) -> List[str]:
+        return list(self._latest)
+
+    def get(self, name: Optional[str] = None, version: Optional[str] = None) -> Scenario:
+        name = name if name in self._latest else self.default
+        if version is not None and (name, version) in self._versions:
+            return self._versions[(name, version)]
+        return self._latest[name]
+
+registry = Registry()
@@ -1,32 +1,36 @@
 from .base import Puzzle
+from .answers import AnswerMatcher
 
 class RiddleBeePuzzle(Puzzle):
     """
-    Salle 2 — Devinette (ABEILLE)
-    Mauvaise réponse : pénalité gérée dans app.py (-30s).
+    Salle 2 — Devinette biodiversité (ABEILLE)
     """
+    id = "riddle-bee"
+
     def __init__(self):
-        self.answer = "ABEILLE"
+        # Article, accents, casse et espaces ignorés : « L’Abeille », « une abeille »…
+        self.accepted = AnswerMatcher({"abeille"})
         self.hints = [
-            "Mon premier est la première lettre de l’alphabet.",
-            "Mon deuxième est le cri du veau.",
-            "Mon troisième se prononce comme une petite île en vieux français.",
+            "Premier = lettre A.",
+            "Cri du veau → beu (sonorité « be »).",
+            "Petite île en ancien français → « île » / « île » se prononce comme « ille ».",
         ]
-        self.debrief = "Bravo ! Sans les abeilles, ~80% des plantes à fleurs dépendent de la pollinisation."
+        self.debrief = "Les abeilles sont essentielles : elles pollinisent une grande partie des plantes cultivées."
+        self.duration = 120
+        self.stage_code = 2400
 
     def get_prompt(self):
         return {
             "type": "riddle",
-            "title": "Salle 2 — Devinette Biodiversité",
+            "title": "Salle 2 — Devinette biodiversité",
             "instruction": (
                 "Mon premier est la première lettre de l’alphabet.<br>"
                 "Mon deuxième est le cri du veau.<br>"
                 "Mon troisième se prononce comme une petite île en vieux français.<br>"
                 "Mon tout est un insecte pollinisateur essentiel à la vie sur Terre."
+                "<br><br>🕒 2 minutes. Entrez votre réponse."
             ),
         }
 
     def validate(self, submission):
-        ans = (submission.get("answer") or "").strip().upper()
-        return ans == self.answer
-
+        return self.accepted(submission.get("answer"))
@@ -0,0 +1,16 @@
+# puzzles/scenarios.py
+"""Scénarios disponibles : nom -> liste ordonnée des classes d'énigmes.
+
+Modifiable à chaud : le registre recharge ce module (et les énigmes)
+sans redémarrer le serveur.
+"""
+from .waste_interactive import WasteInteractivePuzzle
+from .riddle_bee import RiddleBeePuzzle
+from .energy_mw import EnergyMWPuzzle
+from .gaia_final import GaiaFinalPuzzle
+
+DEFAULT = "mission-gaia"
+
+SCENARIOS = {
+    "mission-gaia": [WasteInteractivePuzzle, RiddleBeePuzzle, EnergyMWPuzzle, GaiaFinalPuzzle],
+}
@@ -2,42 +2,46 @@ from .base import Puzzle
 
 class WasteInteractivePuzzle(Puzzle):
     """
-    Associer objets -> bacs :
+    Salle 1 — Associer objets -> bacs :
       - verre: pot-verre
-      - compost: dechet-alimentaire
+      - compost: epluchure
       - plastique: bouteille-plastique
     """
+    id = "waste"
+
     def __init__(self):
         self.items = [
-            {"id":"pot-verre", "label":"Pot en verre", "emoji":"🍾"},
-            {"id":"dechet-alimentaire", "label":"Déchet alimentaire", "emoji":"🍎"},
-            {"id":"bouteille-plastique", "label":"Bouteille plastique", "emoji":"🥤"},
+            {"id": "bouteille-plastique", "name": "Bouteille en plastique", "icon": "🥤", "correct_bin": "plastique"},
+            {"id": "pot-verre", "name": "Pot en verre", "icon": "🍾", "correct_bin": "verre"},
+            {"id": "epluchure", "name": "Déchet alimentaire", "icon": "🍎", "correct_bin": "compost"},
         ]
         self.bins = [
-            {"id":"verre","label":"Verre","emoji":"🍾"},
-            {"id":"compost","label":"Compost","emoji":"🌱"},
-            {"id":"plastique","label":"Plastique (jaune)","emoji":"♻️"},
+            {"id": "verre", "name": "Verre", "icon": "🍾", "color": "#10b981"},
+            {"id": "compost", "name": "Compost", "icon": "🌱", "color": "#92400e"},
+            {"id": "plastique", "name": "Plastique (jaune)", "icon": "♻️", "color": "#fbbf24"},
         ]
+        # mapping attendu {bin_id: item_id}
         self.correct = {
-            "verre":"pot-verre",
-            "compost":"dechet-alimentaire",
-            "plastique":"bouteille-plastique",
+            "verre": "pot-verre",
+            "compost": "epluchure",
+            "plastique": "bouteille-plastique",
         }
-        self.debrief = (
-            "Un bon tri réduit la pollution. Le verre est recyclable à l’infini, "
-            "le compost réduit nos déchets."
-        )
+        self.hints = [
+            "Le verre va dans le bac verre.",
+            "Le déchet alimentaire va au compost.",
+            "La bouteille en plastique va dans la poubelle jaune.",
+        ]
+        self.debrief = "Bien trier permet de réduire les déchets et d’augmenter le recyclage."
+        self.duration = 180
+        self.stage_code = 2390
 
     def get_prompt(self):
-        return {"type":"waste_v2","title":"Salle 1 — Tri des déchets",
-                "instruction":"Associe chaque objet au bon bac, puis clique « Valider ».",
-                "items":self.items,"bins":self.bins}
+        return {"type": "waste_v2", "title": "Salle 1 — Tri des déchets",
+                "instruction": "Associe chaque objet au bon bac, puis clique « Valider ».",
+                "objects": self.items, "bins": self.bins}
 
     def validate(self, submission):
         assign = submission.get("assign", {})
-        return (
-            assign.get("verre") == self.correct["verre"] and
-            assign.get("compost") == self.correct["compost"] and
-            assign.get("plastique") == self.correct["plastique"]
-        )
-
+        if not isinstance(assign, dict):
+            return False
+        return all(assign.get(k) == v for k, v in self.correct.items())
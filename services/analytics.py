@@ -0,0 +1,149 @@
+# services/analytics.py
+"""Agrégats de partie tenus à jour au fil de l'eau (pas de scan de `Room`).
+
+Chaque submit / fin de chrono / fin de partie incrémente des compteurs en
+mémoire ; `flush()` (appelé avec l'écrivain du cache) les ajoute en base
+par UPSERT (`x = x + delta`) dans deux petites tables : StageStat (par
+scénario et étape) et ScenarioStat (par scénario). Le classement lit
+`Room` via l'index (is_finished, score).
+"""
+from __future__ import annotations
+import csv, io, json
+from collections import defaultdict
+from typing import Dict, Iterator, List, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from models import Room, StageStat, ScenarioStat
+from services import db, metrics
+
+# ------------------ SCORE ------------------
+BASE_POINTS = 100
+HINT_PENALTY = 20
+WRONG_PENALTY = 5
+
+def stage_points(remaining: int, hints: int) -> int:
+    """Points d'une étape réussie : base + bonus temps restant - indices utilisés."""
+    return max(10, BASE_POINTS + remaining // 2 - HINT_PENALTY * hints)
+
+# ------------------ AGREGATS ------------------
+_STAGE_FIELDS = ("solves", "timeouts", "wrong", "hints", "solve_time_sum")
+_GAME_FIELDS = ("games", "finished", "succeeded", "score_sum")
+
+class Analytics:
+    def __init__(self):
+        self._stage: Dict[Tuple[str, int], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(_STAGE_FIELDS, 0))
+        self._game: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(_GAME_FIELDS, 0))
+
+    # ---------- enregistrement (acteur de la salle) ----------
+    def solved(self, scenario: str, stage: int, seconds: int, hints: int):
+        d = self._stage[(scenario, stage)]
+        d["solves"] += 1; d["solve_time_sum"] += seconds; d["hints"] += hints
+
+    def timed_out(self, scenario: str, stage: int, hints: int):
+        d = self._stage[(scenario, stage)]
+        d["timeouts"] += 1; d["hints"] += hints
+
+    def wrong(self, scenario: str, stage: int):
+        self._stage[(scenario, stage)]["wrong"] += 1
+
+    def started(self, scenario: str):
+        self._game[scenario]["games"] += 1
+
+    def finished(self, scenario: str, success: bool, score: int):
+        d = self._game[scenario]
+        d["finished"] += 1; d["succeeded"] += int(success); d["score_sum"] += score
+
+    def pending(self) -> int:
+        return len(self._stage) + len(self._game)
+
+    # ---------- écriture ----------
+    @staticmethod
+    def _upsert(model, rows: List[dict], keys: Tuple[str, ...], fields: Tuple[str, ...]):
+        dialect = db.dialect_name()
+        ins = (postgresql if dialect == "postgresql" else sqlite).insert(model)
+        return ins.values(rows).on_conflict_do_update(
+            index_elements=list(keys),
+            set_={f: getattr(model, f) + getattr(ins.excluded, f) for f in fields})
+
+    @metrics.timed("analytics_flush", "db")
+    def flush(self) -> int:
+        if not self._stage and not self._game:
+            return 0
+        stage, self._stage = self._stage, defaultdict(lambda: dict.fromkeys(_STAGE_FIELDS, 0))
+        game, self._game = self._game, defaultdict(lambda: dict.fromkeys(_GAME_FIELDS, 0))
+        try:
+            with db.new_session() as s:
+                if stage:
+                    s.exec(self._upsert(StageStat, [{"scenario": sc, "stage": i, **d} for (sc, i), d in stage.items()],
+                                        ("scenario", "stage"), _STAGE_FIELDS))
+                if game:
+                    s.exec(self._upsert(ScenarioStat, [{"scenario": sc, **d} for sc, d in game.items()],
+                                        ("scenario",), _GAME_FIELDS))
+                s.commit()
+        except Exception:
+            # On remet les deltas en attente pour le prochain passage
+            for k, d in stage.items():
+                for f, v in d.items(): self._stage[k][f] += v
+            for k, d in game.items():
+                for f, v in d.items(): self._game[k][f] += v
+            raise
+        return len(stage) + len(game)
+
+# ------------------ LECTURE ------------------
+def summary() -> dict:
+    """Agrégats par scénario et par étape (tables de quelques lignes)."""
+    out: dict = {}
+    with db.session() as s:
+        for g in s.exec(select(ScenarioStat)).all():
+            out[g.scenario] = {
+                "games": g.games, "finished": g.finished,
+                "success_rate": round(g.succeeded / g.finished, 3) if g.finished else None,
+                "avg_score": round(g.score_sum / g.finished, 1) if g.finished else None,
+                "stages": [],
+            }
+        for st in s.exec(select(StageStat).order_by(StageStat.scenario, StageStat.stage)).all():
+            played = st.solves + st.timeouts
+            out.setdefault(st.scenario, {"stages": []})["stages"].append({
+                "stage": st.stage, "solves": st.solves, "timeouts": st.timeouts,
+                "wrong_attempts": st.wrong,
+                "avg_solve_sec": round(st.solve_time_sum / st.solves, 1) if st.solves else None,
+                "avg_hints": round(st.hints / played, 2) if played else None,
+            })
+    return out
+
+LEADERBOARD_COLUMNS = ("code", "score", "success", "current_stage", "missed_count",
+                       "wrong_attempts", "hints_used", "finished_at")
+
+def _leaderboard_query(finished_only: bool = True):
+    q = select(Room)
+    if finished_only:
+        q = q.where(Room.is_finished == True)  # noqa: E712  (index ix_room_leaderboard)
+    return q.order_by(Room.is_finished.desc(), Room.score.desc(), Room.finished_at)
+
+def _row(r: Room) -> dict:
+    d = {c: getattr(r, c) for c in LEADERBOARD_COLUMNS}
+    d["finished_at"] = r.finished_at.isoformat() if r.finished_at else None
+    return d
+
+def leaderboard(limit: int = 20, finished_only: bool = True) -> List[dict]:
+    with db.session() as s:
+        return [_row(r) for r in s.exec(_leaderboard_query(finished_only).limit(limit)).all()]
+
+def iter_export(fmt: str = "csv", finished_only: bool = False, chunk: int = 500) -> Iterator[str]:
+    """Résultats de toutes les salles, lus par paquets et émis au fil de l'eau."""
+    with db.new_session() as s:
+        rows = s.exec(_leaderboard_query(finished_only).execution_options(yield_per=chunk))
+        if fmt == "json":
+            yield "["
+            for i, r in enumerate(rows):
+                yield ("," if i else "") + json.dumps(_row(r), ensure_ascii=False)
+            yield "]"
+            return
+        buf = io.StringIO()
+        w = csv.DictWriter(buf, fieldnames=LEADERBOARD_COLUMNS)
+        w.writeheader()
+        for i, r in enumerate(rows, 1):
+            w.writerow(_row(r))
+            if i % chunk == 0:
+                yield buf.getvalue(); buf.seek(0); buf.truncate()
+        yield buf.getvalue()
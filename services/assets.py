@@ -0,0 +1,96 @@
+# services/assets.py
+"""Fichiers statiques empreintés et précompressés, servis depuis la mémoire.
+
+Au démarrage, chaque fichier de `static/` (js, css, svg) est lu une fois :
+son URL porte l'empreinte de son contenu (`/assets/client.3f2a9c1b.js`),
+ses variantes gzip et brotli (paquet `brotli`, dans requirements.txt ;
+gzip seul s'il manque) sont calculées d'avance. Une URL empreintée ne change jamais de contenu :
+réponse `Cache-Control: immutable` d'un an, et plus besoin de `?v=N`
+à incrémenter à la main dans les gabarits.
+"""
+from __future__ import annotations
+import gzip, hashlib, mimetypes, os
+from typing import Dict, NamedTuple, Optional
+
+EXTENSIONS = (".js", ".css", ".svg")
+MAX_AGE = 365 * 24 * 3600
+MIN_COMPRESS = 512          # octets : en dessous, la compression ne vaut pas l'en-tête
+
+def _brotli():
+    try:
+        import brotli       # facultatif
+        return brotli
+    except ImportError:
+        return None
+
+class Asset(NamedTuple):
+    mimetype: str
+    etag: str
+    variants: Dict[str, bytes]      # "" (brut), "gzip", "br"
+
+class Assets:
+    def __init__(self, folder: str, prefix: str = "/assets"):
+        self.folder = folder
+        self.prefix = prefix
+        self.urls: Dict[str, str] = {}          # static/client.js -> /assets/client.<hash>.js
+        self.files: Dict[str, Asset] = {}       # client.<hash>.js -> Asset
+        self.build_id = ""
+
+    def build(self) -> "Assets":
+        br = _brotli()
+        urls, files, digest = {}, {}, hashlib.sha256()
+        for root, _dirs, names in os.walk(self.folder):
+            for name in sorted(names):
+                if not name.endswith(EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, self.folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    data = f.read()
+                h = hashlib.sha256(data).hexdigest()[:12]
+                stem, ext = os.path.splitext(rel)
+                hashed = f"{stem}.{h}{ext}"
+                variants = {"": data}
+                if len(data) >= MIN_COMPRESS:
+                    variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+                    if br is not None:
+                        variants["br"] = br.compress(data, quality=11)
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if mimetype.startswith("text/") or mimetype.endswith("javascript"):
+                    mimetype += "; charset=utf-8"
+                files[hashed] = Asset(mimetype, h, variants)
+                urls[rel] = f"{self.prefix}/{hashed}"
+                digest.update(hashed.encode())
+        self.urls, self.files = urls, files
+        self.build_id = digest.hexdigest()[:12]
+        return self
+
+    def url(self, filename: str) -> str:
+        """URL empreintée ; fichier inconnu (ajouté après le démarrage) : URL statique classique."""
+        return self.urls.get(filename) or f"/static/{filename}"
+
+    def get(self, hashed: str) -> Optional[Asset]:
+        return self.files.get(hashed)
+
+    @staticmethod
+    def pick(asset: Asset, accept_encoding: str) -> str:
+        """Variante à servir selon Accept-Encoding : br, puis gzip, sinon brute."""
+        accepted = set()
+        for part in (accept_encoding or "").lower().split(","):
+            name, _, params = part.partition(";")
+            q = params.strip()
+            try:
+                if q.startswith("q=") and float(q[2:]) <= 0:
+                    continue            # "gzip;q=0" : refusé explicitement
+            except ValueError:
+                pass
+            accepted.add(name.strip())
+        for enc in ("br", "gzip"):
+            if enc in asset.variants and enc in accepted:
+                return enc
+        return ""
+
+    def stats(self) -> dict:
+        raw = sum(len(a.variants[""]) for a in self.files.values())
+        gz = sum(len(a.variants.get("gzip", a.variants[""])) for a in self.files.values())
+        return {"files": len(self.files), "bytes": raw, "gzip_bytes": gz}
@@ -0,0 +1,340 @@
+# services/backend.py
+"""État partagé entre workers (indices, débriefs, codes) + diffusion Socket.IO.
+
+- MemoryBackend : par défaut, un seul process (équivalent des anciens dicts).
+- SqliteBackend : plusieurs workers sur une même machine ; l'état et le bus
+  Socket.IO passent par un fichier SQLite partagé (mode WAL).
+
+Chaque salle a un worker « propriétaire » qui porte ses timers : le dernier
+worker ayant démarré/fait avancer la salle la réclame (`claim`), l'ancien
+propriétaire abandonne ses échéances dès qu'il constate qu'il ne l'est plus.
+Chaque worker signale qu'il est vivant (`heartbeat`) ; les salles d'un
+worker muet depuis WORKER_STALE secondes (redémarré, tué) sont reprises
+par un autre (`adopt`), qui reprogramme leurs chronos.
+
+Les lectures-modifications-écritures (débriefs, historique du chat,
+séquence d'état) passent par `update()` : une seule transaction, sans
+perte de mise à jour entre workers.
+"""
+from __future__ import annotations
+import json, os, sqlite3, threading, time, uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Set
+import socketio
+
+WORKER_ID = os.getenv("WORKER_ID") or uuid.uuid4().hex[:8]
+HEARTBEAT = float(os.getenv("WORKER_HEARTBEAT", "5"))           # s entre deux signes de vie
+WORKER_STALE = float(os.getenv("WORKER_STALE", "20"))           # s sans signe de vie : worker mort
+
+class Tracker:
+    """Vue dict-like sur un espace de noms du backend (valeurs JSON)."""
+    def __init__(self, backend: "StateBackend", ns: str):
+        self.backend, self.ns = backend, ns
+
+    def get(self, key: str, default=None):
+        return self.backend.get(self.ns, key, default)
+
+    def __getitem__(self, key: str):
+        v = self.get(key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __setitem__(self, key: str, value):
+        self.backend.set(self.ns, key, value)
+
+    def update(self, key: str, fn: Callable[[Any], Any]):
+        """Remplace la valeur par `fn(valeur actuelle ou None)`, atomiquement ; renvoie la nouvelle."""
+        return self.backend.update(self.ns, key, fn)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def pop(self, key: str, default=None):
+        v = self.get(key, default)
+        self.backend.delete(self.ns, key)
+        return v
+
+    def items(self) -> Dict[str, Any]:
+        """Toutes les clés de l'espace de noms (une lecture)."""
+        return self.backend.scan(self.ns)
+
+class StagedTracker:
+    """Tracker dont les écritures d'une clé (une salle) peuvent être retenues le temps d'un lot
+    de commandes : le lot relit ses propres écritures, puis elles sont rejouées sur le
+    backend (`commit`, chaque `update` reste atomique) ou jetées (`discard`)."""
+    _GONE = object()
+
+    def __init__(self, tracker: Tracker):
+        self.tracker = tracker
+        self._ops: Dict[str, list] = {}        # clé retenue -> [(op, arg)]
+        self._view: Dict[str, Any] = {}        # clé retenue -> valeur vue par le lot
+
+    def stage(self, key: str):
+        self._ops.setdefault(key, [])
+
+    def commit(self, key: str):
+        self._view.pop(key, None)
+        for op, arg in self._ops.pop(key, None) or ():
+            if op == "set":
+                self.tracker[key] = arg
+            elif op == "update":
+                self.tracker.update(key, arg)
+            else:
+                self.tracker.pop(key, None)
+
+    def discard(self, key: str):
+        self._ops.pop(key, None)
+        self._view.pop(key, None)
+
+    def get(self, key: str, default=None):
+        if key in self._view:
+            v = self._view[key]
+            return default if v is None or v is self._GONE else v
+        return self.tracker.get(key, default)
+
+    def __getitem__(self, key: str):
+        v = self.get(key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: str, value):
+        ops = self._ops.get(key)
+        if ops is None:
+            self.tracker[key] = value
+            return
+        self._view[key] = value
+        ops.append(("set", value))
+
+    def update(self, key: str, fn: Callable[[Any], Any]):
+        ops = self._ops.get(key)
+        if ops is None:
+            return self.tracker.update(key, fn)
+        cur = self.get(key)
+        value = self._view[key] = fn(cur)
+        ops.append(("update", fn))
+        return value
+
+    def pop(self, key: str, default=None):
+        ops = self._ops.get(key)
+        if ops is None:
+            return self.tracker.pop(key, default)
+        v = self.get(key, default)
+        self._view[key] = self._GONE
+        ops.append(("pop", None))
+        return v
+
+class StateBackend(ABC):
+    shared = False
+
+    def tracker(self, ns: str) -> Tracker:
+        return Tracker(self, ns)
+
+    @abstractmethod
+    def get(self, ns: str, key: str, default=None):
+        ...
+    @abstractmethod
+    def set(self, ns: str, key: str, value):
+        ...
+    @abstractmethod
+    def update(self, ns: str, key: str, fn: Callable[[Any], Any]):
+        ...
+    @abstractmethod
+    def delete(self, ns: str, key: str):
+        ...
+    @abstractmethod
+    def scan(self, ns: str) -> Dict[str, Any]:
+        ...
+    @abstractmethod
+    def claim(self, room: str) -> bool:
+        ...
+    @abstractmethod
+    def owns(self, room: str) -> bool:
+        ...
+    @abstractmethod
+    def release(self, room: str):
+        ...
+
+    def heartbeat(self):
+        """Signe de vie du worker (rien à faire en mémoire)."""
+
+    def adopt(self, stale: float = WORKER_STALE) -> List[str]:
+        """Reprend les salles des workers morts ; renvoie leurs codes."""
+        return []
+
+    def alive_workers(self, stale: float = WORKER_STALE) -> Set[str]:
+        """Workers ayant donné signe de vie depuis moins de `stale` s."""
+        return set()
+
+    def client_manager(self):
+        """Gestionnaire de clients Socket.IO (None = gestionnaire local)."""
+        return None
+
+# ------------------ UN SEUL PROCESS ------------------
+class MemoryBackend(StateBackend):
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, ns, key, default=None):
+        return self._data.get(ns, {}).get(key, default)
+
+    def set(self, ns, key, value):
+        self._data.setdefault(ns, {})[key] = value
+
+    def update(self, ns, key, fn):
+        value = fn(self.get(ns, key))
+        self.set(ns, key, value)
+        return value
+
+    def delete(self, ns, key):
+        self._data.get(ns, {}).pop(key, None)
+
+    def scan(self, ns):
+        return dict(self._data.get(ns, {}))
+
+    def claim(self, room): return True
+    def owns(self, room): return True
+    def release(self, room): pass
+
+# ------------------ PLUSIEURS PROCESS (SQLite) ------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (ns TEXT, key TEXT, value TEXT, PRIMARY KEY (ns, key));
+CREATE TABLE IF NOT EXISTS owners (room TEXT PRIMARY KEY, worker TEXT, claimed_at REAL);
+CREATE TABLE IF NOT EXISTS workers (worker TEXT PRIMARY KEY, seen REAL);
+CREATE TABLE IF NOT EXISTS bus (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, ts REAL, data TEXT);
+"""
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class SqliteBackend(StateBackend):
+    shared = True
+
+    def __init__(self, path: str, worker: str = WORKER_ID):
+        self.path, self.worker = path, worker
+        self._db = _connect(path)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()       # une transaction à la fois sur la connexion
+
+    def get(self, ns, key, default=None):
+        row = self._db.execute("SELECT value FROM kv WHERE ns=? AND key=?", (ns, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, ns, key, value):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO kv (ns, key, value) VALUES (?,?,?)",
+                             (ns, key, json.dumps(value)))
+
+    def update(self, ns, key, fn):
+        # BEGIN IMMEDIATE : verrou d'écriture pris avant la lecture, les autres workers attendent
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT value FROM kv WHERE ns=? AND key=?", (ns, key)).fetchone()
+                value = fn(json.loads(row[0]) if row else None)
+                self._db.execute("INSERT OR REPLACE INTO kv (ns, key, value) VALUES (?,?,?)",
+                                 (ns, key, json.dumps(value)))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return value
+
+    def delete(self, ns, key):
+        with self._lock:
+            self._db.execute("DELETE FROM kv WHERE ns=? AND key=?", (ns, key))
+
+    def scan(self, ns):
+        return {k: json.loads(v) for k, v in self._db.execute("SELECT key, value FROM kv WHERE ns=?", (ns,))}
+
+    def claim(self, room):
+        self._db.execute("INSERT OR REPLACE INTO owners (room, worker, claimed_at) VALUES (?,?,?)",
+                         (room, self.worker, time.time()))
+        return True
+
+    def owns(self, room):
+        # Salle jamais réclamée (ou libérée) : personne n'en porte les timers
+        row = self._db.execute("SELECT worker FROM owners WHERE room=?", (room,)).fetchone()
+        return row is not None and row[0] == self.worker
+
+    def release(self, room):
+        self._db.execute("DELETE FROM owners WHERE room=? AND worker=?", (room, self.worker))
+
+    def heartbeat(self):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO workers (worker, seen) VALUES (?,?)",
+                             (self.worker, time.time()))
+
+    def adopt(self, stale=WORKER_STALE):
+        # Propriétaire sans signe de vie récent (ou jamais vu : ancien WORKER_ID aléatoire)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rooms = [r for (r,) in self._db.execute(
+                    "SELECT o.room FROM owners o LEFT JOIN workers w ON w.worker = o.worker "
+                    "WHERE o.worker != ? AND COALESCE(w.seen, 0) < ?", (self.worker, now - stale))]
+                self._db.executemany("UPDATE owners SET worker=?, claimed_at=? WHERE room=?",
+                                     [(self.worker, now, r) for r in rooms])
+                self._db.execute("DELETE FROM workers WHERE seen < ?", (now - stale,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return rooms
+
+    def alive_workers(self, stale=WORKER_STALE):
+        rows = self._db.execute("SELECT worker FROM workers WHERE seen >= ?", (time.time() - stale,))
+        return {w for (w,) in rows} | {self.worker}
+
+    def client_manager(self):
+        return SqlitePubSubManager(self.path)
+
+class SqlitePubSubManager(socketio.PubSubManager):
+    """Bus Socket.IO inter-workers sur une table SQLite (scrutée toutes les `poll` s)."""
+    name = "sqlite"
+
+    def __init__(self, path: str, channel: str = "socketio", write_only: bool = False,
+                 logger=None, poll: float = 0.05, keep: float = 60.0):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path, self.poll, self.keep = path, poll, keep
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = _connect(self.path)
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _publish(self, data):
+        self._conn().execute("INSERT INTO bus (channel, ts, data) VALUES (?,?,?)",
+                             (self.channel, time.time(), self.json.dumps(data)))
+
+    def _listen(self):
+        db = self._conn()
+        last = db.execute("SELECT COALESCE(MAX(id), 0) FROM bus").fetchone()[0]
+        purge_at = time.time() + self.keep
+        while True:
+            rows = db.execute("SELECT id, data FROM bus WHERE id > ? AND channel = ? ORDER BY id",
+                              (last, self.channel)).fetchall()
+            for id_, data in rows:
+                last = id_
+                yield data
+            if time.time() >= purge_at:
+                db.execute("DELETE FROM bus WHERE ts < ?", (time.time() - self.keep,))
+                purge_at = time.time() + self.keep
+            self.server.sleep(self.poll)
+
+def make_backend(url: Optional[str] = None) -> StateBackend:
+    """`STATE_BACKEND` : vide/`memory` (défaut) ou `sqlite:///chemin.db`."""
+    url = url if url is not None else os.getenv("STATE_BACKEND", "memory")
+    if url.startswith("sqlite:///"):
+        return SqliteBackend(url[len("sqlite:///"):])
+    return MemoryBackend()
@@ -0,0 +1,149 @@
+# services/chat.py
+"""Chat des salles : limitation de débit, envoi groupé et historique borné.
+
+- `TokenBucket` : seau à jetons par socket (CHAT_RATE messages/s, rafale
+  de CHAT_BURST) ; au-delà, le message est refusé.
+- `ChatHub` : les messages (joueurs et système) sont mis en attente par
+  salle puis envoyés en une seule trame `chat` par tick (CHAT_TICK) : un
+  message seul part tel quel ({"system", "msg"}), plusieurs partent en
+  liste. Les CHAT_HISTORY derniers messages de chaque salle sont gardés
+  pour les joueurs qui arrivent en cours de partie (deque bornée en
+  mémoire ; liste dans le Tracker partagé en multi-workers).
+"""
+from __future__ import annotations
+import logging, os, time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+CHAT_RATE = float(os.getenv("CHAT_RATE", "1"))          # messages / s (régime établi)
+CHAT_BURST = int(os.getenv("CHAT_BURST", "5"))          # rafale tolérée
+CHAT_TICK = float(os.getenv("CHAT_TICK", "0.05"))       # s entre deux trames
+CHAT_HISTORY = int(os.getenv("CHAT_HISTORY", "50"))     # messages gardés par salle
+MAX_LEN = 500                                           # caractères par message
+
+log = logging.getLogger(__name__)
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "at")
+
+    def __init__(self, rate: float = CHAT_RATE, burst: int = CHAT_BURST, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.at = time.monotonic() if now is None else now
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.at) * self.rate)
+        self.at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class ChatHub:
+    def __init__(self, emit: Callable[..., None], store=None, tick: float = CHAT_TICK,
+                 history: int = CHAT_HISTORY):
+        self._emit = emit                   # emit(event, data, room=code)
+        # room -> messages : Tracker du backend partagé, sinon deques en mémoire
+        self._store = store
+        self._history: Dict[str, Deque[dict]] = {}
+        self.tick = tick
+        self.size = history
+        self._pending: Dict[str, List[dict]] = {}
+        self._held: Dict[str, List[dict]] = {}     # salle -> messages système retenus (hold)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._wake = None
+        self._empty = Exception
+        self._sleep: Callable[[float], None] = time.sleep
+        self.stats = {"messages": 0, "frames": 0, "throttled": 0, "errors": 0}
+
+    # ---------- API ----------
+    def allow(self, sid: str) -> bool:
+        """Seau à jetons du socket `sid` : False si le message doit être refusé."""
+        b = self._buckets.get(sid)
+        if b is None:
+            b = self._buckets[sid] = TokenBucket()
+        if b.allow():
+            return True
+        self.stats["throttled"] += 1
+        return False
+
+    def drop(self, sid: str):
+        """Socket déconnecté : oublie son seau."""
+        self._buckets.pop(sid, None)
+
+    def say(self, code: str, msg: str, system: bool = True):
+        """Met un message en attente pour la salle (envoyé au prochain tick)."""
+        m = {"system": system, "msg": msg[:MAX_LEN]}
+        held = self._held.get(code) if system else None
+        if held is not None:
+            held.append(m)
+            return
+        self._push(code, m)
+
+    def hold(self, code: str):
+        """Retient les messages système de la salle jusqu'à `release` (lot de commandes en cours)."""
+        self._held.setdefault(code, [])
+
+    def release(self, code: str, send: bool = True):
+        """Envoie (ou jette, si le lot n'a pas été enregistré) les messages retenus."""
+        for m in self._held.pop(code, None) or ():
+            if send:
+                self._push(code, m)
+
+    def _push(self, code: str, m: dict):
+        self._pending.setdefault(code, []).append(m)
+        if self._store is not None:
+            self._store.update(code, lambda h: ((h or []) + [m])[-self.size:])
+        else:
+            h = self._history.get(code)
+            if h is None:
+                h = self._history[code] = deque(maxlen=self.size)
+            h.append(m)
+        self.stats["messages"] += 1
+        if self._wake is not None:
+            self._wake.put(None)
+        else:
+            self.flush()
+
+    def history(self, code: str) -> List[dict]:
+        store = self._store if self._store is not None else self._history
+        return list(store.get(code) or ())
+
+    def forget(self, code: str):
+        self._pending.pop(code, None)
+        self._history.pop(code, None)
+        if self._store is not None:
+            self._store.pop(code, None)
+
+    def pending(self) -> int:
+        return sum(len(v) for v in self._pending.values())
+
+    def flush(self) -> int:
+        """Envoie une trame par salle avec les messages en attente."""
+        batch, self._pending = self._pending, {}
+        for code, msgs in batch.items():
+            self._emit("chat", msgs[0] if len(msgs) == 1 else msgs, room=code)
+        self.stats["frames"] += len(batch)
+        return len(batch)
+
+    # ---------- envoi en tâche de fond ----------
+    def start(self, spawn: Callable, sleep: Callable[[float], None], queue, empty: type):
+        self._wake, self._sleep, self._empty = queue, sleep, empty
+        spawn(self._run)
+
+    def _run(self):
+        while True:
+            self._wake.get()
+            self._sleep(self.tick)      # regroupe ce qui arrive pendant le tick
+            while True:                 # vide les réveils accumulés
+                try:
+                    self._wake.get(block=False)
+                except self._empty:
+                    break
+            try:
+                self.flush()
+            except Exception:
+                self.stats["errors"] += 1
+                log.exception("envoi des trames de chat en échec")
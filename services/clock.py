@@ -0,0 +1,81 @@
+# services/clock.py
+"""Chrono des étapes : échéances monotones côté serveur, synchro côté client.
+
+La base garde l'heure murale de début d'étape (`stage_started_at` : partagée
+entre workers, reprise après crash). A la première lecture d'une salle, on
+en tire une échéance sur l'horloge monotone du process, gardée en mémoire :
+le temps restant ne recalcule plus de datetime à chaque appel et ne suit
+plus les sauts de l'horloge système.
+
+Les clients reçoivent l'échéance murale (`deadline`, ms epoch) une fois par
+étape et mesurent l'écart entre leur horloge et celle du serveur par
+l'échange `time_sync` (façon NTP : t0 client, heure serveur, t1 client) ;
+le compte à rebours est calculé localement, sans rediffusion de l'état.
+"""
+from __future__ import annotations
+import math, time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+def _ts(dt: datetime) -> float:
+    # SQLite rend des datetimes naïfs : ils sont en UTC
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+class StageClock:
+    def __init__(self, mono: Callable[[], float] = time.monotonic,
+                 wall: Callable[[], float] = time.time):
+        self._mono = mono
+        self._wall = wall
+        # room -> (stage_started_at, durée, échéance monotone)
+        self._deadlines: Dict[str, Tuple[datetime, int, float]] = {}
+
+    def now(self) -> float:
+        """Horloge monotone (celle de l'ordonnanceur)."""
+        return self._mono()
+
+    def start(self, code: str, duration: int) -> datetime:
+        """Démarre l'étape maintenant ; renvoie l'heure murale à enregistrer."""
+        started = datetime.fromtimestamp(self._wall(), timezone.utc)
+        self._deadlines[code] = (started, duration, self._mono() + duration)
+        return started
+
+    def deadline(self, r) -> Optional[float]:
+        """Echéance monotone de l'étape courante (None : chrono pas démarré)."""
+        started = r.stage_started_at
+        if not started:
+            return None
+        e = self._deadlines.get(r.code)
+        if e is None or e[0] != started or e[1] != r.stage_duration_sec:
+            # Salle lue en base (reprise, autre worker) : conversion murale -> monotone, une fois
+            left = _ts(started) + r.stage_duration_sec - self._wall()
+            e = (started, r.stage_duration_sec, self._mono() + left)
+            self._deadlines[r.code] = e
+        return e[2]
+
+    def left(self, r) -> float:
+        """Secondes restantes (négatif si l'échéance est passée)."""
+        d = self.deadline(r)
+        return float(r.stage_duration_sec) if d is None else d - self._mono()
+
+    def remaining(self, r) -> int:
+        """Secondes entières restantes, comme affichées aux joueurs."""
+        return max(0, math.ceil(self.left(r)))
+
+    @staticmethod
+    def deadline_ms(r) -> Optional[int]:
+        """Echéance murale envoyée aux clients (ms epoch), None si pas de chrono."""
+        if r.is_finished or not r.stage_started_at:
+            return None
+        return int((_ts(r.stage_started_at) + r.stage_duration_sec) * 1000)
+
+    def sync(self, t0=None) -> dict:
+        """Réponse à `time_sync` : heure serveur (ms epoch) et t0 renvoyé tel quel."""
+        return {"t0": t0, "server": self._wall() * 1000}
+
+    def forget(self, code: str):
+        self._deadlines.pop(code, None)
+
+    def size(self) -> int:
+        return len(self._deadlines)
@@ -0,0 +1,155 @@
+# services/db.py
+"""Couche base de données : moteur réglé + une session par événement.
+
+SQLite (défaut) : WAL, synchronous=NORMAL, busy_timeout, pool de connexions
+dimensionné. Autre `DB_URI` (ex. postgresql+psycopg://…) : pool classique
+avec pre-ping. Réglages par variables d'environnement :
+
+    DB_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_BUSY_TIMEOUT_MS, DB_SYNCHRONOUS
+"""
+from __future__ import annotations
+import os, threading
+from contextlib import contextmanager
+from typing import Iterator
+from typing import TYPE_CHECKING
+from flask import g, has_app_context
+
+if TYPE_CHECKING:
+    from sqlmodel import Session
+
+DB_URI = os.getenv("DB_URI", "sqlite:///mission_gaia.db")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "16"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")   # OFF | NORMAL | FULL
+
+def _is_memory(uri: str) -> bool:
+    return uri in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in uri
+
+def make_engine(uri: str | None = None, echo: bool = False):
+    # sqlalchemy n'est chargé qu'ici : importer ce module (configure, init_app) reste léger
+    from sqlalchemy import event
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import create_engine
+    uri = uri or DB_URI
+    if not uri.startswith("sqlite"):
+        return create_engine(uri, echo=echo, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                             pool_timeout=POOL_TIMEOUT, pool_pre_ping=True, pool_recycle=1800)
+    connect_args = {"check_same_thread": False, "timeout": BUSY_TIMEOUT_MS / 1000}
+    if _is_memory(uri):
+        # Base en mémoire : une seule connexion partagée, sinon chaque connexion voit une base vide
+        engine = create_engine(uri, echo=echo, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        engine = create_engine(uri, echo=echo, connect_args=connect_args, pool_size=POOL_SIZE,
+                               max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        if not _is_memory(uri):
+            cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+
+    return engine
+
+# Index remplacés (supprimés à la mise à niveau) : table -> noms
+OBSOLETE_INDEXES = {"player": ("ix_player_room_code", "ix_player_code")}  # -> ux_player_room_code
+
+def init_schema(engine):
+    import models  # noqa: F401  (déclare les tables dans SQLModel.metadata)
+    from sqlmodel import SQLModel
+    SQLModel.metadata.create_all(engine)
+    ensure_schema(engine)
+
+def ensure_schema(engine):
+    """Met à niveau une base existante (create_all ne modifie pas les tables déjà créées) :
+    ajoute les colonnes manquantes, crée les index déclarés absents et
+    supprime ceux qu'ils remplacent."""
+    from sqlalchemy import inspect
+    from sqlmodel import SQLModel
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            cols = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in cols and not col.primary_key:
+                    ddl = col.type.compile(dialect=engine.dialect)
+                    default = ""
+                    if col.default is not None and getattr(col.default, "is_scalar", False):
+                        arg = col.default.arg
+                        default = f" DEFAULT {int(arg) if isinstance(arg, bool) else repr(arg)}"
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl}{default}')
+            for idx in table.indexes:
+                idx.create(conn, checkfirst=True)
+            existing = {i["name"] for i in insp.get_indexes(table.name)}
+            for name in OBSOLETE_INDEXES.get(table.name, ()):
+                if name in existing:
+                    conn.exec_driver_sql(f"DROP INDEX {name}")
+
+# ------------------ MOTEUR (créé au premier accès) ------------------
+_engine = None
+_uri = None
+_lock = threading.Lock()
+
+def configure(uri: str | None = None):
+    """Choisit la base sans s'y connecter (le moteur est créé au premier accès)."""
+    global _uri
+    _uri = uri or DB_URI
+
+def bind(engine):
+    global _engine
+    _engine = engine
+
+def get_engine():
+    """Moteur de l'application : créé (et schéma mis à niveau) au premier appel."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                engine = make_engine(_uri or DB_URI)
+                init_schema(engine)
+                _engine = engine
+    return _engine
+
+def dialect_name() -> str:
+    return get_engine().dialect.name
+
+# ------------------ SESSION PAR EVENEMENT ------------------
+def new_session() -> Session:
+    # expire_on_commit=False : les objets restent lisibles après commit
+    from sqlmodel import Session
+    return Session(get_engine(), expire_on_commit=False)
+
+@contextmanager
+def session() -> Iterator[Session]:
+    """Session de l'événement courant (requête HTTP ou événement Socket.IO).
+
+    Dans un contexte Flask, la même session est réutilisée par tous les
+    helpers appelés pendant l'événement et fermée à la fin ; hors contexte
+    (tâches de fond), une session dédiée est ouverte puis fermée.
+    """
+    if has_app_context():
+        s = g.get("db_session")
+        if s is None:
+            s = g.db_session = new_session()
+        yield s
+    else:
+        with new_session() as s:
+            yield s
+
+def close_event_session(_exc=None):
+    s = g.pop("db_session", None)
+    if s is not None:
+        s.close()
+
+def init_app(app, engine=None):
+    if engine is not None:
+        bind(engine)
+    app.teardown_appcontext(close_event_session)
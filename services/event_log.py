@@ -0,0 +1,131 @@
+# services/event_log.py
+"""Journal d'événements par salle + instantanés, pour la reprise après crash.
+
+`append()` met l'événement en tampon et le replie sur l'état de la salle
+gardé en mémoire (indices, débriefs, codes, scénario). `flush()` écrit le
+tampon en un seul INSERT par lot et, toutes les `snapshot_every` entrées
+(ou à chaque changement d'étape), un instantané de l'état.
+
+Au démarrage, `recover()` ne lit que les salles en cours : leur instantané
+puis les quelques événements postérieurs.
+"""
+from __future__ import annotations
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from sqlmodel import select
+from models import Room, RoomEvent, RoomSnapshot
+from services import db, metrics
+
+# Evénements qui déclenchent un instantané au prochain flush
+_SNAPSHOT_KINDS = {"start", "replay", "submit_ok", "timeout"}
+
+def new_state() -> dict:
+    return {"hints": {"stage": 0, "used": 0}, "summary": [], "codes": {}, "scenario": None}
+
+def apply_event(st: dict, kind: str, d: dict) -> dict:
+    """Replie un événement sur l'état d'une salle (même logique que les handlers)."""
+    if kind == "replay":
+        st = new_state()
+        st["scenario"] = d.get("scenario")
+    elif kind == "start":
+        st["scenario"] = d.get("scenario")
+        st["hints"] = {"stage": 0, "used": 0}
+    elif kind == "hint":
+        st["hints"] = {"stage": d["stage"], "used": d["used"]}
+    elif kind == "submit_ok":
+        if d.get("debrief"):
+            st["summary"].append({"stage": d["stage"], "title": d.get("title", ""), "debrief": d["debrief"]})
+        if d.get("stage_code") is not None:
+            st["codes"][str(d["stage"])] = d["stage_code"]
+        st["hints"] = {"stage": d["stage"] + 1, "used": 0}
+    elif kind == "timeout":
+        st["hints"] = {"stage": d["stage"] + 1, "used": 0}
+    return st
+
+class EventLog:
+    def __init__(self, snapshot_every: int = 20):
+        self.snapshot_every = snapshot_every
+        self._buf: List[Tuple[str, str, dict, datetime]] = []
+        self._state: Dict[str, dict] = {}
+        self._since_snap: Dict[str, int] = {}
+        self._snap_due: set = set()
+
+    def append(self, code: str, kind: str, **data):
+        st = self._state.get(code) or new_state()
+        self._state[code] = apply_event(st, kind, data)
+        self._buf.append((code, kind, data, datetime.now(timezone.utc)))
+        if kind == "finish":
+            # Partie terminée : plus rien à reprendre, on libère l'état
+            self.forget(code)
+            self._snap_due.discard(code)
+            return
+        n = self._since_snap.get(code, 0) + 1
+        self._since_snap[code] = n
+        if kind in _SNAPSHOT_KINDS or n >= self.snapshot_every:
+            self._snap_due.add(code)
+
+    def state(self, code: str) -> dict | None:
+        return self._state.get(code)
+
+    def forget(self, code: str):
+        self._state.pop(code, None)
+        self._since_snap.pop(code, None)
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+    @metrics.timed("event_log_flush", "db")
+    def flush(self) -> int:
+        if not self._buf:
+            return 0
+        batch, self._buf = self._buf, []
+        due, self._snap_due = self._snap_due, set()
+        try:
+            with db.new_session() as s:
+                rows = [RoomEvent(room_code=c, kind=k, data=json.dumps(d), at=t) for c, k, d, t in batch]
+                s.add_all(rows)
+                s.flush()       # ids attribués
+                upto: Dict[str, int] = {}
+                for row in rows:
+                    upto[row.room_code] = max(upto.get(row.room_code, 0), row.id)
+                now = datetime.now(timezone.utc)
+                for code in due:
+                    if code in upto and code in self._state:
+                        s.merge(RoomSnapshot(room_code=code, upto_id=upto[code],
+                                             data=json.dumps(self._state[code]), at=now))
+                        self._since_snap[code] = 0
+                s.commit()
+        except Exception:
+            self._buf[:0] = batch
+            self._snap_due |= due
+            raise
+        return len(batch)
+
+    def recover(self) -> List[Tuple[Room, dict]]:
+        """Salles en cours (démarrées, non finies) avec leur état reconstruit."""
+        out = []
+        with db.new_session() as s:
+            rooms = s.exec(select(Room).where(Room.is_finished == False,  # noqa: E712
+                                              Room.started_at != None)).all()  # noqa: E711
+            if not rooms:
+                return out
+            codes = [r.code for r in rooms]
+            snaps = {sn.room_code: sn for sn in
+                     s.exec(select(RoomSnapshot).where(RoomSnapshot.room_code.in_(codes))).all()}
+            floor = min((sn.upto_id for sn in snaps.values()), default=0) if len(snaps) == len(codes) else 0
+            tail: Dict[str, list] = {}
+            for ev in s.exec(select(RoomEvent)
+                             .where(RoomEvent.room_code.in_(codes), RoomEvent.id > floor)
+                             .order_by(RoomEvent.id)).all():
+                tail.setdefault(ev.room_code, []).append(ev)
+            for r in rooms:
+                sn = snaps.get(r.code)
+                st = json.loads(sn.data) if sn else new_state()
+                for ev in tail.get(r.code, []):
+                    if sn is None or ev.id > sn.upto_id:
+                        st = apply_event(st, ev.kind, json.loads(ev.data))
+                self._state[r.code] = st
+                s.expunge(r)
+                out.append((r, st))
+        return out
@@ -0,0 +1,52 @@
+# services/lazy.py
+"""Import différé : le module n'est réellement chargé qu'au premier accès
+à l'un de ses attributs (importlib.util.LazyLoader).
+
+Sert à garder `import app` léger : sqlmodel/SQLAlchemy et les énigmes ne
+sont chargés que lorsqu'une requête (ou le préchauffage) en a besoin.
+"""
+from __future__ import annotations
+import importlib.util, sys
+from types import ModuleType
+from typing import Any, Callable
+
+def lazy_import(name: str) -> ModuleType:
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"module introuvable : {name}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent and parent in sys.modules:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+class Deferred:
+    """Objet construit au premier accès à l'un de ses attributs (ou par `resolve()`).
+
+    Même idée pour les services adossés à sqlmodel : `create_app()` les
+    déclare, le premier appel (ou `warm_up()`) les construit.
+    """
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_obj", None)
+
+    @property
+    def loaded(self) -> bool:
+        return self._obj is not None
+
+    def resolve(self):
+        if self._obj is None:
+            object.__setattr__(self, "_obj", self._factory())
+        return self._obj
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(self.resolve(), name, value)
@@ -0,0 +1,112 @@
+# services/metrics.py
+"""Instrumentation légère (compteurs + histogrammes de latence) au format Prometheus.
+
+Activée par METRICS_ENABLED=1 ; sinon `timed()` renvoie la fonction telle
+quelle (aucun surcoût) et /metrics répond 404.
+"""
+from __future__ import annotations
+import functools, os, threading, time
+from typing import Callable, Dict, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "0") in {"1", "true", "True"}
+PREFIX = "gaia"
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Familles d'histogrammes : nom -> (label, aide)
+FAMILIES = {
+    "handler": ("handler", "Durée des handlers Socket.IO (s)"),
+    "db": ("op", "Durée des accès base / cache (s)"),
+    "mqtt": ("op", "Durée des opérations MQTT (s)"),
+    "scheduler": ("callback", "Durée des callbacks de l'ordonnanceur d'étapes (s)"),
+}
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "errors")
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, v: float):
+        for i, b in enumerate(BUCKETS):
+            if v <= b:
+                self.counts[i] += 1
+                break
+        self.sum += v
+        self.count += 1
+
+_lock = threading.Lock()
+_HIST: Dict[Tuple[str, str], Histogram] = {}
+_GAUGES: Dict[str, Tuple[str, str, Callable[[], float]]] = {}   # nom -> (type, aide, lecture)
+
+def observe(family: str, name: str, seconds: float, error: bool = False):
+    with _lock:
+        h = _HIST.get((family, name))
+        if h is None:
+            h = _HIST[(family, name)] = Histogram()
+        h.observe(seconds)
+        if error:
+            h.errors += 1
+
+def timed(name: str, family: str = "handler"):
+    """Décorateur : mesure durée/appels/erreurs de la fonction (si activé)."""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            err = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                err = True
+                raise
+            finally:
+                observe(family, name, time.perf_counter() - t0, err)
+        return wrapper
+    return deco
+
+def gauge(name: str, help_: str, fn: Callable[[], float]):
+    """Jauge calculée à la lecture de /metrics."""
+    _GAUGES[name] = ("gauge", help_, fn)
+
+def counter(name: str, help_: str, fn: Callable[[], float]):
+    """Compteur cumulé (nom en `_total`) lu à la lecture de /metrics."""
+    _GAUGES[name] = ("counter", help_, fn)
+
+def render() -> str:
+    out = []
+    with _lock:
+        items = sorted(_HIST.items())
+        snap = [(k, list(h.counts), h.sum, h.count, h.errors) for k, h in items]
+    for family, (label, help_) in FAMILIES.items():
+        rows = [r for r in snap if r[0][0] == family]
+        if not rows:
+            continue
+        m = f"{PREFIX}_{family}_seconds"
+        out.append(f"# HELP {m} {help_}")
+        out.append(f"# TYPE {m} histogram")
+        for (_, name), counts, total, n, _ in rows:
+            acc = 0
+            for b, c in zip(BUCKETS, counts):
+                acc += c
+                out.append(f'{m}_bucket{{{label}="{name}",le="{b}"}} {acc}')
+            out.append(f'{m}_bucket{{{label}="{name}",le="+Inf"}} {n}')
+            out.append(f'{m}_sum{{{label}="{name}"}} {total:.6f}')
+            out.append(f'{m}_count{{{label}="{name}"}} {n}')
+        e = f"{PREFIX}_{family}_errors_total"
+        out.append(f"# HELP {e} Appels terminés par une exception ({label})")
+        out.append(f"# TYPE {e} counter")
+        for (_, name), _, _, _, errors in rows:
+            out.append(f'{e}{{{label}="{name}"}} {errors}')
+    for name, (kind, help_, fn) in sorted(_GAUGES.items()):
+        try:
+            v = float(fn())
+        except Exception:
+            continue
+        out.append(f"# HELP {PREFIX}_{name} {help_}")
+        out.append(f"# TYPE {PREFIX}_{name} {kind}")
+        out.append(f"{PREFIX}_{name} {v:g}")
+    return "\n".join(out) + "\n"
@@ -1,34 +1,372 @@
-import os, json
+"""Pont matériel MQTT : file d'envoi bornée + thread éditeur.
+
+Deux modes (MQTT_MODE) :
+
+- "rooms" (défaut) : un message par appel, sur `<salle>/led`,
+  `<salle>/buzzer` et `<salle>/chrono` ;
+- "site" : les changements de toutes les salles sont regroupés en une
+  trame par tick (MQTT_FRAME_TICK) sur `site/<MQTT_SITE>/frame` :
+  {"seq": n, "set": {salle: {"c": couleur, "l": 0|1}}, "bz": [[salle, ms]]}
+  (seuls les champs modifiés). L'état complet des salles modifiées est
+  republié au plus toutes les MQTT_RETAIN_EVERY s en message retenu sur
+  `<salle>/state` ({"c", "l", "seq"}) : un boîtier qui se (re)connecte le reçoit
+  aussitôt puis suit les trames ; un changement qui lui aurait échappé
+  entre-temps lui parvient au plus tard à la republication suivante.
+"""
+import os, json, threading, time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from services import metrics
 
 MQTT_DISABLED = os.getenv("MQTT_DISABLED","0") in {"1","true","True"}
+MQTT_FAKE = os.getenv("MQTT_FAKE","0") in {"1","true","True"}
 MQTT_URL = os.getenv("MQTT_URL","broker.hivemq.com")
 MQTT_PORT = int(os.getenv("MQTT_PORT","1883"))
 MQTT_PREFIX = os.getenv("MQTT_PREFIX","gaia")
+MQTT_QUEUE_MAX = int(os.getenv("MQTT_QUEUE_MAX","1000"))
+MQTT_BACKOFF_MAX = float(os.getenv("MQTT_BACKOFF_MAX","30"))
+MQTT_MODE = os.getenv("MQTT_MODE","rooms")          # rooms | site
+MQTT_SITE = os.getenv("MQTT_SITE","site")
+MQTT_FRAME_TICK = float(os.getenv("MQTT_FRAME_TICK","0.1"))
+MQTT_RETAIN_EVERY = float(os.getenv("MQTT_RETAIN_EVERY","1"))
 
-_client = None
+# Topics "d'état" : seul le dernier message compte (les autres sont fusionnés)
+_COALESCE = ("/chrono", "/led", "/state")
+# Topics retenus par le broker (dernier état livré à chaque nouvel abonné)
+_RETAIN = ("/state",)
 
-def _ensure():
-    global _client
-    if MQTT_DISABLED:
-        return None
-    try:
-        import paho.mqtt.client as mqtt
-        if _client: return _client
-        _client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-        _client.connect(MQTT_URL, MQTT_PORT, keepalive=60)
-        _client.loop_start()
-        return _client
-    except Exception:
+# ------------------ CLIENT DE TEST ------------------
+def topic_matches(pattern: str, topic: str) -> bool:
+    """Filtre MQTT (`+` : un niveau, `#` : la suite)."""
+    p, t = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(p):
+        if part == "#":
+            return True
+        if i >= len(t) or (part != "+" and part != t[i]):
+            return False
+    return len(p) == len(t)
+
+class FakeBroker:
+    """Broker en mémoire (tests, simulateur) : abonnements et messages retenus."""
+    def __init__(self):
+        self.retained: Dict[str, bytes] = {}
+        self._subs: List[tuple] = []        # (filtre, callback(topic, payload))
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "bytes": 0, "delivered": 0}
+
+    def publish(self, topic: str, payload, retain: bool = False):
+        data = payload.encode() if isinstance(payload, str) else payload
+        with self._lock:
+            self.stats["published"] += 1
+            self.stats["bytes"] += len(data)
+            if retain:
+                self.retained[topic] = data
+            subs = [cb for f, cb in self._subs if topic_matches(f, topic)]
+        for cb in subs:
+            self.stats["delivered"] += 1
+            cb(topic, data)
+
+    def subscribe(self, pattern: str, callback: Callable[[str, bytes], None]):
+        with self._lock:
+            self._subs.append((pattern, callback))
+            retained = [(t, d) for t, d in self.retained.items() if topic_matches(pattern, t)]
+        for t, d in retained:
+            callback(t, d)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subs = [(f, cb) for f, cb in self._subs if cb != callback]
+
+class FakeClient:
+    """Client MQTT factice (MQTT_FAKE=1) : garde les messages en mémoire
+    (et les transmet à `broker` s'il est fourni)."""
+    def __init__(self, broker: Optional[FakeBroker] = None):
+        self.messages = []
+        self.broker = broker
+        self.connected = False
+    def connect(self, host, port, keepalive=60): self.connected = True
+    def reconnect_delay_set(self, min_delay=1, max_delay=120): pass
+    def loop_start(self): pass
+    def loop_stop(self): pass
+    def disconnect(self): self.connected = False
+    def is_connected(self): return self.connected
+    def publish(self, topic, payload, qos=0, retain=False):
+        if self.broker is not None:
+            self.broker.publish(topic, payload, retain)
+        else:
+            self.messages.append((topic, payload, qos, retain))
+
+def _paho_client():
+    import paho.mqtt.client as mqtt
+    return mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+
+# ------------------ FILE D'ENVOI ------------------
+class Outbox:
+    """File bornée : fusion par topic d'état, éviction des plus anciens si pleine."""
+    def __init__(self, maxsize: int = MQTT_QUEUE_MAX):
+        self.maxsize = maxsize
+        self._q: "OrderedDict[object, tuple]" = OrderedDict()
+        self._seq = 0
+        self._front = 0
+        self._woken = False
+        self._cond = threading.Condition()
+        self.stats = {"enqueued": 0, "published": 0, "coalesced": 0, "dropped": 0,
+                      "errors": 0, "connects": 0, "offline_waits": 0,
+                      "latency_sum": 0.0, "latency_max": 0.0}
+
+    def put(self, topic: str, payload: dict):
+        with self._cond:
+            self.stats["enqueued"] += 1
+            if topic.endswith(_COALESCE):
+                key = topic
+                if key in self._q:
+                    del self._q[key]
+                    self.stats["coalesced"] += 1
+            else:
+                self._seq += 1
+                key = (topic, self._seq)
+            if len(self._q) >= self.maxsize:
+                self._q.popitem(last=False)
+                self.stats["dropped"] += 1
+            self._q[key] = (topic, payload, time.monotonic())
+            self._cond.notify()
+
+    def take(self, max_batch: int = 100, timeout: float | None = None) -> list:
+        with self._cond:
+            if not self._q and not self._woken:
+                self._cond.wait(timeout)
+            self._woken = False
+            batch = []
+            while self._q and len(batch) < max_batch:
+                batch.append(self._q.popitem(last=False)[1])
+            return batch
+
+    def requeue(self, batch: list):
+        """Remet un lot non envoyé en tête (sans écraser les messages plus récents)."""
+        with self._cond:
+            for topic, payload, t0 in reversed(batch):
+                if topic.endswith(_COALESCE) and topic in self._q:
+                    continue
+                if len(self._q) >= self.maxsize:
+                    self.stats["dropped"] += 1
+                    continue
+                self._front -= 1
+                key = topic if topic.endswith(_COALESCE) else (topic, self._front)
+                self._q[key] = (topic, payload, t0)
+                self._q.move_to_end(key, last=False)
+
+    def wake(self):
+        """Réveille l'éditeur (trame de site en attente)."""
+        with self._cond:
+            self._woken = True
+            self._cond.notify()
+
+    def depth(self) -> int:
+        return len(self._q)
+
+# ------------------ MODE SITE (trames groupées) ------------------
+class SiteFrames:
+    """Changements de toutes les salles d'un site, publiés en une trame par tick."""
+    def __init__(self, site: str = MQTT_SITE, tick: float = MQTT_FRAME_TICK,
+                 retain_every: float = MQTT_RETAIN_EVERY):
+        self.site = site
+        self.tick = tick
+        self.retain_every = retain_every
+        self.topic = f"site/{site}/frame"
+        self._lock = threading.Lock()
+        self._last: Dict[str, dict] = {}        # salle -> état complet (publié retenu)
+        self._changed: Dict[str, dict] = {}     # salle -> champs modifiés depuis la dernière trame
+        self._events: List[list] = []           # [salle, ms] (buzzer)
+        self._dirty: set = set()                # salles dont l'état retenu est à republier
+        self._seq = 0
+        self._next = 0.0                        # heure (monotone) de la prochaine trame possible
+        self._next_retain = 0.0                 # ... et de la prochaine republication des états
+        self._wake: Callable[[], None] = lambda: None
+        self.stats = {"updates": 0, "frames": 0, "retained": 0}
+
+    def state(self, room: str, **fields):
+        with self._lock:
+            self.stats["updates"] += 1
+            cur = self._last.setdefault(room, {})
+            changes = {k: v for k, v in fields.items() if cur.get(k) != v}
+            if not changes:
+                return
+            cur.update(changes)
+            first = not self._changed and not self._events
+            self._changed.setdefault(room, {}).update(changes)
+        if first:
+            self._wake()
+
+    def buzz(self, room: str, ms: int):
+        with self._lock:
+            self.stats["updates"] += 1
+            first = not self._changed and not self._events
+            self._events.append([room, ms])
+        if first:
+            self._wake()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._changed) + len(self._events) + len(self._dirty)
+
+    def last(self, room: str) -> dict:
+        with self._lock:
+            return dict(self._last.get(room) or {})
+
+    def drain(self, outbox: "Outbox", now: Optional[float] = None) -> Optional[float]:
+        """Met dans la file la trame du tick et les états retenus s'ils sont dus.
+        Renvoie le délai avant la prochaine échéance (None : rien en attente)."""
+        now = time.monotonic() if now is None else now
+        frame = states = None
+        with self._lock:
+            if (self._changed or self._events) and now >= self._next:
+                self._seq += 1
+                frame = {"seq": self._seq, "set": self._changed}
+                if self._events:
+                    frame["bz"] = self._events
+                self._dirty.update(self._changed)
+                self._changed, self._events = {}, []
+                self._next = now + self.tick
+            if self._dirty and now >= self._next_retain:
+                states = {room: {**self._last[room], "seq": self._seq} for room in self._dirty}
+                self._dirty = set()
+                self._next_retain = now + self.retain_every
+            waits = []
+            if self._changed or self._events:
+                waits.append(self._next - now)
+            if self._dirty:
+                waits.append(self._next_retain - now)
+        if frame is not None:
+            outbox.put(self.topic, frame)
+            self.stats["frames"] += 1
+        for room, st in (states or {}).items():
+            outbox.put(f"{room}/state", st)
+            self.stats["retained"] += 1
+        return max(0.0, min(waits)) if waits else None
+
+# ------------------ EDITEUR (thread dédié) ------------------
+class Publisher:
+    def __init__(self, outbox: Outbox, client_factory=None, frames: Optional[SiteFrames] = None):
+        self.outbox = outbox
+        self.frames = frames
+        if frames is not None:
+            frames._wake = outbox.wake
+        self.client_factory = client_factory or (FakeClient if MQTT_FAKE else _paho_client)
+        self.client = None
+        self._backoff = 0.0
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mqtt-publisher", daemon=True)
+            self._thread.start()
+
+    def _connected(self):
+        """Client prêt à publier, ou None (on patiente avec un backoff exponentiel)."""
+        if self.client is None:
+            try:
+                c = self.client_factory()
+                c.reconnect_delay_set(min_delay=1, max_delay=int(MQTT_BACKOFF_MAX))
+                c.connect(MQTT_URL, MQTT_PORT, keepalive=60)
+                c.loop_start()      # la boucle paho gère ensuite les reconnexions
+                self.client = c
+                self.outbox.stats["connects"] += 1
+            except Exception:
+                self._grow_backoff()
+                return None
+        if self.client.is_connected():
+            self._backoff = 0.0
+            return self.client
+        self._grow_backoff()
         return None
 
-def _pub(topic: str, payload: dict):
-    c = _ensure()
-    if not c: return
-    try:
-        c.publish(f"{MQTT_PREFIX}/{topic}", json.dumps(payload), qos=1)
-    except Exception:
-        pass
-
-def led(room: str, on: bool): _pub(f"{room}/led", {"on": on})
-def buzzer(room: str, ms:int=200): _pub(f"{room}/buzzer", {"beep_ms": ms})
-def chrono_color(room: str, color: str): _pub(f"{room}/chrono", {"color": color})
+    def _grow_backoff(self):
+        self.outbox.stats["offline_waits"] += 1
+        self._backoff = min(MQTT_BACKOFF_MAX, (self._backoff * 2) or 0.25)
+
+    def _run(self):
+        self._connected()       # connexion dès le démarrage, sans attendre un premier message
+        while True:
+            delay = self.frames.drain(self.outbox) if self.frames is not None else None
+            batch = self.outbox.take(timeout=1.0 if delay is None else delay)
+            if not batch:
+                continue
+            c = self._connected()
+            if c is None:
+                self.outbox.requeue(batch)
+                time.sleep(self._backoff)
+                continue
+            for i, (topic, payload, t0) in enumerate(batch):
+                try:
+                    c.publish(f"{MQTT_PREFIX}/{topic}", json.dumps(payload, separators=(",", ":")),
+                              qos=1, retain=topic.endswith(_RETAIN))
+                except Exception:
+                    self.outbox.stats["errors"] += 1
+                    self.outbox.requeue(batch[i:])
+                    break
+                lat = time.monotonic() - t0
+                if metrics.ENABLED:
+                    metrics.observe("mqtt", "publish", lat)
+                st = self.outbox.stats
+                st["published"] += 1
+                st["latency_sum"] += lat
+                st["latency_max"] = max(st["latency_max"], lat)
+
+# ------------------ PONT ------------------
+class Bridge:
+    """File d'envoi + éditeur, en mode "rooms" ou "site"."""
+    def __init__(self, mode: str = MQTT_MODE, client_factory=None, site: str = MQTT_SITE,
+                 tick: float = MQTT_FRAME_TICK, retain_every: float = MQTT_RETAIN_EVERY):
+        self.mode = mode
+        self.outbox = Outbox()
+        self.frames = SiteFrames(site, tick, retain_every) if mode == "site" else None
+        self.publisher = Publisher(self.outbox, client_factory, self.frames)
+
+    def _put(self, topic: str, payload: dict):
+        self.outbox.put(topic, payload)
+        self.publisher.start()
+
+    def led(self, room: str, on: bool):
+        if self.frames is None:
+            return self._put(f"{room}/led", {"on": on})
+        self.frames.state(room, l=int(on)); self.publisher.start()
+
+    def buzzer(self, room: str, ms: int = 200):
+        if self.frames is None:
+            return self._put(f"{room}/buzzer", {"beep_ms": ms})
+        self.frames.buzz(room, ms); self.publisher.start()
+
+    def chrono_color(self, room: str, color: str):
+        if self.frames is None:
+            return self._put(f"{room}/chrono", {"color": color})
+        self.frames.state(room, c=color); self.publisher.start()
+
+    def stats(self) -> dict:
+        """Compteurs de la file MQTT (profondeur, envoyés, fusionnés, perdus, latence)."""
+        st = dict(self.outbox.stats)
+        st["depth"] = self.outbox.depth()
+        st["latency_avg"] = st["latency_sum"] / st["published"] if st["published"] else 0.0
+        st["connected"] = bool(self.publisher.client and self.publisher.client.is_connected())
+        st["mode"] = self.mode
+        if self.frames is not None:
+            st.update({f"site_{k}": v for k, v in self.frames.stats.items()})
+        return st
+
+_bridge = Bridge()
+
+@metrics.timed("enqueue", "mqtt")
+def _pub(kind: str, room: str, value):
+    if MQTT_DISABLED: return
+    getattr(_bridge, kind)(room, value)
+
+def warm_up():
+    """Démarre l'éditeur (et la connexion au broker) sans attendre le premier message."""
+    if not MQTT_DISABLED:
+        _bridge.publisher.start()
+
+def stats() -> dict:
+    return _bridge.stats()
+
+def led(room: str, on: bool): _pub("led", room, on)
+def buzzer(room: str, ms:int=200): _pub("buzzer", room, ms)
+def chrono_color(room: str, color: str): _pub("chrono_color", room, color)
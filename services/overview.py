@@ -0,0 +1,101 @@
+# services/overview.py
+"""Vue d'ensemble des salles pour les organisateurs (namespace /organizer).
+
+Chaque état calculé pour une salle (diffusion, instantané de connexion,
+reprise après crash) met à jour une ligne compacte : étape, échéance,
+indices utilisés, fin de partie. Seules les lignes réellement modifiées
+sont marquées ; toutes les OVERVIEW_TICK secondes, une seule trame
+`overview_patch` ({"set": {salle: ligne}, "del": [salles]}) part vers les
+organisateurs connectés. A la connexion, ils reçoivent la vue complète
+(`overview`). Aucune lecture de la table Room : le temps restant se
+décompte côté client depuis l'échéance, comme dans la page de salle.
+
+En multi-workers, chaque worker envoie les salles qu'il fait tourner ;
+le client fusionne les trames. Les lignes sont aussi écrites dans l'état
+partagé (`share`) : la vue complète couvre alors les salles de tous les
+workers, quel que soit celui où l'organisateur est connecté.
+"""
+from __future__ import annotations
+import os
+from typing import Callable, Dict, Optional, Set
+
+OVERVIEW_TICK = float(os.getenv("OVERVIEW_TICK", "1"))      # s entre deux trames
+
+class Overview:
+    def __init__(self, tick: float = OVERVIEW_TICK):
+        self.tick = tick
+        self._rows: Dict[str, dict] = {}
+        self._changed: Set[str] = set()
+        self._removed: Set[str] = set()
+        self.watchers = 0                   # organisateurs connectés à ce worker
+        self._store = None                  # salle -> ligne, partagé entre workers
+        self.stats = {"updates": 0, "frames": 0, "rooms_sent": 0}
+
+    def share(self, store):
+        """Multi-workers : lignes recopiées dans `store` (Tracker), lu par `snapshot`."""
+        self._store = store
+
+    @staticmethod
+    def row(payload: dict) -> dict:
+        """Ligne organisateur tirée de `state_payload` (sans le prompt)."""
+        hints = payload.get("hints") or {}
+        return {"stage": payload["stage"], "total": payload["total"],
+                "deadline": payload["deadline"], "duration": payload["duration"],
+                "hints": hints.get("used", 0), "hints_total": hints.get("total", 0),
+                "finished": payload["finished"], "success": payload["success"]}
+
+    # ---------- API ----------
+    def update(self, code: str, payload: dict) -> bool:
+        """Met à jour la ligne de la salle ; True si elle a changé."""
+        row = self.row(payload)
+        if self._rows.get(code) == row:
+            return False
+        self._rows[code] = row
+        self._changed.add(code)
+        self._removed.discard(code)
+        self.stats["updates"] += 1
+        if self._store is not None:
+            self._store[code] = row
+        return True
+
+    def forget(self, code: str):
+        if self._rows.pop(code, None) is not None:
+            self._changed.discard(code)
+            self._removed.add(code)
+        if self._store is not None:
+            self._store.pop(code, None)
+
+    def snapshot(self) -> dict:
+        rows = self._store.items() if self._store is not None else dict(self._rows)
+        return {"rooms": rows, "tick": self.tick}
+
+    def drain(self) -> Optional[dict]:
+        """Changements depuis la dernière trame, ou None s'il n'y en a pas."""
+        if not self._changed and not self._removed:
+            return None
+        frame = {"set": {c: self._rows[c] for c in self._changed}, "del": sorted(self._removed)}
+        self._changed, self._removed = set(), set()
+        return frame
+
+    def size(self) -> int:
+        return len(self._rows)
+
+    # ---------- envoi en tâche de fond ----------
+    def start(self, spawn: Callable, sleep: Callable[[float], None], emit: Callable[[dict], None],
+              watched: Optional[Callable[[], bool]] = None):
+        """`emit(frame)` toutes les `tick` s s'il y a du neuf ; `watched()` faux : la trame est jetée
+        (un organisateur qui arrive reçoit de toute façon la vue complète)."""
+        watched = watched or (lambda: self.watchers > 0)
+        def loop():
+            while True:
+                sleep(self.tick)
+                frame = self.drain()
+                if frame is None or not watched():
+                    continue
+                try:
+                    emit(frame)
+                except Exception:
+                    continue
+                self.stats["frames"] += 1
+                self.stats["rooms_sent"] += len(frame["set"])
+        spawn(loop)
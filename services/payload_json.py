@@ -0,0 +1,33 @@
+# services/payload_json.py
+"""Module JSON pour Socket.IO acceptant des fragments déjà encodés.
+
+`RawJSON(texte)` est recopié tel quel dans le paquet au lieu d'être
+re-sérialisé (prompts d'étape pré-encodés une fois pour toutes).
+S'utilise via `SocketIO(app, json=payload_json)`.
+"""
+import json, secrets
+
+_MARK = "\x00raw" + secrets.token_hex(4) + ":"
+
+class RawJSON:
+    __slots__ = ("encoded",)
+    def __init__(self, encoded: str):
+        self.encoded = encoded
+
+    @classmethod
+    def of(cls, obj) -> "RawJSON":
+        return cls(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+
+def dumps(obj, **kwargs) -> str:
+    raws = []
+    def _default(o):
+        if isinstance(o, RawJSON):
+            raws.append(o.encoded)
+            return f"{_MARK}{len(raws) - 1}"
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+    out = json.dumps(obj, default=_default, **kwargs)
+    for i, enc in enumerate(raws):
+        out = out.replace(json.dumps(f"{_MARK}{i}", **kwargs), enc, 1)
+    return out
+
+loads = json.loads
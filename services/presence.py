@@ -0,0 +1,138 @@
+# services/presence.py
+"""Présence des joueurs et reprise de session sans repasser par la base.
+
+- `Presence` : registre en mémoire sid -> (salle, joueur, pseudo), avec le
+  nombre de joueurs en ligne par salle tenu à jour à chaque connexion /
+  déconnexion (lecture en O(1)). Un joueur ouvert dans deux onglets
+  compte une fois. Le registre est propre au worker (les sids aussi) ;
+  en multi-workers (`share`), chaque worker publie ses joueurs en ligne
+  par salle dans l'état partagé et le compte agrège les workers vivants.
+- `ResumeTokens` : jeton signé (itsdangerous, clé SECRET_KEY) remis après
+  l'authentification ; à la reconnexion, le client le présente et
+  rejoint sa salle sans relire ni réécrire le joueur en base. Avec la
+  clé d'exemple ("dev", publique, donc jetons forgeables), les jetons ne
+  sont ni émis ni acceptés hors mode debug : chacun repasse par `auth`.
+"""
+from __future__ import annotations
+import os
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+RESUME_MAX_AGE = int(os.getenv("RESUME_MAX_AGE", str(12 * 3600)))   # s
+DEV_SECRET = "dev"      # SECRET_KEY par défaut de app.py
+
+class Seat(NamedTuple):
+    room: str
+    player: str
+    name: str
+
+class Presence:
+    def __init__(self):
+        self._by_sid: Dict[str, Seat] = {}
+        self._rooms: Dict[str, Dict[str, int]] = {}     # salle -> joueur -> nb de sockets
+        self._store = None                              # salle -> {worker: [joueurs]} (multi-workers)
+        self._worker = ""
+        self._alive: Callable[[], Set[str]] = set
+        self.stats = {"joins": 0, "leaves": 0}
+
+    def share(self, store, worker: str, alive: Callable[[], Set[str]]):
+        """Multi-workers : publie les joueurs en ligne de ce worker dans `store` (Tracker) ;
+        `alive()` donne les workers vivants (les autres ne comptent plus)."""
+        self._store, self._worker, self._alive = store, worker, alive
+
+    def join(self, sid: str, room: str, player: str, name: str) -> bool:
+        """Associe le socket au joueur ; True si le nombre de joueurs en ligne a changé."""
+        prev = self._by_sid.get(sid)
+        if prev is not None:
+            if prev.room == room and prev.player == player:
+                self._by_sid[sid] = Seat(room, player, name)
+                return False
+            self.leave(sid)
+        self._by_sid[sid] = Seat(room, player, name)
+        sockets = self._rooms.setdefault(room, {})
+        sockets[player] = sockets.get(player, 0) + 1
+        self.stats["joins"] += 1
+        if sockets[player] != 1:
+            return False
+        self._publish(room)
+        return True
+
+    def leave(self, sid: str) -> Optional[Seat]:
+        """Oublie le socket ; renvoie sa place, ou None s'il n'était pas authentifié."""
+        seat = self._by_sid.pop(sid, None)
+        if seat is None:
+            return None
+        self.stats["leaves"] += 1
+        sockets = self._rooms.get(seat.room) or {}
+        n = sockets.get(seat.player, 0) - 1
+        if n > 0:
+            sockets[seat.player] = n
+        else:
+            sockets.pop(seat.player, None)
+            if not sockets:
+                self._rooms.pop(seat.room, None)
+            self._publish(seat.room)
+        return seat
+
+    def _publish(self, room: str):
+        if self._store is None:
+            return
+        mine, alive = sorted(self._rooms.get(room) or ()), self._alive()
+        def put(by_worker):
+            # Au passage, on retire les joueurs des workers morts
+            by_worker = {w: ps for w, ps in (by_worker or {}).items() if w in alive and w != self._worker}
+            if mine:
+                by_worker[self._worker] = mine
+            return by_worker
+        self._store.update(room, put)
+
+    def forget(self, room: str):
+        """Salle archivée : retire ses joueurs de l'état partagé."""
+        if self._store is not None:
+            self._store.pop(room, None)
+
+    def seat(self, sid: str) -> Optional[Seat]:
+        return self._by_sid.get(sid)
+
+    def online(self, room: str) -> int:
+        return len(self.players(room))
+
+    def players(self, room: str) -> List[str]:
+        """Joueurs en ligne dans la salle (tous workers vivants confondus)."""
+        if self._store is None:
+            return list(self._rooms.get(room) or ())
+        alive = self._alive()
+        seen = set(self._rooms.get(room) or ())
+        for w, ps in (self._store.get(room) or {}).items():
+            if w in alive and w != self._worker:
+                seen.update(ps)
+        return sorted(seen)
+
+    def sockets(self) -> int:
+        return len(self._by_sid)
+
+    def total_online(self) -> int:
+        """Joueurs en ligne sur ce worker."""
+        return sum(len(v) for v in self._rooms.values())
+
+class ResumeTokens:
+    def __init__(self, secret: str, max_age: int = RESUME_MAX_AGE, allow_dev: bool = False):
+        self._s = URLSafeTimedSerializer(secret, salt="resume")
+        self.max_age = max_age
+        self.enabled = bool(secret) and (secret != DEV_SECRET or allow_dev)
+
+    def issue(self, room: str, player: str, name: str) -> Optional[str]:
+        """Jeton de reprise, ou None si la clé ne permet pas d'en signer."""
+        if not self.enabled:
+            return None
+        return self._s.dumps([room, player, name])
+
+    def verify(self, token) -> Optional[Seat]:
+        """Place signée dans le jeton, ou None (absent, altéré, expiré ou jetons désactivés)."""
+        if not self.enabled or not isinstance(token, str):
+            return None
+        try:
+            room, player, name = self._s.loads(token, max_age=self.max_age)
+        except (BadSignature, ValueError, TypeError):
+            return None
+        return Seat(room, player, name)
@@ -0,0 +1,139 @@
+# services/profiler.py
+"""Profileur par échantillonnage, lancé à la demande (/admin/profile).
+
+Pendant la fenêtre demandée, un vrai thread (eventlet n'est pas
+monkey-patché) relève toutes les `interval` secondes la pile de chaque
+thread via `sys._current_frames()` : pour le thread du hub eventlet, c'est
+la pile du greenlet en cours d'exécution. Les fonctions connues (handlers
+Socket.IO, ordonnanceur, acteurs de salle, MQTT, helpers base) sont
+reconnues à leur objet code et étiquetées dans la pile ; les échantillons
+où le thread attend (hub, Condition) sont comptés à part.
+
+Sortie : piles repliées (« collapsed stacks », une ligne `f1;f2;f3 N`,
+lisible par flamegraph.pl / speedscope) ou résumé JSON par étiquette.
+Hors fenêtre, aucun thread ni hook : coût nul.
+"""
+from __future__ import annotations
+import inspect, os, sys, threading, time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+MAX_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+
+# Attente (fichier, fonction) : le thread ne fait rien
+_IDLE = {("threading.py", "wait"), ("epolls.py", "wait"), ("poll.py", "wait"),
+         ("selects.py", "wait"), ("kqueue.py", "wait"), ("queue.py", "get"),
+         ("selectors.py", "select"), ("client.py", "_loop")}      # client.py : boucle réseau paho
+
+def _label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class Profile:
+    """Résultat d'une fenêtre d'échantillonnage."""
+    def __init__(self, stacks: Counter, tags: Counter, idle: Counter, samples: int,
+                 seconds: float, interval: float):
+        self.stacks = stacks        # "thread;f1;...;fn" -> échantillons
+        self.tags = tags            # étiquette -> échantillons (inclusif)
+        self.idle = idle            # thread -> échantillons en attente
+        self.samples = samples      # relevés (tous threads confondus)
+        self.seconds = seconds
+        self.interval = interval
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def summary(self, top: int = 20) -> dict:
+        busy = sum(self.stacks.values()) or 1
+        return {
+            "seconds": round(self.seconds, 3), "interval": self.interval,
+            "samples": self.samples, "busy": sum(self.stacks.values()), "idle": dict(self.idle),
+            "tags": {t: {"samples": n, "pct": round(100 * n / busy, 1)} for t, n in self.tags.most_common()},
+            "top_stacks": [{"stack": s, "samples": n} for s, n in self.stacks.most_common(top)],
+        }
+
+class SamplingProfiler:
+    def __init__(self):
+        self._tags: Dict[object, str] = {}      # objet code -> étiquette
+        self._lock = threading.Lock()           # une seule fenêtre à la fois
+
+    def tag(self, label: str, *fns: Callable):
+        """Etiquette les fonctions (décorateurs éventuels retirés)."""
+        for fn in fns:
+            fn = inspect.unwrap(getattr(fn, "__func__", fn))
+            code = getattr(fn, "__code__", None)
+            if code is not None:
+                self._tags[code] = label
+
+    def tag_many(self, items: Iterable[Tuple[str, Callable]]):
+        for label, fn in items:
+            self.tag(label, fn)
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: float = 0.005,
+            wait: Optional[Callable[[float], None]] = None, main_only: bool = False) -> Optional[Profile]:
+        """Echantillonne pendant `seconds` ; None si une autre fenêtre est en cours.
+
+        `wait` fait patienter l'appelant (socketio.sleep depuis un greenlet,
+        pour que le hub continue de tourner pendant la mesure) ; `main_only` :
+        seulement le thread appelant (celui du hub)."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            seconds = min(max(seconds, 0.05), MAX_SECONDS)
+            interval = max(interval, MIN_INTERVAL)
+            out: dict = {}
+            only = threading.get_ident() if main_only else None
+            t = threading.Thread(target=self._sample, args=(seconds, interval, out, only),
+                                 name="profiler", daemon=True)
+            t.start()
+            if wait is not None:
+                while t.is_alive():
+                    wait(min(0.1, seconds))
+            t.join()
+            return out["profile"]
+        finally:
+            self._lock.release()
+
+    # ---------- thread d'échantillonnage ----------
+    def _sample(self, seconds: float, interval: float, out: dict, only: Optional[int] = None):
+        me = threading.get_ident()
+        names = {}
+        stacks, tags, idle = Counter(), Counter(), Counter()
+        samples = 0
+        t0 = time.perf_counter()
+        end = t0 + seconds
+        while (now := time.perf_counter()) < end:
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (only is not None and ident != only):
+                    continue
+                name = names.get(ident)
+                if name is None:
+                    th = threading._active.get(ident)
+                    name = names[ident] = th.name if th else str(ident)
+                samples += 1
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    idle[name] += 1
+                    continue
+                parts, seen = [], set()
+                while frame is not None:
+                    code = frame.f_code
+                    tag = self._tags.get(code)
+                    if tag is not None:
+                        parts.append(f"[{tag}] {_label(code)}")
+                        seen.add(tag)
+                    else:
+                        parts.append(_label(code))
+                    frame = frame.f_back
+                parts.append(name)
+                stacks[";".join(reversed(parts))] += 1
+                for tag in seen:
+                    tags[tag] += 1
+            time.sleep(max(0.0, interval - (time.perf_counter() - now)))
+        out["profile"] = Profile(stacks, tags, idle, samples, time.perf_counter() - t0, interval)
+
+profiler = SamplingProfiler()
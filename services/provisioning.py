@@ -0,0 +1,107 @@
+# services/provisioning.py
+"""Création des salles et de leurs codes joueurs, à l'unité ou par lot.
+
+Une salle et ses joueurs sont insérés dans la même transaction ; la
+création par lot (préparation d'un événement) insère des centaines de
+salles en quelques requêtes et s'exporte en CSV ou en fiches imprimables.
+Les codes de salle neufs viennent de l'allocateur (services/room_codes.py).
+"""
+from __future__ import annotations
+import csv, io, secrets
+from typing import Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from models import Room, Player, utcnow
+from services import db
+from services.room_codes import KeyMissing, allocator
+
+PLAYERS_PER_ROOM = 4
+MAX_PLAYERS = 12
+BULK_MAX_ROOMS = 500        # salles par appel de création par lot
+
+class CodeTaken(Exception):
+    """Une salle porte déjà ce code (index unique sur Room.code)."""
+
+def generate_player_codes(n: int = PLAYERS_PER_ROOM) -> List[str]:
+    codes: set = set()
+    while len(codes) < n:                       # uniques dans la salle (index composite)
+        codes.add(secrets.token_hex(3).upper())  # 6 chars
+    return list(codes)
+
+def create_room(code: str, n_players: int = PLAYERS_PER_ROOM) -> Tuple[Room, List[Player]]:
+    """Salle + joueurs en une seule transaction (CodeTaken si le code est pris)."""
+    with db.session() as s:
+        room = Room(code=code)
+        players = [Player(room_code=code, code=c) for c in generate_player_codes(n_players)]
+        s.add(room); s.add_all(players)
+        try:
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            raise CodeTaken(code) from e
+        for o in [room, *players]:
+            s.expunge(o)
+    return room, players
+
+def create_new_room(n_players: int = PLAYERS_PER_ROOM) -> Tuple[Room, List[Player]]:
+    """Salle au code neuf : jamais une salle existante, sans lecture préalable."""
+    for _ in range(8):
+        try:
+            return create_room(allocator().next(), n_players)
+        except CodeTaken:
+            continue        # code déjà saisi à la main : on passe au suivant
+    raise RuntimeError("Impossible d'attribuer un code de salle")
+
+def bulk_create_rooms(count: int, n_players: int = PLAYERS_PER_ROOM) -> List[Tuple[Room, List[Player]]]:
+    """Pré-crée `count` salles (codes réservés en bloc) et leurs joueurs."""
+    if not 1 <= count <= BULK_MAX_ROOMS:
+        raise ValueError(f"count doit être entre 1 et {BULK_MAX_ROOMS}")
+    with db.session() as s:
+        codes: List[str] = []
+        while len(codes) < count:
+            want = allocator().take(count - len(codes))
+            # Seuls des codes saisis à la main peuvent coïncider : une requête IN, en principe vide
+            taken = set(s.exec(select(Room.code).where(Room.code.in_(want))).all())
+            codes += [c for c in want if c not in taken]
+        # INSERT multi-lignes (un executemany par table) puis relecture en une requête :
+        # les objets rendus ont leur clé primaire, comme ceux chargés par le cache
+        now = utcnow()
+        players = {code: generate_player_codes(n_players) for code in codes}
+        s.exec(insert(Room), params=[{"code": c, "created_at": now} for c in codes])
+        s.exec(insert(Player), params=[{"room_code": c, "code": pc, "joined_at": now}
+                                       for c in codes for pc in players[c]])
+        s.commit()
+    return rooms_with_players(codes)
+
+def rooms_with_players(codes: Optional[Iterable[str]] = None, active_only: bool = False
+                       ) -> List[Tuple[Room, List[Player]]]:
+    """Salles (toutes, ou la liste `codes`) avec leurs joueurs, en deux requêtes."""
+    wanted = select(Room.code)
+    if codes is not None:
+        wanted = wanted.where(Room.code.in_(list(codes)))
+    if active_only:
+        wanted = wanted.where(Room.is_finished == False)  # noqa: E712
+    with db.session() as s:
+        rooms = s.exec(select(Room).where(Room.code.in_(wanted)).order_by(Room.code)).all()
+        by_room: dict = {r.code: [] for r in rooms}
+        for p in s.exec(select(Player).where(Player.room_code.in_(wanted))
+                        .order_by(Player.room_code, Player.id)).all():
+            by_room[p.room_code].append(p)
+        for o in [*rooms, *(p for ps in by_room.values() for p in ps)]:
+            s.expunge(o)
+        return [(r, by_room[r.code]) for r in rooms]
+
+def iter_csv(rooms: Iterable[Tuple[Room, List[Player]]], n_players: int = PLAYERS_PER_ROOM) -> Iterator[str]:
+    """Lignes CSV (salle, codes joueurs), à streamer telles quelles."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(["room_code"] + [f"player_{i+1}" for i in range(n_players)])
+    for r, ps in rooms:
+        w.writerow([r.code] + [p.code for p in ps])
+        yield buf.getvalue()
+        buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+def export_csv(rooms: Iterable[Tuple[Room, List[Player]]], n_players: int = PLAYERS_PER_ROOM) -> str:
+    return "".join(iter_csv(rooms, n_players))
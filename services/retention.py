@@ -0,0 +1,115 @@
+# services/retention.py
+"""Archivage des salles terminées.
+
+Les salles finies depuis plus de RETENTION_MAX_AGE_H heures sont sorties
+de la base par petits lots (RETENTION_BATCH) : salle, joueurs et journal
+d'événements sont écrits en JSONL compressé (ARCHIVE_DIR/rooms-AAAAMMJJ.jsonl.gz,
+une ligne par salle) puis supprimés. Le passage tourne en tâche de fond
+toutes les RETENTION_INTERVAL secondes et rend la main entre deux lots.
+"""
+from __future__ import annotations
+import gzip, json, logging, os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional
+from sqlalchemy import and_, delete, or_
+from sqlmodel import select
+from models import Room, Player, RoomEvent, RoomSnapshot
+from services import db, metrics
+
+log = logging.getLogger(__name__)
+
+MAX_AGE_H = float(os.getenv("RETENTION_MAX_AGE_H", "24"))     # <= 0 : archivage désactivé
+INTERVAL = float(os.getenv("RETENTION_INTERVAL", "300"))
+BATCH = int(os.getenv("RETENTION_BATCH", "50"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+class Archiver:
+    def __init__(self, on_archived: Callable[[List[str]], None],
+                 busy: Callable[[], Iterable[str]] = lambda: (),
+                 max_age_h: float = MAX_AGE_H, batch: int = BATCH, archive_dir: str = ARCHIVE_DIR):
+        self.on_archived = on_archived      # purge des états mémoire des salles archivées
+        self.busy = busy                    # codes encore utilisés par ce worker : on les garde
+        self.max_age = timedelta(hours=max_age_h)
+        self.batch = batch
+        self.archive_dir = archive_dir
+        self.stats = {"archived": 0, "runs": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age > timedelta(0)
+
+    def _path(self, now: datetime) -> str:
+        return os.path.join(self.archive_dir, f"rooms-{now:%Y%m%d}.jsonl.gz")
+
+    @metrics.timed("archive_batch", "db")
+    def archive_batch(self, now: Optional[datetime] = None) -> Optional[List[str]]:
+        """Archive un lot de salles ; renvoie leurs codes (None : plus rien à archiver)."""
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - self.max_age
+        old = and_(Room.is_finished == True,  # noqa: E712
+                   or_(Room.finished_at < cutoff,
+                       and_(Room.finished_at == None, Room.created_at < cutoff)))  # noqa: E711
+        q = select(Room).where(old)
+        skip = list(self.busy())
+        if skip:
+            q = q.where(Room.code.not_in(skip))
+        with db.new_session() as s:
+            rooms = s.exec(q.order_by(Room.id).limit(self.batch)).all()
+            if not rooms:
+                return None
+            # DELETE conditionnel : un autre worker a pu archiver (ou relancer) la salle entre-temps
+            ids = set(s.exec(delete(Room).where(Room.id.in_([r.id for r in rooms]), old)
+                             .returning(Room.id)
+                             .execution_options(synchronize_session=False)).scalars().all())
+            rooms = [r for r in rooms if r.id in ids]
+            codes = [r.code for r in rooms]
+            players: dict = {c: [] for c in codes}
+            for p in s.exec(select(Player).where(Player.room_code.in_(codes)).order_by(Player.id)).all():
+                players[p.room_code].append(p.model_dump(mode="json", exclude={"id", "room_code"}))
+            events: dict = {c: [] for c in codes}
+            for ev in s.exec(select(RoomEvent).where(RoomEvent.room_code.in_(codes)).order_by(RoomEvent.id)).all():
+                events[ev.room_code].append({"kind": ev.kind, "data": json.loads(ev.data),
+                                             "at": ev.at.isoformat()})
+            for model in (Player, RoomEvent, RoomSnapshot):
+                s.exec(delete(model).where(model.room_code.in_(codes))
+                       .execution_options(synchronize_session=False))
+            if codes:
+                # Archive écrite avant le commit : en cas d'échec, rien n'est supprimé
+                os.makedirs(self.archive_dir, exist_ok=True)
+                with gzip.open(self._path(now), "at", encoding="utf-8") as f:
+                    for r in rooms:
+                        f.write(json.dumps({"room": r.model_dump(mode="json", exclude={"id"}),
+                                            "players": players[r.code], "events": events[r.code]},
+                                           ensure_ascii=False, separators=(",", ":")) + "\n")
+            s.commit()
+        if codes:
+            self.stats["archived"] += len(codes)
+            self.on_archived(codes)
+        return codes
+
+    def run_once(self, yield_: Callable[[], None] = lambda: None, limit: int = 1000) -> int:
+        """Archive jusqu'à `limit` lots, en rendant la main entre deux lots."""
+        n = 0
+        self.stats["runs"] += 1
+        for _ in range(limit):
+            codes = self.archive_batch()
+            if codes is None:
+                break
+            n += len(codes)
+            yield_()
+        return n
+
+    # ---------- tâche de fond ----------
+    def start(self, spawn: Callable, sleep: Callable[[float], None], interval: float = INTERVAL):
+        if not self.enabled:
+            return
+        def loop():
+            while True:
+                sleep(interval)
+                try:
+                    self.run_once(lambda: sleep(0))
+                except Exception:
+                    # Base occupée… réessai au prochain passage
+                    self.stats["errors"] += 1
+                    log.exception("passage d'archivage en échec")
+        spawn(loop)
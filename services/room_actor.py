@@ -0,0 +1,89 @@
+# services/room_actor.py
+"""Une file de commandes par salle, traitée dans l'ordre par un seul greenlet.
+
+Toutes les mutations d'une salle (submit, fin de chrono, start, replay,
+indice) passent par `post()` : l'acteur de la salle les applique l'une
+après l'autre, ce qui supprime les courses entre un submit et la fin du
+chrono. Les commandes déjà en file, et les submits arrivés dans la même
+fenêtre (`batch_window`), sont traités en un lot : une seule lecture de
+la salle, un seul enregistrement et une seule diffusion d'état.
+
+Un acteur inactif pendant `idle_timeout` s'arrête ; il est relancé à la
+prochaine commande.
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, List
+
+MAX_BATCH = 32
+
+class Command:
+    __slots__ = ("kind", "data")
+
+    def __init__(self, kind: str, data: Dict[str, Any]):
+        self.kind = kind
+        self.data = data
+
+    def __repr__(self):
+        return f"Command({self.kind!r}, {self.data!r})"
+
+class RoomActors:
+    def __init__(self, handle: Callable[[str, List[Command]], None], spawn: Callable,
+                 make_queue: Callable[[], Any], empty: type,
+                 batch_window: float = 0.01, idle_timeout: float = 30.0,
+                 batch_kinds=("submit",)):
+        self.handle = handle            # handle(code, [Command]) : applique un lot
+        self._spawn = spawn
+        self._make_queue = make_queue
+        self._empty = empty
+        self.batch_window = batch_window
+        self.idle_timeout = idle_timeout
+        self.batch_kinds = frozenset(batch_kinds)   # commandes qui attendent la fenêtre
+        self._queues: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"commands": 0, "batches": 0, "errors": 0}
+
+    def post(self, code: str, kind: str, **data):
+        """Met une commande en file pour la salle (démarre son acteur si besoin)."""
+        with self._lock:
+            q = self._queues.get(code)
+            if q is None:
+                q = self._queues[code] = self._make_queue()
+                self._spawn(self._run, code, q)
+            q.put(Command(kind, data))
+        self.stats["commands"] += 1
+
+    def active(self) -> int:
+        return len(self._queues)
+
+    def codes(self) -> List[str]:
+        """Salles dont l'acteur tourne (commandes en cours ou récentes)."""
+        return list(self._queues)
+
+    # ---------- interne ----------
+    def _next_batch(self, q) -> List[Command]:
+        batch = [q.get(timeout=self.idle_timeout)]
+        # Fenêtre de regroupement : les submits quasi simultanés partent ensemble
+        wait = self.batch_window if batch[0].kind in self.batch_kinds else 0
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(q.get(timeout=wait) if wait else q.get(block=False))
+            except self._empty:
+                break
+        return batch
+
+    def _run(self, code: str, q):
+        while True:
+            try:
+                batch = self._next_batch(q)
+            except self._empty:
+                with self._lock:
+                    if q.empty():
+                        del self._queues[code]
+                        return
+                continue
+            self.stats["batches"] += 1
+            try:
+                self.handle(code, batch)
+            except Exception:
+                self.stats["errors"] += 1
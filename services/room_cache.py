@@ -0,0 +1,182 @@
+# services/room_cache.py
+"""Cache mémoire des salles en cours (source de vérité pendant la partie).
+
+Les handlers lisent/modifient les objets Room/Player gardés en RAM ;
+les modifications sont marquées « sales » puis écrites en base par lot
+(write-behind) : périodiquement, ou dès qu'un flush est demandé
+(changement d'étape, fin de partie).
+
+En mode `shared` (plusieurs workers), la base reste la référence : chaque
+lecture recharge la salle et chaque écriture est immédiate. Les salles sont
+écrites avec un verrou optimiste (`Room.version`) : une écriture faite sur
+une version périmée est abandonnée et la salle relue depuis la base ;
+`take_conflict()` le signale à l'appelant, qui n'annonce alors rien.
+"""
+from __future__ import annotations
+import logging
+from typing import Callable, Dict, List, Optional, Set
+from sqlalchemy import update
+from sqlmodel import select
+from models import Room, Player
+from services import db, metrics
+
+log = logging.getLogger(__name__)
+
+class RoomCache:
+    def __init__(self, flush_interval: float = 2.0, shared: bool = False):
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self._rooms: Dict[str, Room] = {}
+        self._players: Dict[str, List[Player]] = {}
+        self._dirty: Dict[int, object] = {}     # id(obj) -> obj
+        self._wake = None
+        self._also: List[Callable[[], object]] = []   # autres écrivains par lot (journal…)
+        self._empty = Exception
+        self._conflicts: Set[str] = set()       # salles dont une écriture a été abandonnée
+        self.stats = {"flushes": 0, "rows": 0, "loads": 0, "conflicts": 0, "flush_errors": 0}
+
+    # ---------- lecture ----------
+    def get_room(self, code: str) -> Optional[Room]:
+        if self.shared:
+            self.evict(code)
+        r = self._rooms.get(code)
+        if r is None:
+            with db.session() as s:
+                r = s.exec(select(Room).where(Room.code == code)).first()
+                if r is not None:
+                    s.expunge(r)    # détaché : seul l'écrivain le rattache
+            self.stats["loads"] += 1
+            if r is not None:
+                self._rooms[code] = r
+        return r
+
+    def list_players(self, code: str) -> List[Player]:
+        ps = self._players.get(code)
+        if ps is None:
+            with db.session() as s:
+                ps = list(s.exec(select(Player).where(Player.room_code == code)).all())
+                for p in ps:
+                    s.expunge(p)
+            self.stats["loads"] += 1
+            self._players[code] = ps
+        return ps
+
+    def get_player(self, code_room: str, code_player: str) -> Optional[Player]:
+        for p in self.list_players(code_room):
+            if p.code == code_player:
+                return p
+        return None
+
+    # ---------- écriture ----------
+    def add(self, obj, flush: bool = False):
+        """Marque un objet comme modifié ; `flush=True` réveille l'écrivain."""
+        if isinstance(obj, Room):
+            self._rooms[obj.code] = obj
+        elif isinstance(obj, Player) and obj.room_code in self._players:
+            ps = self._players[obj.room_code]
+            if not any(p is obj for p in ps):
+                ps.append(obj)
+        self._dirty[id(obj)] = obj
+        if self.shared:
+            self.flush()
+        elif flush:
+            self.request_flush()
+        return obj
+
+    def put(self, obj, players: Optional[List[Player]] = None):
+        """Place un objet déjà persistant dans le cache (sans le marquer modifié),
+        avec ses joueurs s'ils viennent d'être créés avec lui."""
+        if isinstance(obj, Room):
+            self._rooms[obj.code] = obj
+            if players is not None and not self.shared:
+                self._players[obj.code] = list(players)
+        return obj
+
+    def also_flush(self, fn: Callable[[], object]):
+        """Ajoute un écrivain appelé à chaque passage de l'écrivain de fond."""
+        self._also.append(fn)
+
+    def evict(self, code: str):
+        """Oublie une salle (après un flush) : relue depuis la base au prochain accès."""
+        self._rooms.pop(code, None)
+        self._players.pop(code, None)
+
+    @metrics.timed("flush", "db")
+    def flush(self) -> int:
+        if not self._dirty:
+            return 0
+        batch = list(self._dirty.values())
+        self._dirty.clear()
+        rooms = [o for o in batch if isinstance(o, Room) and o.id is not None]
+        others = [o for o in batch if not (isinstance(o, Room) and o.id is not None)]
+        stale = set()
+        try:
+            with db.new_session() as s:
+                for r in rooms:
+                    # Verrou optimiste : l'UPDATE ne passe que si personne n'a écrit depuis la lecture
+                    res = s.exec(update(Room)
+                                 .where(Room.id == r.id, Room.version == r.version)
+                                 .values(**r.model_dump(exclude={"id", "version"}), version=r.version + 1))
+                    if res.rowcount == 0:
+                        stale.add(id(r))
+                s.add_all(others)
+                s.commit()
+        except Exception:
+            # On remet le lot en attente pour le prochain passage
+            for o in batch:
+                self._dirty.setdefault(id(o), o)
+            raise
+        for r in rooms:
+            if id(r) in stale:
+                # Un autre écrivain est passé avant : la base fait foi, la salle sera relue
+                self.stats["conflicts"] += 1
+                self._conflicts.add(r.code)
+                self.evict(r.code)
+            else:
+                r.version += 1
+        self.stats["flushes"] += 1
+        self.stats["rows"] += len(batch)
+        return len(batch)
+
+    def take_conflict(self, code: str) -> bool:
+        """True (une seule fois) si une écriture de la salle a été abandonnée depuis le dernier appel."""
+        if code in self._conflicts:
+            self._conflicts.discard(code)
+            return True
+        return False
+
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def live_codes(self) -> List[str]:
+        """Salles en cache encore en jeu ou avec des écritures en attente."""
+        dirty = {o.code for o in self._dirty.values() if isinstance(o, Room)}
+        return [c for c, r in self._rooms.items() if not r.is_finished or c in dirty]
+
+    def size(self) -> int:
+        return len(self._rooms)
+
+    # ---------- écrivain en tâche de fond ----------
+    def request_flush(self):
+        if self._wake is not None:
+            self._wake.put(None)
+        else:
+            self.flush()
+
+    def start(self, spawn: Callable, queue, empty: type):
+        self._wake, self._empty = queue, empty
+        spawn(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                self._wake.get(timeout=self.flush_interval)
+            except self._empty:
+                pass
+            for fn in [self.flush] + self._also:
+                try:
+                    fn()
+                except Exception:
+                    # Lot remis en attente, réessai au prochain tour ; tant que ça échoue, rien n'est en base
+                    self.stats["flush_errors"] += 1
+                    log.exception("écriture par lot en échec (%d objets en attente)", self.pending())
@@ -0,0 +1,132 @@
+# services/room_codes.py
+"""Attribution des codes de salle : uniques par construction, sans lecture de la table.
+
+Un compteur persistant (table `codesequence`) numérote les salles ; le
+numéro passe par une permutation pseudo-aléatoire à clé (réseau de Feistel
+sur [0, 31^ROOM_CODE_LEN), « cycle walking ») puis est écrit dans un
+alphabet sans caractères ambigus (ni 0/O, ni 1/I/L). Deux numéros donnent
+toujours deux codes différents, et les codes ne se devinent pas d'une
+salle à l'autre.
+
+Chaque worker réserve les numéros par blocs (ROOM_CODE_BLOCK) en un seul
+UPSERT … RETURNING : un code coûte une requête par bloc, quelle que soit
+la taille de la table. Les codes saisis à la main (page d'accueil)
+restent possibles ; l'index unique sur `Room.code` les départage.
+
+    ROOM_CODE_KEY    clé de la permutation (défaut : SECRET_KEY, obligatoire hors mode debug)
+                     — à ne pas changer en cours d'événement
+    ROOM_CODE_LEN    longueur des codes (5 : 28 millions de salles)
+    ROOM_CODE_BLOCK  numéros réservés par aller-retour en base
+"""
+from __future__ import annotations
+import hashlib, os, threading
+from typing import List
+from flask.helpers import get_debug_flag
+from sqlalchemy.dialects import postgresql, sqlite
+from models import CodeSequence
+from services import db
+
+ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+CODE_LEN = int(os.getenv("ROOM_CODE_LEN", "5"))
+BLOCK = int(os.getenv("ROOM_CODE_BLOCK", "64"))
+
+class FeistelPermutation:
+    """Bijection de [0, n) : Feistel équilibré sur 2k bits, réappliqué tant que le résultat dépasse n."""
+    def __init__(self, n: int, key: bytes, rounds: int = 4):
+        bits = max(2, (n - 1).bit_length())
+        bits += bits % 2
+        self.n = n
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+        self.key = hashlib.blake2b(key, digest_size=32).digest()
+        self.rounds = rounds
+
+    def _f(self, i: int, x: int) -> int:
+        h = hashlib.blake2b(bytes([i]) + x.to_bytes(8, "big"), key=self.key, digest_size=8)
+        return int.from_bytes(h.digest(), "big") & self.mask
+
+    def __call__(self, x: int) -> int:
+        if not 0 <= x < self.n:
+            raise ValueError(f"{x} hors de [0, {self.n})")
+        while True:
+            left, right = x >> self.half, x & self.mask
+            for i in range(self.rounds):
+                left, right = right, left ^ self._f(i, right)
+            x = (left << self.half) | right
+            if x < self.n:
+                return x
+
+_CHARS = frozenset(ALPHABET)
+
+def is_valid(code: str, length: int = CODE_LEN) -> bool:
+    """Code au format de l'allocateur (alphabet, longueur) : contrôle des codes saisis à la main."""
+    return len(code) == length and _CHARS.issuperset(code)
+
+def encode(x: int, length: int = CODE_LEN) -> str:
+    out = []
+    for _ in range(length):
+        x, d = divmod(x, len(ALPHABET))
+        out.append(ALPHABET[d])
+    return "".join(reversed(out))
+
+class KeyMissing(RuntimeError):
+    """Ni ROOM_CODE_KEY ni SECRET_KEY hors mode debug : pas de codes automatiques."""
+
+class RoomCodeAllocator:
+    def __init__(self, key: str, length: int = CODE_LEN, block: int = BLOCK, name: str = "room"):
+        self.perm = FeistelPermutation(len(ALPHABET) ** length, key.encode())
+        self.length = length
+        self.block = block
+        self.name = name
+        self._next = self._end = 0      # bloc réservé : [_next, _end)
+        self._lock = threading.Lock()
+        self.stats = {"issued": 0, "blocks": 0}
+
+    def code(self, seq: int) -> str:
+        if seq >= self.perm.n:
+            raise RuntimeError("Plus de codes de salle disponibles (augmenter ROOM_CODE_LEN)")
+        return encode(self.perm(seq), self.length)
+
+    def take(self, n: int = 1) -> List[str]:
+        """`n` codes jamais attribués (réserve un nouveau bloc si besoin)."""
+        out: List[str] = []
+        with self._lock:
+            while len(out) < n:
+                if self._next >= self._end:
+                    size = max(self.block, n - len(out))
+                    self._end = self._reserve(size)
+                    self._next = self._end - size
+                k = min(n - len(out), self._end - self._next)
+                out += [self.code(i) for i in range(self._next, self._next + k)]
+                self._next += k
+        self.stats["issued"] += n
+        return out
+
+    def next(self) -> str:
+        return self.take(1)[0]
+
+    def _reserve(self, size: int) -> int:
+        """Avance le compteur partagé de `size` ; renvoie la fin du bloc obtenu."""
+        ins = (postgresql if db.dialect_name() == "postgresql" else sqlite).insert(CodeSequence)
+        stmt = (ins.values(name=self.name, next=size)
+                .on_conflict_do_update(index_elements=["name"], set_={"next": CodeSequence.next + size})
+                .returning(CodeSequence.next))
+        with db.new_session() as s:
+            end = s.exec(stmt).scalar_one()
+            s.commit()
+        self.stats["blocks"] += 1
+        return end
+
+_allocator = None
+
+def allocator() -> RoomCodeAllocator:
+    global _allocator
+    if _allocator is None:
+        key = os.getenv("ROOM_CODE_KEY") or os.getenv("SECRET_KEY")
+        if not key:
+            # Avec une clé connue de tous, la suite des codes se devine d'une salle à l'autre
+            if not get_debug_flag():
+                raise KeyMissing("ROOM_CODE_KEY (ou SECRET_KEY) doit être défini hors mode debug")
+            key = "dev"
+        _allocator = RoomCodeAllocator(key)
+    return _allocator
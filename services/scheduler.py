@@ -0,0 +1,119 @@
+# services/scheduler.py
+"""Ordonnanceur central des chronos d'étape.
+
+Un seul greenlet pour toutes les salles : un tas (heapq) d'échéances
+(passage jaune à 60 %, rouge à 30 %, fin d'étape) ; le greenlet dort
+jusqu'à la prochaine échéance et ne réveille que la salle concernée.
+Les heures passées à `schedule()` sont sur l'horloge `clock` (monotone).
+"""
+from __future__ import annotations
+import heapq, itertools, logging, time
+from typing import Callable, Dict, List, Tuple
+
+log = logging.getLogger(__name__)
+
+# Seuils de couleur (ratio de temps restant) — identiques à l'ancien watcher
+GREEN_RATIO = 0.6
+YELLOW_RATIO = 0.3
+
+def color_for(remaining: float, duration: int) -> str:
+    ratio = remaining / max(1, duration)
+    return "green" if ratio >= GREEN_RATIO else ("yellow" if ratio >= YELLOW_RATIO else "red")
+
+class StageScheduler:
+    def __init__(self, on_color: Callable[[str, str], None], on_timeout: Callable[[str], None],
+                 spawn: Callable, queue, empty: type, clock: Callable[[], float] = time.monotonic):
+        self.on_color = on_color
+        self.on_timeout = on_timeout
+        self._spawn = spawn
+        self._wake = queue          # file de réveil (eventlet ou stdlib)
+        self._empty = empty
+        self._clock = clock
+        self._heap: List[Tuple[float, int, str, int, str]] = []
+        self._seq = itertools.count()
+        self._gen: Dict[str, int] = {}      # room -> génération courante (annulation paresseuse)
+        self._colors: Dict[str, str] = {}   # room -> dernière couleur envoyée
+        self._running = False
+        self.stats = {"fired": 0, "errors": 0}
+
+    # ---------- API ----------
+    def schedule(self, code: str, started_at: float, duration: int):
+        """(Re)programme les échéances de l'étape courante d'une salle."""
+        gen = self._gen.get(code, 0) + 1
+        self._gen[code] = gen
+        now = self._clock()
+        deadline = started_at + duration
+        self._set_color(code, color_for(deadline - now, duration))
+        for ratio, kind in ((GREEN_RATIO, "yellow"), (YELLOW_RATIO, "red")):
+            at = deadline - ratio * duration
+            if at > now:
+                self._push(at, code, gen, kind)
+        self._push(deadline, code, gen, "timeout")
+        self._ensure_loop()
+        self._wake.put(None)
+
+    def cancel(self, code: str, color: str = "off"):
+        """Retire la salle de l'ordonnanceur (partie finie) et éteint le chrono."""
+        if self._gen.pop(code, None) is None and code not in self._colors:
+            return
+        self._set_color(code, color)
+        self._colors.pop(code, None)
+
+    def drop(self, code: str):
+        """Oublie la salle sans toucher au chrono (reprise par un autre worker)."""
+        self._gen.pop(code, None)
+        self._colors.pop(code, None)
+
+    def is_scheduled(self, code: str) -> bool:
+        return code in self._gen
+
+    def active(self) -> int:
+        return len(self._gen)
+
+    def pending(self) -> int:
+        """Echéances dans le tas (y compris périmées non encore dépilées)."""
+        return len(self._heap)
+
+    # ---------- interne ----------
+    def _push(self, at: float, code: str, gen: int, kind: str):
+        heapq.heappush(self._heap, (at, next(self._seq), code, gen, kind))
+
+    def _set_color(self, code: str, color: str):
+        if self._colors.get(code) != color:
+            self._colors[code] = color
+            self.on_color(code, color)
+
+    def _ensure_loop(self):
+        if not self._running:
+            self._running = True
+            self._spawn(self._run)
+
+    def _run(self):
+        while True:
+            delay = None
+            if self._heap:
+                delay = max(0.0, self._heap[0][0] - self._clock())
+            if delay is None or delay > 0:
+                try:
+                    self._wake.get(timeout=delay)
+                except self._empty:
+                    pass
+                continue
+            self._fire_due()
+
+    def _fire_due(self):
+        now = self._clock()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, code, gen, kind = heapq.heappop(self._heap)
+            if self._gen.get(code) != gen:
+                continue        # échéance périmée (étape validée, replay…)
+            try:
+                if kind == "timeout":
+                    self.on_timeout(code)
+                else:
+                    self._set_color(code, kind)
+                self.stats["fired"] += 1
+            except Exception:
+                # Une échéance en erreur ne bloque pas les suivantes
+                self.stats["errors"] += 1
+                log.exception("échéance %s de la salle %s en échec", kind, code)
@@ -0,0 +1,56 @@
+# services/state_sync.py
+"""Protocole d'état versionné : un instantané complet par étape, puis des patchs.
+
+Chaque salle a un numéro de séquence. `frame()` renvoie soit l'événement
+`state` (instantané complet, avec le prompt) quand l'étape ou la fin de
+partie change, soit `state_patch` ({"seq", "set"}) avec les seuls champs
+modifiés. Le client applique les patchs et demande un `resync` s'il
+détecte un trou dans la séquence.
+
+Le numéro de séquence avance dans `Tracker.update` (une transaction) :
+deux workers ne diffusent jamais le même numéro.
+"""
+from __future__ import annotations
+from typing import Callable, Optional, Tuple
+from services.backend import MemoryBackend
+
+class StateStream:
+    def __init__(self, store=None):
+        # store : Tracker du backend (partagé ou mémoire)
+        self._store = store if store is not None else MemoryBackend().tracker("stream")
+
+    @staticmethod
+    def _key(payload: dict) -> list:
+        return [payload["stage"], payload["finished"]]
+
+    def frame(self, code: str, payload: dict, build_prompt: Callable[[], Optional[dict]],
+              full: bool = False) -> Tuple[str, dict]:
+        """`payload` sans prompt ; `build_prompt` n'est appelé que pour un instantané."""
+        out: dict = {}
+        def step(st):
+            seq = (st["seq"] + 1) if st else 1
+            if full or st is None or st["key"] != self._key(payload):
+                out.pop("set", None)
+                return {"seq": seq, "key": self._key(payload), "last": payload}
+            out["set"] = {k: v for k, v in payload.items() if st["last"].get(k) != v}
+            return {"seq": seq, "key": st["key"], "last": {**st["last"], **out["set"]}}
+        seq = self._store.update(code, step)["seq"]
+        if "set" in out:
+            return "state_patch", {"seq": seq, "set": out["set"]}
+        return "state", {**payload, "prompt": build_prompt(), "seq": seq}
+
+    def snapshot(self, code: str, payload: dict, build_prompt: Callable[[], Optional[dict]]) -> dict:
+        """Instantané pour un seul client (connexion, resync) : ne consomme pas de séquence."""
+        key = self._key(payload)
+        st = self._store.get(code)
+        if st is None or st["key"] != key:
+            # Etat jamais diffusé : on ouvre une nouvelle séquence (les autres clients resynchronisent)
+            def step(cur):
+                if cur is not None and cur["key"] == key:
+                    return cur              # un autre worker l'a ouverte entre-temps
+                return {"seq": (cur["seq"] + 1) if cur else 1, "key": key, "last": payload}
+            st = self._store.update(code, step)
+        return {**payload, "prompt": build_prompt(), "seq": st["seq"]}
+
+    def forget(self, code: str):
+        self._store.pop(code, None)
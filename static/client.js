@@ -14,10 +14,13 @@ const $authBtn = document.getElementById("authBtn");
 const $playerName = document.getElementById("playerName");
 const $playerCode = document.getElementById("playerCode");
 const $replay = document.getElementById("replayBtn"); // dans le header si présent
+const $online = document.getElementById("online");
 
 let AUTH = false;
 let NAME = "";
 let timerInterval = null;
+let STATE = null;   // dernier état complet connu
+let SEQ = 0;        // numéro de séquence du dernier état appliqué
 
 function appendChat(m){
   const d = document.createElement("div");
@@ -25,26 +28,29 @@ function appendChat(m){
   $chatLog?.prepend(d);
 }
 
+// ---------- Horloge serveur (static/clock.js) ----------
+const serverNow = serverClock(socket);
+
 // ---------- Timer local ----------
-function fmt(sec){
-  const m = String(Math.floor(sec/60)).padStart(2,"0");
-  const s = String(sec%60).padStart(2,"0");
-  return `${m}:${s}`;
-}
-function startLocalTimer(initial){
-  if (!$timer) return;
-  if (timerInterval) clearInterval(timerInterval);
-  let rem = Math.max(0, parseInt(initial,10) || 0);
+// Décompte calculé depuis l'échéance du serveur (pas de dérive, pas besoin de rediffusion)
+function renderTimer(){
+  if (!STATE || !STATE.deadline){
+    $timer.textContent = `⏳ ${fmt(STATE?.duration || 0)}`;
+    return;
+  }
+  const rem = Math.max(0, Math.ceil((STATE.deadline - serverNow())/1000));
   $timer.textContent = `⏳ ${fmt(rem)}`;
-  timerInterval = setInterval(()=>{
-    rem = Math.max(0, rem-1);
-    $timer.textContent = `⏳ ${fmt(rem)}`;
-    if (rem <= 0){
+  if (rem <= 0){
     clearInterval(timerInterval);
     timerInterval = null;
     showTimeoutPopup(); // ← affiche la popup quand le temps est écoulé
+  }
 }
-  },1000);
+function startLocalTimer(){
+  if (!$timer) return;
+  if (timerInterval){ clearInterval(timerInterval); timerInterval = null; }
+  renderTimer();
+  if (STATE?.deadline && !timerInterval && STATE.deadline > serverNow()) timerInterval = setInterval(renderTimer, 250);
 }
 function showTimeoutPopup() {
   const modal = document.getElementById("timeoutModal");
@@ -62,6 +68,13 @@ function showTimeoutPopup() {
 }
 
 // ---------- Auth ----------
+// Jeton de reprise (par onglet) : reconnexion sans ressaisir le code joueur
+const RESUME_KEY = `gaia_resume_${ROOM}`;
+socket.on("connect", ()=>{
+  const token = sessionStorage.getItem(RESUME_KEY);
+  if (token) socket.emit("resume", { room: ROOM, token, history: !$chatLog?.childElementCount });
+});
+
 $authBtn?.addEventListener("click", ()=>{
   const name = ($playerName?.value || "").trim() || "Agent";
   const pcode = ($playerCode?.value || "").trim().toUpperCase();
@@ -69,13 +82,17 @@ $authBtn?.addEventListener("click", ()=>{
   socket.emit("auth", { room: ROOM, name, player_code: pcode });
 });
 
-socket.on("auth_result", ({ok, msg})=>{
-  appendChat({system:true, msg});
+socket.on("auth_result", ({ok, msg, name, token, resumed})=>{
+  if (!ok && resumed){ sessionStorage.removeItem(RESUME_KEY); }
+  if (!(ok && resumed)) appendChat({system:true, msg});
   if(ok){
+    if (token) sessionStorage.setItem(RESUME_KEY, token);
+    const first = !AUTH;
     AUTH = true;
-    NAME = ($playerName?.value || "Agent").trim() || "Agent";
+    NAME = name || ($playerName?.value || "Agent").trim() || "Agent";
     [$start, $submit, $hint, $chatInput, $chatSend].forEach(el=>{ if(el){ el.disabled = false; }});
     document.getElementById("authBox")?.remove();
+    if (resumed || !first) return;
 
     // === Afficher la popup de contexte ===
     const modal = document.getElementById("contextModal");
@@ -87,6 +104,8 @@ socket.on("auth_result", ({ok, msg})=>{
   }
 });
 
+socket.on("presence", ({online})=>{ if ($online) $online.textContent = `👥 ${online} en ligne`; });
+
 // ---------- Chat ----------
 $chatSend?.addEventListener("click", sendChat);
 $chatInput?.addEventListener("keydown", (e)=>{ if(e.key==="Enter"){ e.preventDefault(); sendChat(); }});
@@ -96,15 +115,40 @@ function sendChat(){
   socket.emit("chat_message", { room: ROOM, name: NAME || "Agent", text });
   $chatInput.value="";
 }
-socket.on("chat", appendChat);
+// Trame groupée : un message seul, ou une liste (rafale, historique à l'arrivée)
+socket.on("chat", (m)=> (Array.isArray(m) ? m : [m]).forEach(appendChat));
 
 // ---------- Boutons top ----------
 $start?.addEventListener("click", ()=> socket.emit("start", { room: ROOM }));
 $hint?.addEventListener("click", ()=> socket.emit("hint", { room: ROOM }));
 $replay?.addEventListener("click", ()=> socket.emit("replay", { room: ROOM }));
 
-// ---------- Render state ----------
+// ---------- State (instantané + patchs) ----------
 socket.on("state", (st)=>{
+  STATE = st; SEQ = st.seq || 0;
+  renderState(st);
+});
+socket.on("state_patch", (p)=>{
+  if (!STATE || p.seq !== SEQ + 1){
+    // Patch manquant : on redemande un instantané complet
+    socket.emit("resync", { room: ROOM });
+    return;
+  }
+  Object.assign(STATE, p.set); SEQ = p.seq;
+  renderStatus(STATE, p.set);
+});
+
+// Parties qui changent sans changer d'étape : chrono, indices
+function renderStatus(st, changed){
+  if (!changed || "deadline" in changed || "duration" in changed) startLocalTimer();
+  if ($hint && (!changed || "hints" in changed)) {
+    const left = ((st.hints?.total)||0) - ((st.hints?.used)||0);
+    $hint.textContent = `Indice (${left>=0?left:0} rest.)`;
+  }
+}
+
+// ---------- Render state ----------
+function renderState(st){
   if (st.finished) {
     $prompt.innerHTML = st.success
       ? `<h3>✅ Mission accomplie !</h3><p>Vous avez <strong>sauvez</strong> la planete.</p>`
@@ -120,18 +164,13 @@ socket.on("state", (st)=>{
     return;
   }
 
-  // chrono
-  startLocalTimer(st.remaining || 0);
+  // chrono + indices
+  renderStatus(st);
 
   const p = st.prompt || {};
   const instruction = (p.instruction || "").replace(/\n/g,"<br>");
   $prompt.innerHTML = `<h3>${p.title || "Salle"}</h3><p>${instruction}</p>`;
 
-  if ($hint) {
-    const left = ((st.hints?.total)||0) - ((st.hints?.used)||0);
-    $hint.textContent = `Indice (${left>=0?left:0} rest.)`;
-  }
-
   // UI par type
   if (p.type === "waste_v2") {
     let html = `<div class="card-grid">`;
@@ -184,7 +223,7 @@ socket.on("state", (st)=>{
   } else {
     $form.innerHTML = "";
   }
-});
+}
 
 // ---------- Submit ----------
 $submit?.addEventListener("click", ()=>{
@@ -211,6 +250,7 @@ $submit?.addEventListener("click", ()=>{
   }
   if (date) payload = { date: date.value.trim() };
 
-  socket.emit("submit", { room: ROOM, payload });
+  // L'étape visée : une réponse arrivée après le changement d'étape est ignorée
+  socket.emit("submit", { room: ROOM, stage: STATE ? STATE.stage : undefined, payload });
 });
 
@@ -0,0 +1,27 @@
+// static/clock.js
+// Horloge serveur (time_sync) et format mm:ss, communs à la page de salle et à la vue organisateurs
+
+// Mesure l'écart avec l'horloge du serveur à chaque connexion du socket ;
+// renvoie serverNow() : l'heure du serveur en ms, d'après Date.now()
+function serverClock(socket){
+  let offset = 0;           // ms à ajouter à Date.now() pour avoir l'heure du serveur
+  let bestRtt = Infinity;   // aller-retour de la meilleure mesure
+  function sync(samples){
+    const t0 = Date.now();
+    socket.emit("time_sync", { t0 }, (res)=>{
+      const rtt = Date.now() - t0;
+      // On garde la mesure au plus petit aller-retour : la plus précise
+      if (res && rtt <= bestRtt){ bestRtt = rtt; offset = res.server - (t0 + rtt/2); }
+      if (samples > 1) setTimeout(()=> sync(samples-1), 200);
+    });
+  }
+  socket.on("connect", ()=>{ bestRtt = Infinity; sync(5); });
+  setInterval(()=>{ bestRtt = Infinity; sync(3); }, 5*60*1000);   // dérive des horloges
+  return ()=> Date.now() + offset;
+}
+
+function fmt(sec){
+  const m = String(Math.floor(sec/60)).padStart(2,"0");
+  const s = String(sec%60).padStart(2,"0");
+  return `${m}:${s}`;
+}
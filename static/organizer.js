@@ -0,0 +1,64 @@
+// static/organizer.js
+// Vue d'ensemble : une trame agrégée par seconde pour toutes les salles (namespace /organizer)
+const TOKEN_KEY = "gaia_admin_token";
+let token = sessionStorage.getItem(TOKEN_KEY) || prompt("Jeton organisateur (ADMIN_TOKEN)") || "";
+sessionStorage.setItem(TOKEN_KEY, token);
+const socket = io("/organizer", { auth: { token } });
+
+const $rooms = document.getElementById("rooms");
+const $counts = document.getElementById("counts");
+let ROOMS = {};     // code -> ligne (étape, échéance, indices, fin)
+
+// ---------- Horloge serveur (static/clock.js) ----------
+const serverNow = serverClock(socket);
+
+function remaining(r){
+  if (r.finished) return "—";
+  if (!r.deadline) return fmt(r.duration || 0);
+  return fmt(Math.max(0, Math.ceil((r.deadline - serverNow())/1000)));
+}
+function status(r){
+  if (!r.finished) return r.deadline ? "en jeu" : "en attente";
+  return r.success ? "✅ réussie" : "❌ échouée";
+}
+
+// Lignes construites nœud par nœud (textContent) : rien de ce qui vient du serveur n'est interprété comme du HTML
+function cell(tr, text){
+  const td = document.createElement("td");
+  td.textContent = text;
+  tr.appendChild(td);
+  return td;
+}
+function render(){
+  const codes = Object.keys(ROOMS).sort();
+  const rows = codes.map(code => {
+    const r = ROOMS[code];
+    const tr = document.createElement("tr");
+    if (r.finished) tr.className = "done";
+    const a = document.createElement("a");
+    a.href = "/room/" + encodeURIComponent(code);
+    a.textContent = code;
+    cell(tr, "").appendChild(a);
+    cell(tr, `${Math.min(r.stage + 1, r.total)} / ${r.total}`);
+    cell(tr, remaining(r));
+    cell(tr, `${r.hints} / ${r.hints_total}`);
+    cell(tr, status(r));
+    return tr;
+  });
+  $rooms.replaceChildren(...rows);
+  const done = codes.filter(c => ROOMS[c].finished).length;
+  $counts.textContent = `${codes.length - done} en cours · ${done} terminées`;
+}
+
+socket.on("connect_error", (err)=>{
+  if (err && err.message === "unauthorized"){ sessionStorage.removeItem(TOKEN_KEY); $counts.textContent = "Jeton refusé."; }
+});
+socket.on("overview", (data)=>{ ROOMS = data.rooms || {}; render(); });
+socket.on("overview_patch", (data)=>{
+  Object.assign(ROOMS, data.set || {});
+  (data.del || []).forEach(code => delete ROOMS[code]);
+  render();
+});
+// Le temps restant se décompte localement depuis les échéances
+setInterval(render, 1000);
+document.addEventListener("visibilitychange", ()=>{ if (!document.hidden) socket.emit("overview"); });
@@ -0,0 +1,5 @@
+# tests/conftest.py
+import os, sys
+
+# Les tests importent les modules de l'application depuis la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
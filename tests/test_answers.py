@@ -0,0 +1,41 @@
+# tests/test_answers.py
+"""Réponses libres : normalisation texte (accents, casse, articles) et dates."""
+import pytest
+from puzzles.answers import MAX_LEN, AnswerMatcher, normalize_date, normalize_text
+
+@pytest.mark.parametrize("raw", ["abeille", "Abeille", "ABEILLE", "  l’abeille ! ", "L'Abeille", "une abeille",
+                                 "the abeille", "abéille"])
+def test_text_ignores_accents_case_articles(raw):
+    assert AnswerMatcher({"abeille"})(raw)
+
+@pytest.mark.parametrize("raw", ["abeile", "abeilles", "abeill", "guêpe", "", "le", "l abeille royale"])
+def test_text_rejects_typos_and_other_words(raw):
+    # Pas de correspondance approchée : une faute de frappe est une mauvaise réponse
+    assert not AnswerMatcher({"abeille"})(raw)
+
+def test_text_ligatures_and_punctuation():
+    assert normalize_text("Œuvre d'art") == normalize_text("oeuvre  d-art")
+    assert normalize_text("Le") == "le"         # un article seul reste la réponse
+
+@pytest.mark.parametrize("raw", ["24/07/2025", "2025-07-24", "24.07.25", "24 juillet 2025", "jeudi 24 Juillet 2025",
+                                 "July 24th 2025", "jul 24 2025", "20250724", "07/24/2025"])
+def test_date_formats(raw):
+    assert normalize_date(raw) == "2025-07-24"
+    assert AnswerMatcher({"24 juillet 2025"}, kind="date")(raw)
+
+@pytest.mark.parametrize("raw", ["25/07/2025", "24 juillet", "31/02/2025", "bientôt", "99999999999999999999/1/1",
+                                 "1/1/" + "9" * 50])
+def test_date_rejects(raw):
+    assert not AnswerMatcher({"24 juillet 2025"}, kind="date")(raw)
+
+def test_first_of_month():
+    assert normalize_date("1er août 2025") == "2025-08-01"
+
+def test_non_string_and_too_long_refused():
+    m = AnswerMatcher({"abeille"})
+    assert not m(None) and not m(42) and not m(["abeille"])
+    assert not m("abeille" + " " * MAX_LEN)
+
+def test_unreadable_accepted_answer():
+    with pytest.raises(ValueError):
+        AnswerMatcher({"pas une date"}, kind="date")
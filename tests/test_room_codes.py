@@ -0,0 +1,42 @@
+# tests/test_room_codes.py
+"""Codes de salle : permutation de Feistel (bijection à clé) et format des codes."""
+import pytest
+from services.room_codes import ALPHABET, FeistelPermutation, encode, is_valid
+
+@pytest.mark.parametrize("n", [4, 31 ** 2, 1000, 4099])
+def test_feistel_is_a_bijection(n):
+    perm = FeistelPermutation(n, b"k")
+    assert sorted(perm(x) for x in range(n)) == list(range(n))
+
+def test_feistel_depends_on_key():
+    n = 31 ** 3
+    a, b = FeistelPermutation(n, b"k1"), FeistelPermutation(n, b"k2")
+    assert [a(x) for x in range(50)] != [b(x) for x in range(50)]
+    assert [a(x) for x in range(50)] == [FeistelPermutation(n, b"k1")(x) for x in range(50)]
+
+def test_feistel_out_of_range():
+    perm = FeistelPermutation(100, b"k")
+    with pytest.raises(ValueError):
+        perm(100)
+    with pytest.raises(ValueError):
+        perm(-1)
+
+def test_allocated_codes_are_valid_and_distinct():
+    n = len(ALPHABET) ** 3
+    perm = FeistelPermutation(n, b"k")
+    codes = [encode(perm(x), 3) for x in range(2000)]
+    assert len(set(codes)) == len(codes)
+    assert all(is_valid(c, 3) for c in codes)
+
+def test_encode_round_trip():
+    for x in (0, 1, 30, 31, 12345, len(ALPHABET) ** 5 - 1):
+        code = encode(x, 5)
+        assert is_valid(code, 5)
+        back = 0
+        for ch in code:
+            back = back * len(ALPHABET) + ALPHABET.index(ch)
+        assert back == x
+
+@pytest.mark.parametrize("code", ["ABCD", "ABCDEF", "ABCD0", "ABCDO", "ABCD1", "ABCDI", "ABCDL", "abcde", ""])
+def test_is_valid_rejects(code):
+    assert not is_valid(code, 5)